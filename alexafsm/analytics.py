@@ -0,0 +1,223 @@
+"""
+Analytics off the request path: Policy.handle submits an event per request to an
+AnalyticsDispatcher, which queues it and sends it in batches to an AnalyticsSink from a background
+thread, so that analytics latency never adds to the response time.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import namedtuple
+from typing import List
+
+from voicelabs import VoiceInsights
+
+logger = logging.getLogger(__name__)
+
+# What to do with a new event when the queue is full
+DROP_NEWEST = 'drop_newest'  # discard the new event
+DROP_OLDEST = 'drop_oldest'  # discard the oldest queued event to make room for the new one
+BLOCK = 'block'  # wait (up to put_timeout) for room, then discard the new event
+
+# request: Alexa request in json format, response: Alexa response as returned by Response.to_json
+# (None if the request was not handled), timestamp: time.time() when the request was handled
+Event = namedtuple('Event', ['request', 'response', 'timestamp'])
+
+_STOP = object()
+
+
+class AnalyticsSink:
+    """Destination of analytics events. Implementations are only ever called from one thread."""
+
+    def send(self, events: List[Event]):
+        raise NotImplementedError
+
+
+class VoiceInsightsSink(AnalyticsSink):
+    """Send events to VoiceLabs' VoiceInsights"""
+
+    def __init__(self, voice_insights: VoiceInsights = None, app_token: str = None):
+        self.voice_insights = voice_insights or VoiceInsights()
+        self.app_token = app_token or os.environ['VOICELABS_API_KEY']
+
+    def send(self, events: List[Event]):
+        # VoiceInsights has no batch API, it sends one event per call
+        for event in events:
+            req = event.request['request']
+            self.voice_insights.initialize(self.app_token, event.request['session'])
+            if req['type'] == 'IntentRequest':
+                self.voice_insights.track(intent_name=req['intent']['name'], intent_request=req,
+                                          response=event.response)
+
+
+class AnalyticsDispatcher:
+    """
+    Bounded queue of events, sent in batches to a sink by a background thread.
+    Queued events are flushed on close(), which is also called when the interpreter exits, and
+    sent when the dispatcher is freed.
+    """
+
+    def __init__(self, sink: AnalyticsSink, max_queue_size: int = 10000, batch_size: int = 100,
+                 max_batch_delay: float = 0.5, drop_policy: str = DROP_NEWEST,
+                 put_timeout: float = 0.1):
+        """
+        Batches hold at most batch_size events, and wait at most max_batch_delay seconds for more
+        events once the first one arrives. drop_policy is one of DROP_NEWEST, DROP_OLDEST and BLOCK.
+        """
+        assert drop_policy in (DROP_NEWEST, DROP_OLDEST, BLOCK), f"Invalid drop policy {drop_policy}"
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.drop_policy = drop_policy
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        # the worker does not reference the dispatcher, which can be freed without being closed:
+        # its queued events are then sent and the worker stops
+        self._worker = _Worker(self._queue, sink, batch_size, max_batch_delay)
+        self._thread = threading.Thread(target=self._worker.run, name='alexafsm-analytics',
+                                        daemon=True)
+        self._thread.start()
+        self._finalizer = weakref.finalize(self, self._queue.put, _STOP)
+        self._finalizer.atexit = False
+        _open_dispatchers.add(self)
+
+    @property
+    def sent(self) -> int:
+        return self._worker.sent
+
+    @property
+    def failed(self) -> int:
+        return self._worker.failed
+
+    def submit(self, request: dict, response: dict = None):
+        """Queue an event for the given request and response, without blocking (unless BLOCK)"""
+        if self._closed:
+            self.dropped += 1
+            return
+        self._put(Event(request=request, response=response, timestamp=time.time()))
+
+    def _put(self, event: Event):
+        try:
+            if self.drop_policy == BLOCK:
+                self._queue.put(event, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event)
+            return
+        except queue.Full:
+            if self.drop_policy != DROP_OLDEST:
+                self.dropped += 1
+                return
+
+        # DROP_OLDEST: make room for the new event; the worker may free up room concurrently
+        try:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until all queued events are sent; return False on timeout"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued events and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        _open_dispatchers.discard(self)
+        self._finalizer.detach()
+        # the worker sends everything queued before the stop marker, without waiting for more
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error(f"Closing analytics with {self._queue.qsize()} events still queued")
+            return
+        self._thread.join(timeout)
+
+
+class _Worker:
+    """Background loop of an AnalyticsDispatcher, sending batches of its queued events"""
+
+    def __init__(self, events: queue.Queue, sink: AnalyticsSink, batch_size: int,
+                 max_batch_delay: float):
+        self._queue = events
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.sent = 0
+        self.failed = 0
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_batch_delay
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.time()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else
+                             self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        stop = False
+        while not stop:
+            batch = self._next_batch()
+            events = [event for event in batch if event is not _STOP]
+            stop = len(events) < len(batch)
+            try:
+                if events:
+                    self.sink.send(events)
+                    self.sent += len(events)
+            except Exception:
+                self.failed += len(events)
+                logger.exception(f"Failed to send {len(events)} analytics events")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+# dispatchers not closed yet, closed (flushing their events) when the interpreter exits
+_open_dispatchers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_dispatchers():
+    for dispatcher in list(_open_dispatchers):
+        dispatcher.close()
+
+
+# dispatchers for VoiceInsights objects passed directly to Policy.handle, see dispatcher_for
+_voice_insights_dispatchers = weakref.WeakKeyDictionary()
+_voice_insights_lock = threading.Lock()
+
+
+def dispatcher_for(voice_insights: VoiceInsights) -> AnalyticsDispatcher:
+    """
+    The dispatcher (created once) that sends events to the given VoiceInsights object. It only
+    references the object weakly, and is freed with it: events still queued then are not sent.
+    """
+    with _voice_insights_lock:
+        dispatcher = _voice_insights_dispatchers.get(voice_insights)
+        if dispatcher is None:
+            dispatcher = AnalyticsDispatcher(VoiceInsightsSink(weakref.proxy(voice_insights)))
+            _voice_insights_dispatchers[voice_insights] = dispatcher
+        return dispatcher
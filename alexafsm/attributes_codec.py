@@ -0,0 +1,140 @@
+"""
+Compact encoding of session attributes: selected (big) fields are packed into a single compressed,
+base64 encoded string attribute, so that Alexa sends and parses a short opaque string on every turn
+instead of the fields' json. Set a codec as the `codec` class attribute of a SessionAttributes class.
+
+The packed string is versioned: `z1:<base64 of zlib compressed json>`, so that attributes sent
+with an older format can still be read back.
+"""
+
+import base64
+import json
+import logging
+import threading
+import zlib
+from collections import namedtuple
+from typing import List
+
+from alexafsm.serializer import serialize
+
+logger = logging.getLogger(__name__)
+
+PACKED_KEY = '_packed'
+ZLIB_JSON_V1 = 'z1'
+
+# attributes: attributes to send to Alexa, data: their json (UTF-8 encoded), packed_size: size of
+# their packed string, over_budget: whether they were over max_bytes before trimming, trimmed:
+# number of fields trimmed
+Encoding = namedtuple('Encoding', ['attributes', 'data', 'packed_size', 'over_budget', 'trimmed'])
+
+
+class SizeStats:
+    """Encoded size of session attributes, over all the encodings of a codec"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_bytes = 0
+        self.max_bytes = 0
+        self.last_bytes = 0
+        self.packed_bytes = 0
+        self.over_budget = 0
+        self.trimmed = 0
+        self._lock = threading.Lock()
+
+    def add(self, size: int, packed_size: int, over_budget: bool, trimmed: int):
+        with self._lock:
+            self.count += 1
+            self.total_bytes += size
+            self.max_bytes = max(self.max_bytes, size)
+            self.last_bytes = size
+            self.packed_bytes += packed_size
+            self.over_budget += over_budget
+            self.trimmed += trimmed
+
+    def info(self) -> dict:
+        return {'count': self.count, 'total_bytes': self.total_bytes, 'max_bytes': self.max_bytes,
+                'last_bytes': self.last_bytes, 'packed_bytes': self.packed_bytes,
+                'mean_bytes': self.total_bytes / self.count if self.count else 0,
+                'over_budget': self.over_budget, 'trimmed': self.trimmed}
+
+
+def pack(values: dict, level: int = 6) -> str:
+    """
+    >>> pack({'query': 'pizza'})[:3]
+    'z1:'
+    """
+    compressed = zlib.compress(serialize(values), level)
+    return f'{ZLIB_JSON_V1}:{base64.b64encode(compressed).decode("ascii")}'
+
+
+def unpack(packed: str) -> dict:
+    """
+    >>> unpack(pack({'query': 'pizza', 'skills': [1, 2]}))
+    {'query': 'pizza', 'skills': [1, 2]}
+    """
+    version, _, data = packed.partition(':')
+    if version != ZLIB_JSON_V1:
+        raise ValueError(f"Unknown packed session attributes format {version}")
+    return json.loads(zlib.decompress(base64.b64decode(data)).decode('utf-8'))
+
+
+class AttributesCodec:
+    """
+    Pack the given fields of the session attributes (see pack). If the encoded attributes are
+    bigger than max_bytes, the fields in trim_fields are dropped, in order, until they fit; if they
+    still do not fit, they are sent anyway. Encoded sizes are recorded in `stats` once per turn,
+    see SessionAttributes.end_turn.
+    """
+
+    def __init__(self, fields: List[str], max_bytes: int = None, trim_fields: List[str] = (),
+                 level: int = 6):
+        self.fields = frozenset(fields)
+        self.max_bytes = max_bytes
+        self.trim_fields = list(trim_fields)
+        self.level = level
+        self.stats = SizeStats()
+
+    def encode(self, attributes: dict) -> dict:
+        """Attributes to send to Alexa, from the json representation of the session attributes"""
+        return self.encoding(attributes).attributes
+
+    def encoding(self, attributes: dict) -> Encoding:
+        """Same as encode, with the json of the attributes to send and their sizes"""
+        encoded, data, packed_size = self._encode(attributes)
+        over_budget = self.max_bytes is not None and len(data) > self.max_bytes
+        trimmed = 0
+        if over_budget:
+            # packed fields sent back as received (see session_attributes.LazyField) are trimmed too
+            attributes = dict(self.decode(attributes))
+            for field in self.trim_fields:
+                if field in attributes:
+                    del attributes[field]
+                    trimmed += 1
+                    encoded, data, packed_size = self._encode(attributes)
+                    if len(data) <= self.max_bytes:
+                        break
+        return Encoding(encoded, data, packed_size, over_budget, trimmed)
+
+    def record(self, encoding: Encoding):
+        """Record the sizes of attributes sent to Alexa in stats"""
+        if encoding.over_budget:
+            logger.warning(f"Session attributes over budget of {self.max_bytes} bytes, trimmed "
+                           f"{encoding.trimmed} fields to {len(encoding.data)} bytes")
+        self.stats.add(len(encoding.data), encoding.packed_size, encoding.over_budget,
+                       encoding.trimmed)
+
+    def _encode(self, attributes: dict) -> (dict, bytes, int):
+        encoded = {k: v for k, v in attributes.items() if k not in self.fields}
+        packed = {k: v for k, v in attributes.items() if k in self.fields}
+        if packed:
+            encoded[PACKED_KEY] = pack(packed, self.level)
+        return encoded, serialize(encoded), len(encoded.get(PACKED_KEY, ''))
+
+    @staticmethod
+    def decode(attributes: dict) -> dict:
+        """Session attributes sent back by Alexa, with their packed fields unpacked"""
+        if PACKED_KEY not in attributes:
+            return attributes
+        decoded = {k: v for k, v in attributes.items() if k != PACKED_KEY}
+        decoded.update(unpack(attributes[PACKED_KEY]))
+        return decoded
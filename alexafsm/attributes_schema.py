@@ -0,0 +1,144 @@
+"""
+Session attributes classes generated from a declaration of their fields, like namedtuple does for
+tuples. The generated class stores its fields in `__slots__`, so that instances do not allocate a
+`__dict__`, and has `__init__` and `from_request` methods, and the fields of `to_json`, specialized
+for its fields: they read, convert and write each field directly, instead of going through
+`**kwargs`, `self.__dict__` and `not_sent_fields` on every request.
+
+    Slots = namedtuple('Slots', ['query'])
+
+    class SessionAttributes(attributes_class('SessionAttributes', Slots, [
+        Field('query', str),
+        Field('number_of_hits', int),
+        Field('searched', bool, default=False, sent=False)
+    ])):
+        __slots__ = ()
+
+        @property
+        def has_query(self):
+            return bool(self.query)
+
+`intent`, `slots` and `state` are always declared. Fields are converted to their type when read from
+a request (and when passed to `__init__`): `int`, `float`, `str` and `bool` fields with that type,
+lists of those (e.g. `List[int]`) element-wise, and any field with a `parse` function (applied
+element-wise for lists). Missing and unknown attributes in requests are ignored, and missing fields
+take their (not converted, so immutable) default value. `from_request` does not call `__init__`.
+
+The generated class derives from BaseSessionAttributes, like SessionAttributes: codecs, session
+stores and `stored_fields` work as usual. Its subclasses must declare `__slots__ = ()` too, or their
+instances get a `__dict__` again.
+"""
+
+import keyword
+from collections import namedtuple
+from typing import List
+
+from alexafsm.session_attributes import BaseSessionAttributes, INITIAL_STATE, SESSION_ID, JOURNAL
+from alexafsm.slots import slot_extractor
+
+_SCALAR_TYPES = {int, float, str, bool}
+
+
+class Field(namedtuple('Field', ['name', 'type', 'default', 'parse', 'sent'])):
+    """A field of session attributes: not sent to Alexa if sent is False (see not_sent_fields)"""
+
+    def __new__(cls, name: str, type=None, default=None, parse=None, sent: bool = True):
+        return super(Field, cls).__new__(cls, name=name, type=type, default=default, parse=parse,
+                                         sent=sent)
+
+
+_CORE_FIELDS = [Field('intent'), Field('slots'), Field('state', default=INITIAL_STATE)]
+
+
+def _is_list(field_type) -> bool:
+    return getattr(field_type, '__origin__', None) in (list, List)
+
+
+def _parser(field: Field):
+    """Function converting (elements of) json values of the field, None if there is none"""
+    field_type = field.type
+    if _is_list(field_type):
+        field_type = (field_type.__args__ or (None,))[0]
+    if field.parse:
+        return field.parse
+    return field_type if field_type in _SCALAR_TYPES else None
+
+
+def _conversion(field: Field, value: str) -> str:
+    """Expression converting the given (not None) value of the field"""
+    if _parser(field) is None:
+        return value
+    if _is_list(field.type):
+        return f'[_parse_{field.name}(element) for element in {value}]'
+    return f'_parse_{field.name}({value})'
+
+
+def _assignment(field: Field, value: str) -> str:
+    converted = _conversion(field, value)
+    if converted == value:
+        return f'    self.{field.name} = {value}\n'
+    return f'    self.{field.name} = None if {value} is None else {converted}\n'
+
+
+def attributes_class(name: str, slots_cls, fields: List[Field], base=BaseSessionAttributes) -> type:
+    """Generate a SessionAttributes class with the given slots and (additional) fields"""
+    fields = _CORE_FIELDS + list(fields)
+    names = [field.name for field in fields]
+    for field_name in names:
+        if not field_name.isidentifier() or keyword.iskeyword(field_name) or \
+                field_name.startswith('_'):
+            raise ValueError(f"Invalid field name {field_name}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate field names in {names}")
+
+    extract_slots = slot_extractor(slots_cls)
+    namespace = {'INITIAL_STATE': INITIAL_STATE, 'NONE_SLOTS': extract_slots(None),
+                 '_extract_slots': extract_slots}
+    for field in fields:
+        namespace[f'_default_{field.name}'] = field.default
+        namespace[f'_parse_{field.name}'] = _parser(field)
+
+    arguments = ', '.join(f'{field.name}=_default_{field.name}' for field in fields)
+    init = f'def __init__(self, {arguments}):\n'
+    init += ''.join(_assignment(field, field.name) for field in fields)
+    init += f'    self.{SESSION_ID} = None\n'
+
+    from_request = ('def from_request(cls, request):\n'
+                    '    if not request:\n'
+                    '        return cls(slots=NONE_SLOTS)\n'
+                    '    get = cls._request_attributes(request).get\n'
+                    '    self = cls.__new__(cls)\n')
+    for field in fields:
+        from_request += f'    value = get({field.name!r}, _default_{field.name})\n'
+        from_request += _assignment(field, 'value')
+    from_request += (f'    self.{SESSION_ID} = request["session"]["sessionId"] '
+                     f'if cls.session_store is not None else None\n'
+                     '    intent = request["request"].get("intent")\n'
+                     '    if intent is None:  # e.g., when starting skill at beginning of session\n'
+                     '        return self\n'
+                     '    self.intent = intent["name"]\n'
+                     '    if self.state is None:\n'
+                     '        self.state = INITIAL_STATE\n'
+                     '    self.slots = _extract_slots(intent.get("slots"))\n'
+                     '    return self\n')
+
+    fields_json = 'def _fields_json(self):\n    attributes = {}\n'
+    for field in fields:
+        if field.sent:
+            fields_json += (f'    value = self.{field.name}\n'
+                            f'    if value is not None:\n'
+                            f'        attributes[{field.name!r}] = value\n')
+    fields_json += '    return attributes\n'
+
+    exec(init + from_request + fields_json, namespace)
+
+    return type(name, (base,), {
+        '__slots__': tuple(names) + (SESSION_ID, JOURNAL),
+        '__doc__': f'{name}({", ".join(names)})',
+        '__init__': namespace['__init__'],
+        'from_request': classmethod(namespace['from_request']),
+        '_fields_json': namespace['_fields_json'],
+        'slots_cls': slots_cls,
+        'fields': tuple(fields),
+        'not_sent_fields': [field.name for field in fields if not field.sent],
+    })
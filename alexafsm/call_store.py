@@ -0,0 +1,169 @@
+"""
+Storage of the results of `test_helpers.recordable` functions: a single SQLite file per record
+directory (`calls.sqlite`), indexed by function name and hash of the arguments, with a bounded
+in-memory LRU cache in front of it.
+
+Recordings made before the store, one pickle file per call (`<function>_<hash>.pickle`), are still
+read during playback, and can be moved into the store:
+
+    python -m alexafsm.call_store tests/skillsearch/playback [--delete]
+"""
+
+import argparse
+import os
+import pickle
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+STORE_FILENAME = 'calls.sqlite'
+
+_PICKLE_FILE = re.compile(r'^(?P<function>.+)_(?P<key>[0-9a-f]{32})\.pickle$')
+
+
+class LRUCache:
+    """Mapping that keeps the maxsize most recently used items, safe across threads"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._items.move_to_end(key)
+            except KeyError:
+                return default
+            return self._items[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class CallStore:
+    """Pickled results of function calls, by function name and key, in a SQLite file"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS calls ('
+                               'function TEXT NOT NULL, key TEXT NOT NULL, result BLOB NOT NULL, '
+                               'PRIMARY KEY (function, key))')
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread and process (connections cannot be shared)"""
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            connection = self._local.connection = sqlite3.connect(self.filename, timeout=30)
+            self._local.pid = pid
+        return connection
+
+    def get(self, function: str, key: str) -> bytes:
+        """Pickled result of the call, raise KeyError if it was not recorded"""
+        row = self._connection().execute('SELECT result FROM calls WHERE function = ? AND key = ?',
+                                         (function, key)).fetchone()
+        if row is None:
+            raise KeyError((function, key))
+        return row[0]
+
+    def put(self, function: str, key: str, result: bytes):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO calls (function, key, result) '
+                               'VALUES (?, ?, ?)', (function, key, result))
+
+    def put_many(self, calls):
+        """Store (function, key, pickled result) triples in a single transaction"""
+        with self._connection() as connection:
+            connection.executemany('INSERT OR REPLACE INTO calls (function, key, result) '
+                                   'VALUES (?, ?, ?)', calls)
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM calls').fetchone()[0]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(record_dir: str) -> CallStore:
+    """Store of the given record directory, shared by all recordable functions"""
+    store = _stores.get(record_dir)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(record_dir)
+            if store is None:
+                os.makedirs(record_dir, exist_ok=True)
+                store = _stores[record_dir] = CallStore(os.path.join(record_dir, STORE_FILENAME))
+    return store
+
+
+def pickle_filename(record_dir: str, function: str, key: str) -> str:
+    """File of a call recorded before the store"""
+    return os.path.join(record_dir, f'{function}_{key}.pickle')
+
+
+def migrate(record_dir: str, delete: bool = False, batch_size: int = 1000) -> int:
+    """
+    Move the pickle files of the record directory into its store, in batches, and return the number
+    of calls moved. Pickle files are only deleted (with delete=True) once they are in the store.
+    """
+    store = get_store(record_dir)
+    migrated = 0
+    batch = []
+    filenames = []
+
+    def flush():
+        store.put_many(batch)
+        if delete:
+            for filename in filenames:
+                os.remove(filename)
+        del batch[:], filenames[:]
+
+    for name in sorted(os.listdir(record_dir)):
+        match = _PICKLE_FILE.match(name)
+        if not match:
+            continue
+        filename = os.path.join(record_dir, name)
+        with open(filename, 'rb') as f:
+            result = f.read()
+        pickle.loads(result)  # only move valid recordings
+        batch.append((match.group('function'), match.group('key'), result))
+        filenames.append(filename)
+        migrated += 1
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return migrated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Move the pickle files of recordable functions into the record directory's "
+                    f"{STORE_FILENAME}")
+    parser.add_argument('record_dir')
+    parser.add_argument('--delete', action='store_true',
+                        help="delete the pickle files once they are in the store")
+    args = parser.parse_args(argv)
+    migrated = migrate(args.record_dir, args.delete)
+    print(f"Moved {migrated} recorded calls to {os.path.join(args.record_dir, STORE_FILENAME)}")
+
+
+if __name__ == '__main__':
+    main()
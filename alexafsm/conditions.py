@@ -0,0 +1,119 @@
+"""
+Condition methods of a Policy (its `conditions` and `unless` callbacks) memoized for the duration
+of a single trigger. Conditions often call each other (e.g. `m_has_next` and `m_has_previous` both
+call `m_has_result`), and the candidate transitions of a trigger evaluate them over and over:
+
+    class Policy(PolicyBase):
+        @condition
+        def m_has_result(self) -> bool:
+            return bool(self.attributes.skills)
+
+        @condition(cost=10)
+        def m_is_known_user(self) -> bool:
+            return lookup_user(self.attributes) is not None
+
+The result of a condition is reused until the next trigger, or until the session attributes are
+changed, e.g. by a `prepare` callback: results are only memoized while a Snapshot of the attributes
+(see `Policy.execute`) tells which changes were made. Changes made in place (e.g. appending to a
+list field) are not seen, so conditions must only depend on fields that are assigned.
+
+The `cost` of conditions (1 by default, also for methods that are not decorated) is used by policies
+whose `order_conditions_by_cost` is set: see `ordered_by_cost`. Like the ordering by frequency of
+`alexafsm.profiling`, it only reorders candidates that are pairwise mutually exclusive.
+"""
+
+import functools
+import inspect
+
+from alexafsm.profiling import is_barrier, reorderable
+from alexafsm.session_attributes import JOURNAL
+from alexafsm.transition_table import TransitionTable
+
+DEFAULT_COST = 1
+
+
+def _snapshot(policy):
+    return getattr(policy.states.attributes, JOURNAL, None)
+
+
+def condition(method=None, cost: float = DEFAULT_COST):
+    """Decorator memoizing a condition method of a Policy, used with or without arguments"""
+    if method is None:
+        return functools.partial(condition, cost=cost)
+
+    name = method.__name__
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def memoized(policy):
+            snapshot = _snapshot(policy)
+            if snapshot is None:
+                return await method(policy)
+            cached = policy._condition_cache.get(name)
+            if cached is not None and cached[0] is snapshot and cached[1] == snapshot.changes:
+                return cached[2]
+            result = await method(policy)
+            policy._condition_cache[name] = (snapshot, snapshot.changes, result)
+            return result
+    else:
+        @functools.wraps(method)
+        def memoized(policy):
+            snapshot = _snapshot(policy)
+            if snapshot is None:
+                return method(policy)
+            cached = policy._condition_cache.get(name)
+            if cached is not None and cached[0] is snapshot and cached[1] == snapshot.changes:
+                return cached[2]
+            result = method(policy)
+            policy._condition_cache[name] = (snapshot, snapshot.changes, result)
+            return result
+
+    memoized.cost = cost
+    return memoized
+
+
+def transition_cost(policy_cls, transition) -> float:
+    """Sum of the costs of the conditions (and unless conditions) of the transition"""
+    return sum(getattr(getattr(policy_cls, name, None), 'cost', DEFAULT_COST)
+               for name in transition.conditions + transition.unless)
+
+
+def ordered_by_cost(table: TransitionTable, policy_cls) -> TransitionTable:
+    """
+    Transition table in which the candidates of each (state, trigger) are ordered by the cost of
+    their conditions, cheapest first, when that cannot change which transition fires: as in
+    `alexafsm.profiling`, candidates with `prepare` callbacks or without conditions are never moved,
+    nor are candidates moved across them, and the candidates in between are only reordered if they
+    are pairwise mutually exclusive. Triggers whose candidates all have `prepare` callbacks are
+    therefore left as declared.
+
+    >>> from alexafsm.transition_table import Transition
+    >>> class Policy:
+    ...     @condition(cost=5)
+    ...     def m_slow(self): pass
+    >>> def transition(dest, conditions=(), unless=(), prepare=()):
+    ...     return Transition('go', 'a', dest, conditions, unless, prepare, (), ())
+    >>> table = TransitionTable(['a', 'b', 'c', 'd', 'e', 'f'], [
+    ...     transition('b', ('m_slow', 'm_ok')), transition('c', ('m_fast',), ('m_ok',)),
+    ...     transition('d', ('m_other',), prepare=('m_prepare',)),
+    ...     transition('e', ('m_slow',)), transition('f', ('m_fast',))])
+    >>> [t.dest for t in ordered_by_cost(table, Policy).get('a', 'go')]
+    ['c', 'b', 'd', 'e', 'f']
+    """
+    def by_cost(run: list) -> list:
+        if not reorderable(run):
+            return run
+        return sorted(run, key=lambda t: transition_cost(policy_cls, t))
+
+    ordered = []
+    for _, candidates in table.items():
+        run = []
+        for transition in candidates:
+            if is_barrier(transition):
+                ordered += by_cost(run)
+                ordered.append(transition)
+                run = []
+            else:
+                run.append(transition)
+        ordered += by_cost(run)
+    return TransitionTable(table.states, ordered)
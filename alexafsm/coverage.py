@@ -0,0 +1,268 @@
+"""
+Coverage and transition statistics of large corpora of recorded turns, computed in a single pass
+over each file, with a process per file:
+
+* inputs are recordings (json lines of [request, response], see alexafsm.recorder), gzipped or
+  not, given as files, directories or record files with their shards, or logs of Policy.handle
+  (its "Changed from ..." and "Can't trigger event ..." lines, after the request's sessionId line)
+* counts per event, state and transition, and NOT_UNDERSTOOD rates per state
+* per-session statistics: number of turns and final states. Sessions are counted per file, so a
+  session recorded across several shards counts as several sessions
+* the empirical transition probability matrix, as a NumPy array when NumPy is installed
+
+Used and unused events, states and transitions are computed like
+`utils.used_events_states_transitions` and `utils.unused_events_states_transitions`:
+
+    python -m alexafsm.coverage tests/skillsearch/playback/recordings.json
+        [--policy tests.skillsearch.policy:Policy] [--processes 4] [--output coverage.json]
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import multiprocessing
+import os
+import re
+from collections import Counter
+from typing import Iterator, List
+
+from alexafsm.recorder import GZIP_EXTENSION, shard_files
+from alexafsm.response import NOT_UNDERSTOOD
+from alexafsm.session_attributes import INITIAL_STATE
+from alexafsm.utils import events_states_transitions, get_dialogs, import_object
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+_SESSION_LINE = re.compile(r'sessionId: (?P<session_id>\S+)')
+_CHANGED_LINE = re.compile(r'Changed from (?P<from_state>\S+) to (?P<to_state>\S+) through '
+                           r'(?P<intent>\S+)')
+_NOT_UNDERSTOOD_LINE = re.compile(r"Can't trigger event (?P<intent>\S+) from state "
+                                  r"(?P<state>[^\s!]+)!")
+
+
+class Coverage:
+    """Counts of the turns of a corpus, mergeable across files and processes"""
+
+    def __init__(self):
+        self.turns = 0
+        self.events = Counter()
+        self.states = Counter()  # turns from or to each state
+        self.transitions = Counter()  # (from_state, to_state) -> turns
+        self.turns_from = Counter()  # from_state -> turns
+        self.not_understood = Counter()  # from_state -> turns answered with NOT_UNDERSTOOD
+        self.session_lengths = Counter()  # number of turns -> sessions
+        self.final_states = Counter()  # state at the end of a session -> sessions
+
+    def add_turn(self, from_state: str, intent: str, to_state: str, not_understood: bool):
+        self.turns += 1
+        self.events[intent] += 1
+        self.states[from_state] += 1
+        self.states[to_state] += 1
+        self.transitions[(from_state, to_state)] += 1
+        self.turns_from[from_state] += 1
+        if not_understood:
+            self.not_understood[from_state] += 1
+
+    def add_session(self, turns: int, final_state: str):
+        self.session_lengths[turns] += 1
+        self.final_states[final_state] += 1
+
+    def merge(self, other: 'Coverage'):
+        self.turns += other.turns
+        for counter in ('events', 'states', 'transitions', 'turns_from', 'not_understood',
+                        'session_lengths', 'final_states'):
+            getattr(self, counter).update(getattr(other, counter))
+
+    def not_understood_rates(self) -> dict:
+        """Fraction of the turns from each state that were answered with NOT_UNDERSTOOD"""
+        return {state: self.not_understood[state] / turns
+                for state, turns in sorted(self.turns_from.items())}
+
+    def session_stats(self) -> dict:
+        sessions = sum(self.session_lengths.values())
+        if not sessions:
+            return {'sessions': 0}
+        lengths = sorted(self.session_lengths.items())
+
+        def percentile(p: float) -> int:
+            seen = 0
+            for length, count in lengths:
+                seen += count
+                if seen >= p / 100 * sessions:
+                    return length
+            return lengths[-1][0]
+
+        return {'sessions': sessions,
+                'mean_turns': sum(length * count for length, count in lengths) / sessions,
+                'p50_turns': percentile(50), 'p90_turns': percentile(90),
+                'max_turns': lengths[-1][0]}
+
+    def transition_matrix(self):
+        """
+        States (sorted) and the probability of going from each of them to each other, as a
+        NumPy array if NumPy is installed, as a list of rows otherwise
+        >>> coverage = Coverage()
+        >>> for to_state in ('a', 'b', 'b', 'c'):
+        ...     coverage.add_turn('a', 'Go', to_state, False)
+        >>> states, matrix = coverage.transition_matrix()
+        >>> states, [list(row) for row in matrix][0]
+        (['a', 'b', 'c'], [0.25, 0.5, 0.25])
+        """
+        states = sorted(self.states, key=str)  # a recorded response may have no state
+        index = {state: i for i, state in enumerate(states)}
+        if numpy is not None:
+            matrix = numpy.zeros((len(states), len(states)))
+            for (from_state, to_state), count in self.transitions.items():
+                matrix[index[from_state], index[to_state]] = count
+            totals = matrix.sum(axis=1, keepdims=True)
+            return states, numpy.divide(matrix, totals, out=numpy.zeros_like(matrix),
+                                        where=totals > 0)
+        matrix = [[0.0] * len(states) for _ in states]
+        for (from_state, to_state), count in self.transitions.items():
+            matrix[index[from_state]][index[to_state]] = count / self.turns_from[from_state]
+        return states, matrix
+
+    def used_events_states_transitions(self):
+        """Same as utils.used_events_states_transitions of the corpus"""
+        return set(self.events), set(self.states) - {INITIAL_STATE}, set(self.transitions)
+
+    def unused_events_states_transitions(self, policy):
+        """Same as utils.unused_events_states_transitions of the corpus"""
+        all_events, all_states, all_transitions = events_states_transitions(policy)
+        used_events, used_states, used_transitions = self.used_events_states_transitions()
+        return all_events - used_events, all_states - used_states, \
+            all_transitions - used_transitions
+
+    def to_json(self) -> dict:
+        return {
+            'turns': self.turns,
+            'events': dict(self.events.most_common()),
+            'states': dict(self.states.most_common()),
+            'transitions': [[from_state, to_state, count]
+                            for (from_state, to_state), count in self.transitions.most_common()],
+            'not_understood_rates': self.not_understood_rates(),
+            'sessions': self.session_stats(),
+            'final_states': dict(self.final_states.most_common())
+        }
+
+
+def _open(filename: str):
+    opener = gzip.open if filename.endswith(GZIP_EXTENSION) else open
+    return opener(filename, 'rt')
+
+
+def _recorded_turns(lines) -> Iterator[tuple]:
+    """(session id, from state, intent, to state, whether not understood) of recorded turns"""
+    not_understood_speech = NOT_UNDERSTOOD.speech
+    for line in lines:
+        if not line.strip():
+            continue
+        request, response = json.loads(line)
+        _, from_state, intent, _, to_state, speech = get_dialogs(request, response)
+        yield request['session']['sessionId'], from_state, intent, to_state, \
+            speech == not_understood_speech
+
+
+def _logged_turns(lines) -> Iterator[tuple]:
+    """Same as _recorded_turns, from the log lines of Policy.handle"""
+    session_id = None
+    for line in lines:
+        match = _SESSION_LINE.search(line)
+        if match:
+            session_id = match.group('session_id')
+            continue
+        match = _CHANGED_LINE.search(line)
+        if match:
+            yield session_id, match.group('from_state'), match.group('intent'), \
+                match.group('to_state'), False
+            continue
+        match = _NOT_UNDERSTOOD_LINE.search(line)
+        if match:
+            state = match.group('state')
+            yield session_id, state, match.group('intent'), state, True
+
+
+def analyze_file(filename: str) -> Coverage:
+    """Coverage of a file of recordings or logs"""
+    coverage = Coverage()
+    sessions = {}  # session id -> [turns, last state]
+    with _open(filename) as f:
+        first_line = f.readline()
+        lines = _recorded_turns if first_line.startswith('[') else _logged_turns
+        for session_id, from_state, intent, to_state, not_understood in \
+                lines(itertools.chain([first_line], f)):
+            coverage.add_turn(from_state, intent, to_state, not_understood)
+            session = sessions.get(session_id)
+            if session is None:
+                sessions[session_id] = [1, to_state]
+            else:
+                session[0] += 1
+                session[1] = to_state
+    for turns, final_state in sessions.values():
+        coverage.add_session(turns, final_state)
+    return coverage
+
+
+def input_files(paths: List[str]) -> List[str]:
+    """Files of the given files, directories, and record files with their shards"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if os.path.isfile(os.path.join(path, name)))
+        else:
+            files += ([path] if os.path.exists(path) else []) + shard_files(path)
+    return files
+
+
+def analyze(paths: List[str], processes: int = None) -> Coverage:
+    """Coverage of the files of the given paths, see input_files, with a process per file"""
+    files = input_files(paths)
+    if not files:
+        raise FileNotFoundError(f"No recordings or logs found in {paths}")
+    coverage = Coverage()
+    if processes == 1 or len(files) == 1:
+        for filename in files:
+            coverage.merge(analyze_file(filename))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for file_coverage in pool.imap_unordered(analyze_file, files):
+                coverage.merge(file_coverage)
+    return coverage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help="recordings or logs: files, directories, shards")
+    parser.add_argument('--policy', help="policy class to report unused events, states and "
+                                         "transitions of, as module:class")
+    parser.add_argument('--processes', type=int, help="number of processes (default: CPUs)")
+    parser.add_argument('--output', help="json file to write the statistics to")
+    args = parser.parse_args(argv)
+
+    coverage = analyze(args.paths, args.processes)
+    stats = coverage.to_json()
+    print(f"{coverage.turns} turns, {len(coverage.events)} events, {len(coverage.states)} states,"
+          f" {len(coverage.transitions)} transitions, {stats['sessions']}")
+    for state, rate in sorted(stats['not_understood_rates'].items(), key=lambda item: -item[1]):
+        if rate:
+            print(f"NOT_UNDERSTOOD from {state}: {rate:.1%}")
+    if args.policy:
+        policy = import_object(args.policy).initialize()
+        unused = dict(zip(('events', 'states', 'transitions'),
+                          (sorted(unused) for unused in
+                           coverage.unused_events_states_transitions(policy))))
+        for kind, values in unused.items():
+            print(f"Unused {kind}: {values}")
+        stats['unused'] = unused
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(stats, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Engines that make the transitions of a Policy, based on the compiled TransitionTable of its States.
+
+* `transitions` (default) dispatches through a transitions.Machine.
+* `native` dispatches directly from the TransitionTable, without the transitions library's generic
+  event and callback machinery. It has the same semantics for the subset of features used by
+  `with_transitions`: candidates are tried in order, `prepare` callbacks run before the conditions
+  of their transition, `conditions`/`unless` are evaluated in order and short-circuit, `before` and
+  `after` callbacks run around the state change, and MachineError is raised when the current state
+  has no transition for the trigger.
+
+Both engines also have `trigger_async`, for which `prepare`, `conditions`, `unless`, `before` and
+`after` methods may be coroutines. The transitions library cannot await callbacks, so it is always
+dispatched from the TransitionTable, with the native engine's semantics. So is `fire` (and
+`fire_async`), which returns the transition that fired, for profiling (see alexafsm.profiling).
+
+Graph drawing (`with_graph=True`) and the tools in `alexafsm.utils` always use a transitions.Machine.
+"""
+
+import inspect
+
+from transitions import Machine, MachineError
+
+from alexafsm.session_attributes import INITIAL_STATE
+from alexafsm.transition_table import TransitionTable
+
+TRANSITIONS = 'transitions'
+NATIVE = 'native'
+
+# shared machines and engines, keyed by States class (and engine name and ordering), see
+# shared_machine/get_engine
+_machines = {}
+_engines = {}
+
+
+def build_machine(table: TransitionTable, initial: str, model='self', machine_cls=Machine):
+    return machine_cls(
+        model=model,
+        states=list(table.states),
+        initial=initial,
+        transitions=[transition.to_kwargs() for transition in table.transitions],
+        auto_transitions=False
+    )
+
+
+def shared_machine(states_cls) -> Machine:
+    """
+    Machine that holds the states and events of the given States class. It is not bound to any
+    policy: events are triggered with the policy as model, and read and write the policy's state,
+    so a single machine can serve any number of concurrent policies.
+    """
+    machine = _machines.get(states_cls)
+    if machine is None:
+        machine = build_machine(states_cls.get_transition_table(), INITIAL_STATE)
+        _machines[states_cls] = machine
+    return machine
+
+
+def _no_transition(state: str, trigger: str) -> MachineError:
+    return MachineError(f"Can't trigger event {trigger} from state {state}!")
+
+
+async def _call_async(policy, method: str):
+    result = getattr(policy, method)()
+    return await result if inspect.isawaitable(result) else result
+
+
+def _fire(table: TransitionTable, policy, trigger: str):
+    """Make the first candidate transition whose conditions pass, and return it (None if none)"""
+    candidates = table.get(policy.state, trigger)
+    if not candidates:
+        raise _no_transition(policy.state, trigger)
+
+    for transition in candidates:
+        for prepare in transition.prepare:
+            getattr(policy, prepare)()
+        if _conditions_pass(policy, transition):
+            for before in transition.before:
+                getattr(policy, before)()
+            policy.state = transition.dest
+            for after in transition.after:
+                getattr(policy, after)()
+            return transition
+    return None
+
+
+def _conditions_pass(policy, transition) -> bool:
+    # Same comparison as transitions.Condition.check: the condition must return (something equal
+    # to) True, and the unless condition must return (something equal to) False
+    for condition in transition.conditions:
+        if getattr(policy, condition)() != True:  # NOQA
+            return False
+    for unless in transition.unless:
+        if getattr(policy, unless)() != False:  # NOQA
+            return False
+    return True
+
+
+async def _fire_async(table: TransitionTable, policy, trigger: str):
+    """Async counterpart of _fire"""
+    candidates = table.get(policy.state, trigger)
+    if not candidates:
+        raise _no_transition(policy.state, trigger)
+
+    for transition in candidates:
+        for prepare in transition.prepare:
+            await _call_async(policy, prepare)
+        if await _conditions_pass_async(policy, transition):
+            for before in transition.before:
+                await _call_async(policy, before)
+            policy.state = transition.dest
+            for after in transition.after:
+                await _call_async(policy, after)
+            return transition
+    return None
+
+
+async def _conditions_pass_async(policy, transition) -> bool:
+    for condition in transition.conditions:
+        if await _call_async(policy, condition) != True:  # NOQA
+            return False
+    for unless in transition.unless:
+        if await _call_async(policy, unless) != False:  # NOQA
+            return False
+    return True
+
+
+class _Engine:
+    """Dispatch from the TransitionTable, shared by both engines"""
+
+    def __init__(self, table: TransitionTable):
+        self.table = table
+
+    def fire(self, policy, trigger: str):
+        """Same as trigger, but return the transition that fired (None if none did)"""
+        return _fire(self.table, policy, trigger)
+
+    async def fire_async(self, policy, trigger: str):
+        return await _fire_async(self.table, policy, trigger)
+
+    async def trigger_async(self, policy, trigger: str) -> bool:
+        return await _fire_async(self.table, policy, trigger) is not None
+
+
+class TransitionsEngine(_Engine):
+    """Dispatch through the events of a transitions.Machine"""
+
+    name = TRANSITIONS
+
+    def __init__(self, table: TransitionTable, machine: Machine):
+        super().__init__(table)
+        self.machine = machine
+
+    def trigger(self, policy, trigger: str) -> bool:
+        if (policy.state, trigger) not in self.table:
+            raise _no_transition(policy.state, trigger)
+        return self.machine.events[trigger].trigger(policy)
+
+
+class NativeEngine(_Engine):
+    """Dispatch directly from the compiled TransitionTable"""
+
+    name = NATIVE
+
+    def trigger(self, policy, trigger: str) -> bool:
+        return _fire(self.table, policy, trigger) is not None
+
+
+def get_engine(name: str, states_cls, ordered_for=None):
+    """
+    Engine of the given name for the given States class, shared by all policies. If ordered_for
+    is a Policy class, candidate transitions are in the order of its order_transitions, and the
+    engine is only shared by policies of that class.
+    """
+    key = (name, states_cls, ordered_for)
+    engine = _engines.get(key)
+    if engine is None:
+        table = states_cls.get_transition_table()
+        if ordered_for is not None:
+            table = ordered_for.order_transitions(table)
+        if name == TRANSITIONS:
+            machine = shared_machine(states_cls) if ordered_for is None else \
+                build_machine(table, INITIAL_STATE)
+            engine = TransitionsEngine(table, machine)
+        elif name == NATIVE:
+            engine = NativeEngine(table)
+        else:
+            raise ValueError(f"Unknown engine {name}, expected one of: {TRANSITIONS}, {NATIVE}")
+        _engines[key] = engine
+    return engine
@@ -0,0 +1,280 @@
+"""
+Load tests of a skill, to plan its capacity: requests are sent at a target rate (open loop, i.e.
+regardless of how fast they are answered), with at most `concurrency` requests handled at once,
+and latency percentiles, error rates and the saturation point are reported.
+
+* traffic: recorded turns (test_helpers.iter_requests_responses), or random walks through the
+  events of the policy, from one state to the next, generated in process
+* target: Policy.handle in process (with a PolicyPool), or an HTTP endpoint such as the skill
+  search server
+* rates: each target rate in turn (`--qps 10,20,50`), for `--duration` seconds each. Latency is
+  measured from the time each request was due, so it includes the time waiting for a free worker.
+  A rate saturates the skill if requests are answered at less than 95% of the rate they are due
+  (until the last one is answered), more than 1% fail, or the p99 latency exceeds `--slo-p99`
+* external clients can be replaced by local fakes (`--fakes module:function`, a context manager
+  taking the latency and jitter of the fake clients, e.g. tests.skillsearch.fakes:fake_clients)
+
+    python -m alexafsm.loadtest --policy tests.skillsearch.policy:Policy --walk 1000 \
+        --fakes tests.skillsearch.fakes:fake_clients --fake-latency 0.05 --qps 10,50,100,200
+    python -m alexafsm.loadtest --recordings recordings.json --url http://localhost:8888/
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+from alexafsm.policy_pool import PolicyPool
+from alexafsm.session_attributes import INITIAL_STATE
+from alexafsm.test_helpers import iter_requests_responses, make_request
+from alexafsm.utils import import_object
+
+# a rate saturates the skill if requests are answered at a lower fraction of the rate, or more of
+# them fail, than these
+MIN_ANSWERED = 0.95
+MAX_ERRORS = 0.01
+
+
+def recorded_requests(record_file: str) -> List[dict]:
+    return [request for request, _ in iter_requests_responses(record_file)]
+
+
+def random_walk(policy_cls, num_turns: int, slot_values: dict = None, slot_fill: float = 0.5,
+                seed: int = 0) -> List[dict]:
+    """
+    Requests of walks through the transitions of the policy, each turn a trigger of the current
+    state, with the session attributes of the previous turn. A new session starts when a session
+    ends or its state has no triggers.
+    slot_values are possible values by slot, e.g. {'query': ['pizza', 'news']}: each slot is filled
+    with one of them with probability slot_fill.
+    """
+    rng = random.Random(seed)
+    policy = policy_cls.initialize()
+    triggers = {}
+    for state, trigger in (key for key, _ in policy.transition_table.items()):
+        triggers.setdefault(state, []).append(trigger)
+
+    requests = []
+    attributes = {}
+    session = 0
+    for i in range(num_turns):
+        state = attributes.get('state', INITIAL_STATE)
+        if state not in triggers:
+            attributes, state = {}, INITIAL_STATE
+        slots = {name: rng.choice(values) for name, values in (slot_values or {}).items()
+                 if rng.random() < slot_fill}
+        request = make_request(rng.choice(triggers[state]), slots, attributes,
+                               session_id=f'loadtest-{session}', request_id=f'loadtest-{i}')
+        requests.append(request)
+        resp = json.loads(policy.handle(request).to_bytes())
+        attributes = resp['sessionAttributes']
+        if resp['response']['shouldEndSession']:
+            attributes = {}
+            session += 1
+    return requests
+
+
+class InProcessTarget:
+    """Policy.handle of pooled policies, including the serialization of the response"""
+
+    def __init__(self, policy_cls, size: int = 8):
+        self.policies = PolicyPool(policy_cls, size)
+
+    def __call__(self, request: dict):
+        self.policies.handle(request).to_bytes()
+
+
+class HttpTarget:
+    """Skill served at url, failing on errors and on responses other than 2xx"""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, request: dict):
+        http_request = urllib.request.Request(self.url, json.dumps(request).encode('utf-8'),
+                                              {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            response.read()
+
+
+def percentile(samples: list, p: float) -> float:
+    """p-th percentile (0-100) of the sorted samples, by nearest rank"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))]
+
+
+class StepResult:
+    """Outcome of sending requests at a target rate"""
+
+    def __init__(self, qps: float, duration: float):
+        self.qps = qps
+        self.duration = duration
+        self.sent = 0
+        self.errors = 0
+        self.latencies = []  # seconds from when each request was due to its answer
+        self.service_times = []  # seconds from when each request started being handled
+        self.max_queued = 0
+        self.elapsed = 0.0
+
+    @property
+    def answered(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def achieved_qps(self) -> float:
+        return self.answered / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.sent if self.sent else 0.0
+
+    def saturated(self, slo_p99: float = None) -> bool:
+        """Whether the skill could not keep up with the rate"""
+        # elapsed includes the time to answer the requests still queued at the end of the step
+        due_qps = self.sent / self.duration
+        return self.achieved_qps < MIN_ANSWERED * due_qps or self.error_rate > MAX_ERRORS or \
+            (slo_p99 is not None and self.percentile(99) > slo_p99)
+
+    def percentile(self, p: float) -> float:
+        return percentile(sorted(self.latencies), p)
+
+    def to_json(self, slo_p99: float = None) -> dict:
+        latencies, service_times = sorted(self.latencies), sorted(self.service_times)
+        return {'qps': self.qps, 'sent': self.sent, 'answered': self.answered,
+                'errors': self.errors, 'error_rate': self.error_rate,
+                'achieved_qps': self.achieved_qps, 'max_queued': self.max_queued,
+                'p50_ms': percentile(latencies, 50) * 1e3,
+                'p95_ms': percentile(latencies, 95) * 1e3,
+                'p99_ms': percentile(latencies, 99) * 1e3,
+                'service_p50_ms': percentile(service_times, 50) * 1e3,
+                'saturated': self.saturated(slo_p99)}
+
+
+def run_step(target, requests: Iterator[dict], qps: float, duration: float, concurrency: int,
+             poisson: bool = False, seed: int = 0) -> StepResult:
+    """Send the requests to the target at the given rate for duration seconds"""
+    rng = random.Random(seed)
+    result = StepResult(qps, duration)
+    lock = threading.Lock()
+    queued = [0]
+
+    def send(request: dict, due: float):
+        started = time.perf_counter()
+        with lock:
+            queued[0] -= 1
+        try:
+            target(request)
+        except Exception:
+            with lock:
+                result.errors += 1
+            return
+        answered = time.perf_counter()
+        with lock:
+            result.latencies.append(answered - due)
+            result.service_times.append(answered - started)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        due = start
+        while due < start + duration:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                queued[0] += 1
+                result.max_queued = max(result.max_queued, queued[0])
+            executor.submit(send, next(requests), due)
+            result.sent += 1
+            # evenly spaced from the start, so that rounding errors do not add up
+            due = due + rng.expovariate(qps) if poisson else start + result.sent / qps
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run(target, requests: List[dict], rates: List[float], duration: float, concurrency: int,
+        poisson: bool = False, slo_p99: float = None, report=print) -> List[StepResult]:
+    """Run a step per rate, in increasing order, until one saturates the skill"""
+    results = []
+    cycled = itertools.cycle(requests)
+    for qps in sorted(rates):
+        result = run_step(target, cycled, qps, duration, concurrency, poisson)
+        results.append(result)
+        stats = result.to_json(slo_p99)
+        report(f"{qps:8.1f} qps: {stats['achieved_qps']:8.1f} answered/s, p50 {stats['p50_ms']:.1f}"
+               f" ms, p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms,"
+               f" {stats['error_rate']:.1%} errors, up to {stats['max_queued']} queued"
+               f"{', SATURATED' if stats['saturated'] else ''}")
+        if result.saturated(slo_p99):
+            break
+    return results
+
+
+def saturation_point(results: List[StepResult], slo_p99: float = None) -> float:
+    """Lowest rate that saturated the skill, None if none did"""
+    return next((result.qps for result in results if result.saturated(slo_p99)), None)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--policy', help="policy class, as module:class, to handle requests in "
+                                         "process and to generate random walks")
+    parser.add_argument('--url', help="endpoint of the skill, instead of handling in process")
+    parser.add_argument('--recordings', help="record file of the requests to send")
+    parser.add_argument('--walk', type=int, default=1000,
+                        help="number of random walk requests to send, without recordings")
+    parser.add_argument('--slot-values', type=json.loads, default={},
+                        help="values of the slots in random walks, as json, e.g. "
+                             "'{\"query\": [\"pizza\", \"news\"]}'")
+    parser.add_argument('--qps', default='10,20,50,100,200', help="target rates to try in turn")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per rate")
+    parser.add_argument('--concurrency', type=int, default=16, help="requests handled at once")
+    parser.add_argument('--poisson', action='store_true',
+                        help="exponentially distributed arrivals instead of evenly spaced ones")
+    parser.add_argument('--slo-p99', type=float, help="p99 latency in seconds beyond which a rate "
+                                                      "saturates the skill")
+    parser.add_argument('--fakes', help="context manager replacing the external clients with "
+                                        "local fakes, as module:function")
+    parser.add_argument('--fake-latency', type=float, default=0.0,
+                        help="seconds per call of the fake clients")
+    parser.add_argument('--fake-jitter', type=float, default=0.0,
+                        help="up to this many more seconds per call of the fake clients")
+    parser.add_argument('--output', help="json file to write the results to")
+    args = parser.parse_args(argv)
+    if not args.url and not args.policy:
+        parser.error("a --policy or an --url is needed")
+    if not args.recordings and not args.policy:
+        parser.error("random walks need a --policy")
+
+    fakes = import_object(args.fakes)(args.fake_latency, args.fake_jitter) if args.fakes else \
+        contextlib.ExitStack()
+    with fakes:
+        policy_cls = import_object(args.policy) if args.policy else None
+        if args.recordings:
+            requests = recorded_requests(args.recordings)
+        else:
+            requests = random_walk(policy_cls, args.walk, args.slot_values)
+        target = HttpTarget(args.url) if args.url else InProcessTarget(policy_cls, args.concurrency)
+        rates = [float(qps) for qps in args.qps.split(',')]
+        results = run(target, requests, rates, args.duration, args.concurrency, args.poisson,
+                      args.slo_p99)
+
+    point = saturation_point(results, args.slo_p99)
+    print(f"Saturated at {point} qps" if point else "Not saturated at any rate")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'saturation_qps': point,
+                       'steps': [result.to_json(args.slo_p99) for result in results]}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
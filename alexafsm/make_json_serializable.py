@@ -3,6 +3,10 @@ Module that monkey-patches json module when it's imported so JSONEncoder.default
 checks for a special "to_json()" method and uses it to encode the object if found.
 
 See http://stackoverflow.com/a/18561055/257583
+
+The alexafsm package does not import this module, so json is only patched by applications that
+import it. The supported way to serialize responses (and any object with to_json) is
+alexafsm.serializer.serialize, which does not patch json.
 """
 
 from json import JSONEncoder
@@ -0,0 +1,344 @@
+"""
+Counters and latency histograms of the turns handled by policies, exported in the Prometheus text
+format or as a dict:
+
+* `alexafsm_turns_total{from_state, intent, to_state}`: turns, by transition
+* `alexafsm_not_understood_total{state, intent}`: invalid transitions (MachineError), answered with
+  response.NOT_UNDERSTOOD
+* `alexafsm_requests_total{type}`: requests, by type (IntentRequest, LaunchRequest, ...)
+* `alexafsm_request_seconds{state}`: latency of Policy.handle, by state after the turn
+
+Policies record into the `metrics` of their class:
+
+    class Policy(PolicyBase):
+        metrics = Metrics()
+
+Each thread counts in its own shard, without locking, and shards are only merged when metrics are
+exported (the shards of threads that ended are merged into one, so that servers starting a thread
+per request do not accumulate them). Pre-forked worker processes each count their own turns: given a
+`directory`, every process writes its counts there from a background thread, every `flush_interval`
+seconds (so never on the request path, nor on the event loop of asyncio servers), and when the
+interpreter exits, and exports merge the counts of all processes (the directory should be emptied
+when the server starts, like the directory of prometheus_client's multiprocess mode). Processes that
+exit without running atexit hooks, like the targets of multiprocessing.Process, should call `flush`
+before exiting. `wsgi_app` and `asgi_app` serve the metrics, e.g. next to the skill:
+
+    server = Server(mount(app.wsgi_app, Policy.metrics))
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the latency buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+JSON_CONTENT_TYPE = 'application/json'
+
+_FILE_PREFIX = 'alexafsm-metrics-'
+
+
+class Counts:
+    """Counts of turns, invalid transitions and requests, and latency histograms"""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.turns = {}  # (from_state, intent, to_state) -> count
+        self.not_understood = {}  # (state, intent) -> count
+        self.requests = {}  # request type -> count
+        self.latency = {}  # state -> [count per bucket, then beyond the last bucket] + [sum]
+
+    def observe(self, state: str, seconds: float):
+        histogram = self.latency.get(state)
+        if histogram is None:
+            histogram = self.latency[state] = [0] * (len(self.buckets) + 1) + [0.0]
+        i = 0
+        for bound in self.buckets:
+            if seconds <= bound:
+                break
+            i += 1
+        histogram[i] += 1
+        histogram[-1] += seconds
+
+    def merge(self, other: 'Counts'):
+        """Add the counts of other, e.g. of another thread or process, to these"""
+        if other.buckets != self.buckets:
+            raise ValueError(f"Cannot merge latency buckets {other.buckets} into {self.buckets}")
+        for mine, theirs in ((self.turns, other.turns), (self.not_understood, other.not_understood),
+                             (self.requests, other.requests)):
+            # copy first: other may be the shard of a thread that is counting
+            for key, count in dict(theirs).items():
+                mine[key] = mine.get(key, 0) + count
+        for state, histogram in dict(other.latency).items():
+            histogram = list(histogram)
+            total = self.latency.get(state)
+            self.latency[state] = histogram if total is None else \
+                [a + b for a, b in zip(total, histogram)]
+
+    def to_json(self) -> dict:
+        turns = {}
+        for (from_state, intent, to_state), count in sorted(self.turns.items()):
+            turns.setdefault(from_state, {}).setdefault(intent, {})[to_state] = count
+        not_understood = {}
+        for (state, intent), count in sorted(self.not_understood.items()):
+            not_understood.setdefault(state, {})[intent] = count
+        return {
+            'buckets': list(self.buckets),
+            'turns': turns,
+            'not_understood': not_understood,
+            'requests': dict(sorted(self.requests.items())),
+            'latency': {state: {'buckets': histogram[:-1], 'sum': histogram[-1]}
+                        for state, histogram in sorted(self.latency.items())}
+        }
+
+    @classmethod
+    def from_json(cls, counts: dict) -> 'Counts':
+        res = cls(tuple(counts['buckets']))
+        res.turns = {(from_state, intent, to_state): count
+                     for from_state, intents in counts['turns'].items()
+                     for intent, destinations in intents.items()
+                     for to_state, count in destinations.items()}
+        res.not_understood = {(state, intent): count
+                              for state, intents in counts['not_understood'].items()
+                              for intent, count in intents.items()}
+        res.requests = dict(counts['requests'])
+        res.latency = {state: histogram['buckets'] + [histogram['sum']]
+                       for state, histogram in counts['latency'].items()}
+        return res
+
+
+def _labels(**labels) -> str:
+    """
+    >>> _labels(state='a"b', intent='AMAZON.HelpIntent')
+    '{state="a\\\\"b",intent="AMAZON.HelpIntent"}'
+    """
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def prometheus_text(counts: Counts) -> str:
+    """Counts in the Prometheus text exposition format"""
+    lines = ['# HELP alexafsm_turns_total Turns, by transition',
+             '# TYPE alexafsm_turns_total counter']
+    for (from_state, intent, to_state), count in sorted(counts.turns.items()):
+        lines.append(f'alexafsm_turns_total'
+                     f'{_labels(from_state=from_state, intent=intent, to_state=to_state)} {count}')
+    lines += ['# HELP alexafsm_not_understood_total Invalid transitions, by state and intent',
+              '# TYPE alexafsm_not_understood_total counter']
+    for (state, intent), count in sorted(counts.not_understood.items()):
+        lines.append(f'alexafsm_not_understood_total{_labels(state=state, intent=intent)} {count}')
+    lines += ['# HELP alexafsm_requests_total Requests, by type',
+              '# TYPE alexafsm_requests_total counter']
+    for request_type, count in sorted(counts.requests.items()):
+        lines.append(f'alexafsm_requests_total{_labels(type=request_type)} {count}')
+    lines += ['# HELP alexafsm_request_seconds Latency of Policy.handle, by state after the turn',
+              '# TYPE alexafsm_request_seconds histogram']
+    for state, histogram in sorted(counts.latency.items()):
+        cumulative = 0
+        for bound, count in zip(counts.buckets + ('+Inf',), histogram[:-1]):
+            cumulative += count
+            lines.append(f'alexafsm_request_seconds_bucket{_labels(state=state, le=bound)}'
+                         f' {cumulative}')
+        lines.append(f'alexafsm_request_seconds_sum{_labels(state=state)} {histogram[-1]}')
+        lines.append(f'alexafsm_request_seconds_count{_labels(state=state)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Counts of the turns handled by policies, across threads and (given a directory) processes"""
+
+    def __init__(self, directory: str = None, flush_interval: float = 10.0,
+                 buckets: tuple = BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self._shards = []  # (thread, Counts) of the threads counting
+        self._retired = Counts(buckets)  # counts of the threads that ended
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flush_lock = threading.Lock()
+        # process in which the thread flushing the counts runs (threads do not survive a fork)
+        self._flushing_pid = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            _flushed_metrics.add(self)
+
+    def _shard(self) -> Counts:
+        """Counts of the current thread"""
+        self._check_fork()
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = Counts(self.buckets)
+            with self._lock:
+                self._retire_ended()
+                self._shards.append((threading.current_thread(), shard))
+                if self.directory is not None and self._flushing_pid != self._pid:
+                    self._flushing_pid = self._pid
+                    threading.Thread(target=_flush_periodically,
+                                     args=(weakref.ref(self), self.flush_interval),
+                                     name='alexafsm-metrics', daemon=True).start()
+        return shard
+
+    def _retire_ended(self):
+        """Merge the shards of the threads that ended into the retired counts, with the lock held"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+
+    def record_turn(self, from_state: str, intent: str, to_state: str):
+        turns = self._shard().turns
+        key = (from_state, intent, to_state)
+        turns[key] = turns.get(key, 0) + 1
+
+    def record_not_understood(self, state: str, intent: str):
+        not_understood = self._shard().not_understood
+        key = (state, intent)
+        not_understood[key] = not_understood.get(key, 0) + 1
+
+    def record_request(self, request_type: str, state: str, seconds: float):
+        """Count a handled request, with its latency and the state it left the policy in"""
+        shard = self._shard()
+        shard.requests[request_type] = shard.requests.get(request_type, 0) + 1
+        shard.observe(state, seconds)
+
+    def _check_fork(self):
+        """Forget counts inherited from the parent process, they are the parent's to export"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._local = threading.local()
+            self._shards = []
+            self._retired = Counts(self.buckets)
+
+    def counts(self) -> Counts:
+        """Counts of this process"""
+        self._check_fork()
+        res = Counts(self.buckets)
+        with self._lock:
+            self._retire_ended()
+            res.merge(self._retired)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            res.merge(shard)
+        return res
+
+    def _filename(self, pid: int) -> str:
+        return os.path.join(self.directory, f'{_FILE_PREFIX}{pid}.json')
+
+    def flush(self):
+        """Write the counts of this process to the directory, for the other processes to export"""
+        # one flush at a time, so that older counts never replace newer ones
+        with self._flush_lock:
+            counts = self.counts()
+            filename = self._filename(self._pid)
+            temporary = f'{filename}.{threading.get_ident()}.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(counts.to_json(), f)
+            os.replace(temporary, filename)
+
+    def _flush_counted(self):
+        """Flush the counts of this process, if it counted anything"""
+        self._check_fork()
+        if self._shards or self._retired.requests:
+            self.flush()
+
+    def collect(self) -> Counts:
+        """Counts of this process and, if there is a directory, of the other processes"""
+        res = self.counts()
+        if self.directory is not None:
+            mine = self._filename(self._pid)
+            for filename in glob.glob(os.path.join(self.directory, f'{_FILE_PREFIX}*.json')):
+                if filename != mine:
+                    with open(filename) as f:
+                        res.merge(Counts.from_json(json.load(f)))
+        return res
+
+    def to_json(self) -> dict:
+        return self.collect().to_json()
+
+    def prometheus(self) -> str:
+        return prometheus_text(self.collect())
+
+    def export(self, query_string: str = '') -> (str, bytes):
+        """Content type and body of the metrics, as json if the query string has format=json"""
+        if parse_qs(query_string).get('format') == ['json']:
+            return JSON_CONTENT_TYPE, json.dumps(self.to_json()).encode('utf-8')
+        return PROMETHEUS_CONTENT_TYPE, self.prometheus().encode('utf-8')
+
+
+def _flush_periodically(metrics_ref: weakref.ref, interval: float):
+    """Loop of the thread flushing the counts of a process, until its Metrics is freed"""
+    while True:
+        time.sleep(interval)
+        metrics = metrics_ref()
+        if metrics is None:
+            return
+        try:
+            metrics._flush_counted()
+        except OSError:
+            logger.exception(f"Failed to flush metrics to {metrics.directory}")
+        del metrics
+
+
+# metrics with a directory, flushed when the interpreter exits
+_flushed_metrics = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    for metrics in list(_flushed_metrics):
+        try:
+            metrics._flush_counted()
+        except OSError:
+            logger.exception(f"Failed to flush metrics to {metrics.directory}")
+
+
+def wsgi_app(metrics: Metrics):
+    """WSGI application serving the metrics"""
+    def app(environ, start_response):
+        content_type, body = metrics.export(environ.get('QUERY_STRING', ''))
+        start_response('200 OK', [('Content-Type', content_type),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+    return app
+
+
+def asgi_app(metrics: Metrics):
+    """ASGI application serving the metrics"""
+    async def app(scope, receive, send):
+        content_type, body = metrics.export(scope.get('query_string', b'').decode('latin-1'))
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', content_type.encode('latin-1')),
+                                (b'content-length', str(len(body)).encode('latin-1'))]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    return app
+
+
+def mount(app, metrics: Metrics, path: str = '/metrics'):
+    """WSGI application serving the metrics at path, and everything else with app"""
+    metrics_app = wsgi_app(metrics)
+
+    def dispatch(environ, start_response):
+        if environ.get('PATH_INFO') == path:
+            return metrics_app(environ, start_response)
+        return app(environ, start_response)
+
+    return dispatch
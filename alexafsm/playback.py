@@ -0,0 +1,213 @@
+"""
+Playback of recorded conversations (see test_helpers.iter_requests_responses) against a policy, to
+check that it still answers the same, streaming the recordings and replaying independent sessions
+in parallel:
+
+* turns are read lazily and grouped by sessionId; a session is replayed once it ended (a response
+  ending the session, or a SessionEndedRequest) or at the end of the recordings, so only the
+  sessions in progress are held in memory (turns after the end of a session are replayed as
+  another part of it, which is equivalent since requests carry the session attributes)
+* sessions are replayed by a pool of processes, each with its own policies; `setup` is called in
+  every process first, e.g. to put clients in playback mode
+* the report has structured differences between expected and actual responses, throughput and a
+  latency histogram of Policy.handle per state
+
+    python -m alexafsm.playback tests.skillsearch.policy:Policy tests/skillsearch/playback/recordings.json
+        [--setup tests.skillsearch.skill_settings:playback_mode] [--processes 4] [--output report.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from typing import Iterator, List, Tuple
+
+from alexafsm.spans import Histogram
+from alexafsm.test_helpers import iter_requests_responses
+from alexafsm.utils import import_object
+
+Turn = Tuple[dict, dict]  # (request, expected response), both in json format
+
+
+def session_id(request: dict) -> str:
+    return request['session']['sessionId']
+
+
+def ends_session(request: dict, response: dict) -> bool:
+    return request['request']['type'] == 'SessionEndedRequest' or \
+        bool(response.get('response', {}).get('shouldEndSession'))
+
+
+def iter_sessions(turns: Iterator[Turn]) -> Iterator[List[Turn]]:
+    """
+    Turns grouped by session, each session as soon as it ended
+    >>> from alexafsm.test_helpers import make_request
+    >>> def turn(session, end=False):
+    ...     return make_request('Intent', session_id=session), {'response': {'shouldEndSession': end}}
+    >>> [[session_id(request) for request, _ in session]
+    ...  for session in iter_sessions([turn('a'), turn('b'), turn('a', end=True), turn('b')])]
+    [['a', 'a'], ['b', 'b']]
+    """
+    in_progress = {}
+    for request, response in turns:
+        session = in_progress.setdefault(session_id(request), [])
+        session.append((request, response))
+        if ends_session(request, response):
+            yield in_progress.pop(session_id(request))
+    yield from in_progress.values()
+
+
+def json_diff(expected, actual, path: str = '') -> List[dict]:
+    """
+    Differences between two json values, by path
+    >>> json_diff({'a': [1, 2], 'b': 'x'}, {'a': [1, 3], 'c': 'x'})
+    [{'path': '/a/1', 'expected': 2, 'actual': 3}, {'path': '/b', 'expected': 'x', 'actual': None}, \
+{'path': '/c', 'expected': None, 'actual': 'x'}]
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return [difference for key in sorted(set(expected) | set(actual))
+                for difference in json_diff(expected.get(key), actual.get(key), f'{path}/{key}')]
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        return [difference for i, (e, a) in enumerate(zip(expected, actual))
+                for difference in json_diff(e, a, f'{path}/{i}')]
+    if expected != actual:
+        return [{'path': path, 'expected': expected, 'actual': actual}]
+    return []
+
+
+class PlaybackReport:
+    """Outcome of a playback, mergeable across processes"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.turns = 0
+        self.mismatches = []  # a dict per turn whose response differs from the recording
+        self.latency = {}  # state -> spans.Histogram of Policy.handle
+        self.elapsed = 0.0
+
+    def merge(self, other: 'PlaybackReport'):
+        self.sessions += other.sessions
+        self.turns += other.turns
+        self.mismatches += other.mismatches
+        for state, histogram in other.latency.items():
+            self.latency.setdefault(state, Histogram()).merge(histogram)
+
+    @property
+    def throughput(self) -> float:
+        """Turns replayed per second"""
+        return self.turns / self.elapsed if self.elapsed else 0.0
+
+    def to_json(self) -> dict:
+        return {'sessions': self.sessions, 'turns': self.turns, 'mismatches': self.mismatches,
+                'elapsed_s': self.elapsed, 'turns_per_s': self.throughput,
+                'latency': {state: histogram.summary()
+                            for state, histogram in sorted(self.latency.items())}}
+
+
+def replay_session(policy_cls, session: List[Turn]) -> PlaybackReport:
+    """Replay the turns of a session through a new policy"""
+    report = PlaybackReport()
+    report.sessions = 1
+    policy = policy_cls.initialize()
+    for i, (request, expected) in enumerate(session):
+        start = time.perf_counter()
+        actual = json.loads(policy.handle(request).to_bytes())
+        seconds = time.perf_counter() - start
+        report.latency.setdefault(policy.state, Histogram()).add(seconds)
+        report.turns += 1
+        differences = json_diff(expected, actual)
+        if differences:
+            intent = request['request'].get('intent', {}).get('name')
+            report.mismatches.append({
+                'session_id': session_id(request), 'turn': i,
+                'request_id': request['request']['requestId'], 'intent': intent,
+                'state': policy.state, 'differences': differences})
+    return report
+
+
+_worker_policy_cls = None
+
+
+def _init_worker(policy_cls, setup):
+    global _worker_policy_cls
+    _worker_policy_cls = policy_cls
+    if setup is not None:
+        setup()
+
+
+def _replay_in_worker(sessions: List[List[Turn]]) -> PlaybackReport:
+    report = PlaybackReport()
+    for session in sessions:
+        report.merge(replay_session(_worker_policy_cls, session))
+    return report
+
+
+def _batches(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run(policy_cls, turns: Iterator[Turn], processes: int = None, setup=None,
+        chunksize: int = 16, start_method: str = None) -> PlaybackReport:
+    """
+    Replay the sessions of the turns, with a pool of processes (by default one per CPU) or in this
+    process if processes is 1. policy_cls and setup must be importable by the processes, and setup
+    must prepare them (e.g. replace clients) without relying on state inherited from this process,
+    which they do not have with the spawn and forkserver start methods (see multiprocessing).
+    Sessions are sent to the processes in batches of chunksize, at most two batches per process
+    ahead of the results, so that the turns are only read as fast as they are replayed.
+    """
+    report = PlaybackReport()
+    start = time.perf_counter()
+    sessions = iter_sessions(turns)
+    if processes == 1:
+        _init_worker(policy_cls, setup)
+        for session in sessions:
+            report.merge(replay_session(policy_cls, session))
+    else:
+        context = multiprocessing.get_context(start_method)
+        with context.Pool(processes, _init_worker, (policy_cls, setup)) as pool:
+            max_pending = 2 * (processes or multiprocessing.cpu_count())
+            pending = deque()
+            for batch in _batches(sessions, chunksize):
+                pending.append(pool.apply_async(_replay_in_worker, (batch,)))
+                if len(pending) >= max_pending:
+                    report.merge(pending.popleft().get())
+            while pending:
+                report.merge(pending.popleft().get())
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('policy', help="policy class, as module:class")
+    parser.add_argument('record_file', help="recordings, with their shards")
+    parser.add_argument('--setup', help="function to call in each process first, as module:function")
+    parser.add_argument('--processes', type=int, help="number of processes (default: CPUs)")
+    parser.add_argument('--output', help="json file to write the report to")
+    args = parser.parse_args(argv)
+
+    report = run(import_object(args.policy), iter_requests_responses(args.record_file),
+                 args.processes, import_object(args.setup) if args.setup else None)
+    print(f"{report.sessions} sessions, {report.turns} turns in {report.elapsed:.1f} s"
+          f" ({report.throughput:.0f} turns/s), {len(report.mismatches)} mismatches")
+    for mismatch in report.mismatches[:10]:
+        print(f"{mismatch['session_id']} turn {mismatch['turn']} ({mismatch['intent']}):"
+              f" {mismatch['differences']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report.to_json(), f, indent=2)
+    return 1 if report.mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
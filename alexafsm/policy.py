@@ -1,114 +1,281 @@
 import importlib
+import inspect
 import logging
-import os
-import json
+import time
+import warnings
 
-from transitions import MachineError
+from transitions import Machine, MachineError
 from voicelabs import VoiceInsights
 
 from alexafsm import response
-from alexafsm.session_attributes import SessionAttributes
+from alexafsm.analytics import AnalyticsDispatcher, dispatcher_for
+from alexafsm.conditions import ordered_by_cost
+from alexafsm.engine import TRANSITIONS, TransitionsEngine, build_machine, get_engine, \
+    shared_machine
+from alexafsm.recorder import Recorder
+from alexafsm.serializer import serialize
+from alexafsm.session_attributes import BaseSessionAttributes, Snapshot
+from alexafsm.spans import HYDRATE, PARSE, RESPONSE, TRIGGER, Spans, instrument
 from alexafsm.states import States
+from alexafsm.transition_table import TransitionTable
 
 logger = logging.getLogger(__name__)
 
 
+def _analytics(analytics, voice_insights):
+    """The analytics given to handle, through its deprecated voice_insights argument or not"""
+    if voice_insights is None:
+        return analytics
+    warnings.warn("The voice_insights argument of Policy.handle is deprecated, use analytics",
+                  DeprecationWarning, stacklevel=3)
+    return analytics or voice_insights
+
+
 class Policy:
     """
     Finite state machine that describes how to interact with user.
-    Use a lightweight FSM library at https://github.com/tyarkoni/transitions
+    Use a lightweight FSM library at https://github.com/tyarkoni/transitions, or the native engine
+    in alexafsm.engine (engine='native') to make the transitions
     """
 
     # "Abstract" class properties to be overwritten/set in inherited classes.
     states_cls = None
 
-    def __init__(self, states: States, request: dict = None, with_graph: bool = False):
+    # Name of the engine that makes the transitions, see alexafsm.engine
+    engine = TRANSITIONS
+
+    # Whether candidate transitions are tried in order of the cost of their conditions, rather than
+    # in the order of their declaration, see alexafsm.conditions
+    order_conditions_by_cost = False
+
+    # alexafsm.profiling.TransitionProfile counting the transitions made by policies of this class
+    # (profiling mode), and TransitionProfile by which candidate transitions are ordered
+    profile = None
+    transition_profile = None
+
+    # alexafsm.metrics.Metrics counting the turns handled by policies of this class
+    metrics = None
+
+    # Timing of the stages of handle, for subscribers (shared with subclasses that do not set their
+    # own Spans), see alexafsm.spans
+    spans = Spans()
+    _instrumented = None
+
+    def __init__(self, states: States, request: dict = None, with_graph: bool = False,
+                 engine: str = None):
         self.states = states
         self.state = states.attributes.state
-        state_names, transitions = type(states).get_states_transitions()
-        machine_cls = \
-            importlib.import_module('transitions.extensions').GraphMachine if with_graph else \
-            importlib.import_module('transitions').Machine
-        self.machine = machine_cls(
-            model=self,
-            states=state_names,
-            initial=states.attributes.state,
-            auto_transitions=False
-        )
-
-        for transition in transitions:
-            self.machine.add_transition(**transition)
+        self.transition_table = type(states).get_transition_table()
+        if with_graph:
+            # the graph is drawn for this policy's current state, so it cannot be shared
+            self._machine = build_machine(self.transition_table, states.attributes.state,
+                                          model=self,
+                                          machine_cls=importlib.import_module(
+                                              'transitions.extensions').GraphMachine)
+            self._engine = TransitionsEngine(self.transition_table, self._machine)
+        else:
+            self._machine = None
+            reordered = self.order_conditions_by_cost or self.transition_profile is not None
+            self._engine = get_engine(engine or self.engine, type(states),
+                                      type(self) if reordered else None)
+        # results of the condition methods during the current trigger, see alexafsm.conditions
+        self._condition_cache = {}
+
+    @classmethod
+    def order_transitions(cls, table: TransitionTable) -> TransitionTable:
+        """Order in which this class' policies try the candidate transitions of the table"""
+        if cls.order_conditions_by_cost:
+            table = ordered_by_cost(table, cls)
+        if cls.transition_profile is not None:
+            table = cls.transition_profile.ordered(table)
+        return table
 
     @property
-    def attributes(self) -> SessionAttributes:
+    def machine(self) -> Machine:
+        """The transitions.Machine of this policy, used for graphs, validation and printing"""
+        if self._machine is None:
+            self._machine = shared_machine(type(self.states))
+        return self._machine
+
+    @property
+    def attributes(self) -> BaseSessionAttributes:
         return self.states.attributes
 
     @classmethod
-    def initialize(cls, request: dict = None, with_graph: bool = False):
+    def initialize(cls, request: dict = None, with_graph: bool = False, engine: str = None):
         """Construct a policy in initial state"""
         states = cls.states_cls.from_request(request=request)
-        return cls(states, request, with_graph)
+        return cls(states, request, with_graph, engine=engine)
+
+    def reset(self, request: dict = None):
+        """
+        Rebind this policy to the attributes and state of the given request, or to the initial
+        attributes and state if there is no request, so that the policy can be reused
+        """
+        self.states.attributes = type(self.states.attributes).from_request(request)
+        self.state = self.attributes.state
 
     def get_current_state_response(self) -> response.Response:
         resp_function = getattr(type(self.states), self.state)
-        return resp_function(self.states)
+        if not self.spans.subscribers:
+            return resp_function(self.states)
+        return self.spans.timed(f'{RESPONSE}.{self.state}', resp_function, self.states)
+
+    def trigger(self, intent: str) -> bool:
+        """Make the transition for the given intent from the current state"""
+        self._condition_cache.clear()
+        if self.profile is None:
+            return self._engine.trigger(self, intent)
+        state = self.state
+        transition = self._engine.fire(self, intent)
+        if transition is None:
+            return False
+        self.profile.record(state, intent, transition)
+        return True
+
+    async def trigger_async(self, intent: str) -> bool:
+        """Same as trigger, but prepare and conditions methods may be coroutines"""
+        self._condition_cache.clear()
+        if self.profile is None:
+            return await self._engine.trigger_async(self, intent)
+        state = self.state
+        transition = await self._engine.fire_async(self, intent)
+        if transition is None:
+            return False
+        self.profile.record(state, intent, transition)
+        return True
 
     def execute(self) -> response.Response:
         """Called when the user specifies an intent for this skill"""
         intent = self.attributes.intent
         previous_state = self.state
 
-        # backup attributes in case of invalid FSM transition
-        attributes_backup = self.attributes
-        try:
-            # trigger is added by transitions library
-            self.trigger(intent)
-            current_state = self.state
-            logger.info(f"Changed from {previous_state} to {current_state} through {intent}")
-            self.attributes.state = current_state
-            return self.get_current_state_response()
-        except MachineError as exception:
-            logger.error(str(exception))
-            # reset attributes
-            self.states.attributes = attributes_backup
-            return response.NOT_UNDERSTOOD
-
-    def handle(self, request: dict, voice_insights: VoiceInsights = None,
-               record_filename: str = None):
+        # journal changes to the attributes to roll them back in case of invalid FSM transition
+        with self.attributes.snapshot() as snapshot:
+            try:
+                self.spans.timed(TRIGGER, self.trigger, intent)
+                self._changed_state(previous_state, intent)
+                return self.get_current_state_response()
+            except MachineError as exception:
+                return self._not_understood(exception, snapshot)
+
+    async def execute_async(self) -> response.Response:
+        """Same as execute, but callbacks and state response methods may be coroutines"""
+        intent = self.attributes.intent
+        previous_state = self.state
+
+        # journal changes to the attributes to roll them back in case of invalid FSM transition
+        with self.attributes.snapshot() as snapshot:
+            try:
+                await self.spans.timed(TRIGGER, self.trigger_async, intent)
+                self._changed_state(previous_state, intent)
+                resp = self.get_current_state_response()
+                return await resp if inspect.isawaitable(resp) else resp
+            except MachineError as exception:
+                return self._not_understood(exception, snapshot)
+
+    def _changed_state(self, previous_state: str, intent: str):
+        current_state = self.state
+        logger.info(f"Changed from {previous_state} to {current_state} through {intent}")
+        self.attributes.state = current_state
+        if self.metrics is not None:
+            self.metrics.record_turn(previous_state, intent, current_state)
+
+    def _not_understood(self, exception: MachineError, snapshot: Snapshot) -> response.Response:
+        logger.error(str(exception))
+        # reset attributes, including if a callback replaced them
+        snapshot.rollback()
+        self.states.attributes = snapshot.attributes
+        if self.metrics is not None:
+            self.metrics.record_not_understood(self.state, self.attributes.intent)
+        return response.NOT_UNDERSTOOD
+
+    def handle(self, request: dict, analytics: AnalyticsDispatcher = None,
+               record_filename: str = None, recorder: Recorder = None,
+               voice_insights: VoiceInsights = None):
         """
         Method that handles Alexa post request in json format
 
-        If record_dir is specified, this will record the request in the given directory for later
-        playback for testing purposes
+        If analytics is specified, an event for the request is queued there and sent in the
+        background. A VoiceInsights object is also accepted, its events go through a dispatcher.
+        voice_insights is a deprecated alias of analytics.
+
+        If record_filename is specified, this will append the request and response to the given file
+        for later playback for testing purposes. A recorder does the same from a background thread,
+        with sampling and rotated, per-process files (see alexafsm.recorder).
+        """
+        analytics = _analytics(analytics, voice_insights)
+        start = time.perf_counter() if self.metrics is not None else None
+        if self.spans.subscribers and self._instrumented is not self.spans:
+            instrument(self, self.spans)
+        request_type = self.spans.timed(PARSE, self._start_handling, request)
+        if request_type == 'IntentRequest':
+            self.spans.timed(HYDRATE, self.reset, request)
+            resp = self.execute()._replace(session_attributes=self.states.attributes).end_turn()
+        else:
+            resp = self._non_intent_response(request)
+        self._end_handling(request, resp, analytics, record_filename, recorder)
+        if start is not None:
+            self.metrics.record_request(request_type, self.state, time.perf_counter() - start)
+        return resp
+
+    async def handle_async(self, request: dict, analytics: AnalyticsDispatcher = None,
+                           record_filename: str = None, recorder: Recorder = None,
+                           voice_insights: VoiceInsights = None):
         """
+        Same as handle, for asyncio servers: prepare and conditions methods of the policy, and
+        state response methods, may be coroutines (and can be mixed with regular methods).
+        """
+        analytics = _analytics(analytics, voice_insights)
+        start = time.perf_counter() if self.metrics is not None else None
+        if self.spans.subscribers and self._instrumented is not self.spans:
+            instrument(self, self.spans)
+        request_type = self.spans.timed(PARSE, self._start_handling, request)
+        if request_type == 'IntentRequest':
+            self.spans.timed(HYDRATE, self.reset, request)
+            resp = await self.execute_async()
+            resp = resp._replace(session_attributes=self.states.attributes).end_turn()
+        else:
+            resp = self._non_intent_response(request)
+            if inspect.isawaitable(resp):
+                resp = await resp
+        self._end_handling(request, resp, analytics, record_filename, recorder)
+        if start is not None:
+            self.metrics.record_request(request_type, self.state, time.perf_counter() - start)
+        return resp
+
+    def _start_handling(self, request: dict) -> str:
+        """Log the request and return its type"""
         (req, session) = (request['request'], request['session'])
         logger.info(f"applicationId = {session['application']['applicationId']}")
         request_type = req['type']
         logger.info(
             f"{request_type}, requestId: {req['requestId']}, sessionId: {session['sessionId']}")
+        return request_type
 
-        if voice_insights:
-            app_token = os.environ['VOICELABS_API_KEY']
-            voice_insights.initialize(app_token, session)
-
+    def _non_intent_response(self, request: dict):
+        request_type = request['request']['type']
         if request_type == 'LaunchRequest':
-            resp = self.get_current_state_response()
-        elif request_type == 'IntentRequest':
-            intent = req['intent']
-            self.states.attributes = type(self.states.attributes).from_request(request)
-            self.state = self.attributes.state
-            resp = self.execute()
-            resp = resp._replace(session_attributes=self.states.attributes)
-            if voice_insights:
-                voice_insights.track(intent_name=intent['name'], intent_request=req,
-                                     response=resp.to_json())
+            return self.get_current_state_response()
         elif request_type == 'SessionEndedRequest':
-            resp = response.end(self.states.skill_name)
+            session_store = self.states.session_attributes_cls.session_store
+            if session_store is not None:
+                session_store.delete(request['session']['sessionId'])
+            return response.end(self.states.skill_name)
         else:
             raise Exception(f'Unknown request type {request_type}')
 
-        if record_filename:
-            with open(record_filename, 'a') as record_file:
-                record_file.write(json.dumps([request, resp]) + '\n')
+    def _end_handling(self, request: dict, resp: response.Response,
+                      analytics: AnalyticsDispatcher, record_filename: str, recorder: Recorder):
+        if analytics or recorder:
+            resp_json = resp.to_json()
+            if analytics:
+                if isinstance(analytics, VoiceInsights):
+                    analytics = dispatcher_for(analytics)
+                analytics.submit(request, resp_json)
+            if recorder:
+                recorder.submit(request, resp_json)
 
-        return resp
+        if record_filename:
+            with open(record_filename, 'ab') as record_file:
+                record_file.write(serialize([request, resp.to_json()]) + b'\n')
@@ -0,0 +1,57 @@
+import queue
+from contextlib import contextmanager
+
+from alexafsm.policy import Policy
+
+
+class PolicyPool:
+    """
+    Pool of reusable policies, so that a server does not construct a new policy for every request.
+    Each policy handles at most one request at a time, so a pool can be shared by worker threads.
+    """
+
+    def __init__(self, policy_cls, size: int = 8, **initialize_kwargs):
+        """
+        Pre-build `size` policies with policy_cls.initialize(**initialize_kwargs). When more than
+        `size` requests are handled concurrently, extra policies are built on demand and discarded
+        after use.
+        """
+        self.policy_cls = policy_cls
+        self.initialize_kwargs = initialize_kwargs
+        self._policies = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._policies.put_nowait(self._new_policy())
+
+    def _new_policy(self) -> Policy:
+        return self.policy_cls.initialize(**self.initialize_kwargs)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a policy from the pool, e.g. with pool.acquire() as policy: ..."""
+        try:
+            policy = self._policies.get_nowait()
+        except queue.Empty:
+            policy = self._new_policy()
+        try:
+            yield policy
+        finally:
+            try:
+                self._policies.put_nowait(policy)
+            except queue.Full:
+                pass
+
+    def handle(self, request: dict, *args, **kwargs):
+        """Handle the request with a pooled policy, see Policy.handle"""
+        with self.acquire() as policy:
+            if request['request']['type'] != 'IntentRequest':
+                # Policy.handle rebinds the policy to intent requests only, other requests expect
+                # a policy in initial state
+                policy.reset()
+            return policy.handle(request, *args, **kwargs)
+
+    async def handle_async(self, request: dict, *args, **kwargs):
+        """Handle the request with a pooled policy, see Policy.handle_async"""
+        with self.acquire() as policy:
+            if request['request']['type'] != 'IntentRequest':
+                policy.reset()
+            return await policy.handle_async(request, *args, **kwargs)
@@ -0,0 +1,151 @@
+"""
+Ordering of candidate transitions by how often they fire. When several transitions share a (state,
+trigger), they are tried in the order of their declaration, so the most frequent one may first pay
+for the conditions of every other candidate.
+
+In profiling mode (a `TransitionProfile` as the `profile` of a Policy class), each trigger counts
+the transition that fired, by (state, trigger) and `candidate_key`, which tells apart candidates
+with the same destination. Policies in profiling mode are dispatched from their TransitionTable (see
+`alexafsm.engine`), to know which candidate fired. Profiles are saved as json, e.g. after a load
+test or a playback of recorded traffic, and given back to the Policy class as its
+`transition_profile`, to order its candidates by decreasing frequency:
+
+    profile = TransitionProfile()
+    ProfiledPolicy = type('ProfiledPolicy', (Policy,), {'profile': profile})
+    ...
+    profile.save('transition_profile.json')
+
+    class Policy(PolicyBase):
+        transition_profile = TransitionProfile.load('transition_profile.json')
+
+Only reorderings that cannot change which transition fires are made: candidates with `prepare`
+callbacks or without conditions are never moved, nor are candidates moved across them, and the
+candidates in between are only reordered if they are pairwise mutually exclusive, i.e. each pair
+has a condition that one requires (`conditions`) and the other rules out (`unless`). Conditions are
+assumed to be free of side effects, `prepare` callbacks are not: moving a candidate across one
+would change what it prepared when its conditions are evaluated. Triggers whose candidates all have
+`prepare` callbacks, like NEW_SEARCH in skill search (`m_search`), are therefore not reordered and
+do not benefit. `alexafsm.utils.validate_transition_order` checks the order used by a policy
+against its declaration.
+"""
+
+import json
+import threading
+from collections import Counter
+
+from alexafsm.transition_table import TransitionTable
+
+
+def is_barrier(transition) -> bool:
+    """Whether other candidates can never be moved across this transition"""
+    return bool(transition.prepare) or not (transition.conditions or transition.unless)
+
+
+def mutually_exclusive(transition, other) -> bool:
+    """Whether the two transitions have complementary conditions, so cannot both be taken"""
+    complementary = set(transition.conditions) & set(other.unless)
+    return bool(complementary or set(transition.unless) & set(other.conditions))
+
+
+def candidate_key(transition) -> str:
+    """
+    Key of a candidate transition in profiles: its destination, and its callbacks if any
+    >>> from alexafsm.transition_table import Transition
+    >>> candidate_key(Transition('go', 'a', 'b', ('m_ok', 'm_new'), ('m_done',), ('m_search',),
+    ...                          (), ()))
+    'b prepare m_search if m_ok and m_new unless m_done'
+    """
+    key = transition.dest
+    for name, methods in (('prepare', transition.prepare), ('if', transition.conditions),
+                          ('unless', transition.unless)):
+        if methods:
+            key += f" {name} {' and '.join(methods)}"
+    return key
+
+
+def reorderable(run: list) -> bool:
+    """Whether the candidates are pairwise mutually exclusive, so can be tried in any order"""
+    return all(mutually_exclusive(transition, other)
+               for i, transition in enumerate(run) for other in run[i + 1:])
+
+
+class TransitionProfile:
+    """Number of times each transition fired, by (state, trigger) and candidate_key"""
+
+    def __init__(self, counts: dict = None):
+        # (state, trigger) -> Counter of candidate keys
+        self.counts = {}
+        self._lock = threading.Lock()
+        for (state, trigger), destinations in (counts or {}).items():
+            self.counts[(state, trigger)] = Counter(destinations)
+
+    def record(self, state: str, trigger: str, transition):
+        key = candidate_key(transition)
+        with self._lock:
+            candidates = self.counts.get((state, trigger))
+            if candidates is None:
+                candidates = self.counts[(state, trigger)] = Counter()
+            candidates[key] += 1
+
+    def frequency(self, state: str, trigger: str, transition) -> int:
+        candidates = self.counts.get((state, trigger))
+        return candidates[candidate_key(transition)] if candidates else 0
+
+    def merge(self, other: 'TransitionProfile'):
+        """Add the counts of another profile, e.g. of another process, to this one"""
+        for (state, trigger), candidates in other.counts.items():
+            for key, count in candidates.items():
+                with self._lock:
+                    self.counts.setdefault((state, trigger), Counter())[key] += count
+
+    def to_json(self) -> dict:
+        """Counts as {state: {trigger: {candidate_key: count}}}"""
+        res = {}
+        for (state, trigger), candidates in sorted(self.counts.items()):
+            res.setdefault(state, {})[trigger] = dict(candidates)
+        return res
+
+    @classmethod
+    def from_json(cls, counts: dict) -> 'TransitionProfile':
+        return cls({(state, trigger): candidates
+                    for state, triggers in counts.items()
+                    for trigger, candidates in triggers.items()})
+
+    def save(self, filename: str):
+        with open(filename, 'w') as f:
+            json.dump(self.to_json(), f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename: str) -> 'TransitionProfile':
+        with open(filename) as f:
+            return cls.from_json(json.load(f))
+
+    def ordered(self, table: TransitionTable) -> TransitionTable:
+        """
+        Transition table in which the candidates that can safely be reordered are ordered by
+        decreasing frequency
+        >>> from alexafsm.transition_table import Transition
+        >>> def transition(dest, conditions=(), unless=(), prepare=()):
+        ...     return Transition('go', 'a', dest, conditions, unless, prepare, (), ())
+        >>> table = TransitionTable(['a', 'b', 'c', 'd'], [
+        ...     transition('b', ('m_ok',)), transition('c', unless=('m_ok',)), transition('d')])
+        >>> profile = TransitionProfile({('a', 'go'): {'b if m_ok': 1, 'c unless m_ok': 5,
+        ...                                            'd': 10}})
+        >>> [t.dest for t in profile.ordered(table).get('a', 'go')]
+        ['c', 'b', 'd']
+        """
+        ordered = []
+        for (state, trigger), candidates in table.items():
+            def by_frequency(transition):
+                return -self.frequency(state, trigger, transition)
+
+            run = []
+            for transition in candidates + (None,):
+                if transition is None or is_barrier(transition):
+                    ordered += sorted(run, key=by_frequency) if reorderable(run) else run
+                    run = []
+                    if transition is not None:
+                        ordered.append(transition)
+                else:
+                    run.append(transition)
+        return TransitionTable(table.states, ordered)
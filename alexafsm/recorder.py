@@ -0,0 +1,130 @@
+"""
+Recording of requests and responses for later playback (see test_helpers.get_requests_responses),
+cheap enough to leave on in production: Policy.handle only queues the turn, and a background thread
+writes the queued turns in batches.
+
+Turns are written as json lines to shard files next to the record file, e.g. recording to
+`playback/recordings.json` writes `playback/recordings.<start time in ms>.<pid>.<sequence>.json`.
+Every process writes its own shards, so workers never contend on a file. A shard is closed and a new
+one started when it exceeds max_bytes or gets older than max_age seconds. Shards can be gzipped.
+"""
+
+import gzip
+import os
+import re
+import time
+import zlib
+from typing import List
+
+from alexafsm.analytics import AnalyticsDispatcher, AnalyticsSink, Event
+from alexafsm.serializer import serialize
+
+GZIP_EXTENSION = '.gz'
+
+
+def _split(record_file: str) -> (str, str):
+    """
+    >>> _split('playback/recordings.json')
+    ('playback/recordings', '.json')
+    """
+    return os.path.splitext(record_file)
+
+
+def shard_pattern(record_file: str):
+    """
+    Regular expression matching the names of the shards of the given record file
+    >>> bool(shard_pattern('dir/recordings.json').match('recordings.1490000000000.42.0.json.gz'))
+    True
+    >>> bool(shard_pattern('dir/recordings.json').match('recordings.backup.json'))
+    False
+    """
+    stem, extension = _split(os.path.basename(record_file))
+    return re.compile(rf'^{re.escape(stem)}\.(\d+)\.(\d+)\.(\d+){re.escape(extension)}'
+                      rf'({re.escape(GZIP_EXTENSION)})?$')
+
+
+def shard_files(record_file: str) -> List[str]:
+    """Shards of the given record file, in the order they were started"""
+    directory = os.path.dirname(record_file) or '.'
+    if not os.path.isdir(directory):
+        return []
+    pattern = shard_pattern(record_file)
+    shards = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            start, pid, sequence = (int(group) for group in match.groups()[:3])
+            shards.append(((start, pid, sequence), os.path.join(directory, name)))
+    return [path for _, path in sorted(shards)]
+
+
+def is_sampled(request: dict, sample_rate: float) -> bool:
+    """
+    Whether turns of the request's session are recorded. Sampling is by session, so that sampled
+    conversations are complete.
+    """
+    if sample_rate >= 1:
+        return True
+    session_id = request['session']['sessionId'].encode('utf-8')
+    return zlib.crc32(session_id) / 2 ** 32 < sample_rate
+
+
+class RecordingSink(AnalyticsSink):
+    """Write events as [request, response] json lines to rotated shard files"""
+
+    def __init__(self, record_file: str, max_bytes: int = 64 * 1024 * 1024,
+                 max_age: float = 3600, compress: bool = False):
+        self.record_file = record_file
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.shard = None
+        self._shard_start = 0
+        self._shard_bytes = 0
+        self._sequence = 0
+
+    def _new_shard(self) -> str:
+        stem, extension = _split(self.record_file)
+        self._shard_start = time.time()
+        self._shard_bytes = 0
+        self._sequence += 1
+        suffix = GZIP_EXTENSION if self.compress else ''
+        return f'{stem}.{int(self._shard_start * 1000)}.{os.getpid()}.{self._sequence}' \
+               f'{extension}{suffix}'
+
+    def send(self, events: List[Event]):
+        if self.shard is None or self._shard_bytes >= self.max_bytes or \
+                time.time() - self._shard_start >= self.max_age:
+            self.shard = self._new_shard()
+
+        data = b''.join(serialize([event.request, event.response]) + b'\n' for event in events)
+        if self.compress:
+            # each batch is a complete gzip member, so shards stay readable if the process dies
+            data = gzip.compress(data)
+        with open(self.shard, 'ab') as shard:
+            shard.write(data)
+        self._shard_bytes += len(data)
+
+
+class Recorder(AnalyticsDispatcher):
+    """
+    Buffer turns in memory and write them to rotated shards of record_file from a background thread,
+    at most every flush_interval seconds. Only sessions sampled with sample_rate are recorded.
+    Queued turns are written on close(), which is also called when the interpreter exits.
+
+    Create recorders after forking worker processes: the background thread does not survive a fork.
+    """
+
+    def __init__(self, record_file: str, sample_rate: float = 1.0,
+                 max_bytes: int = 64 * 1024 * 1024, max_age: float = 3600, compress: bool = False,
+                 flush_interval: float = 1.0, max_buffer: int = 100000):
+        os.makedirs(os.path.dirname(record_file) or '.', exist_ok=True)
+        super().__init__(RecordingSink(record_file, max_bytes, max_age, compress),
+                         max_queue_size=max_buffer, batch_size=max_buffer,
+                         max_batch_delay=flush_interval)
+        self.record_file = record_file
+        self.sample_rate = sample_rate
+
+    def submit(self, request: dict, response: dict = None):
+        if is_sampled(request, self.sample_rate):
+            super().submit(request, response)
@@ -1,5 +1,7 @@
 from collections import namedtuple
+from functools import lru_cache
 
+from alexafsm.serializer import serialize
 from alexafsm.session_attributes import SessionAttributes
 
 
@@ -18,6 +20,13 @@ class Response(namedtuple('Response', ['speech', 'card', 'card_content', 'reprom
 
     def to_json(self):
         """Build entire Alexa response as a JSON-serializable dictionary"""
+        return {
+            'version': '1.0',
+            'sessionAttributes': self.__dict__.get('_attributes_json', self.session_attributes),
+            'response': self._response_json()
+        }
+
+    def _response_json(self) -> dict:
         card = None
 
         if self.card:
@@ -55,21 +64,52 @@ class Response(namedtuple('Response', ['speech', 'card', 'card_content', 'reprom
         if not resp['card']:
             del resp['card']
 
-        return {
-            'version': '1.0',
-            'sessionAttributes': self.session_attributes,
-            'response': resp
-        }
+        return resp
+
+    def to_bytes(self) -> bytes:
+        """Entire Alexa response as UTF-8 encoded json, see alexafsm.serializer"""
+        body = self.__dict__.get('_encoded_body')
+        attributes = self.__dict__.get('_attributes_bytes')
+        if body is None and attributes is None:
+            return serialize(self)
+        return b''.join((b'{"version":"1.0","sessionAttributes":',
+                         serialize(self.session_attributes) if attributes is None else attributes,
+                         b',"response":', serialize(self._response_json()) if body is None else body,
+                         b'}'))
+
+    def end_turn(self) -> 'Response':
+        """
+        Encode the session attributes of this response once for the turn (see
+        SessionAttributes.end_turn), for to_json and to_bytes
+        """
+        self._attributes_json, self._attributes_bytes = self.session_attributes.end_turn()
+        return self
+
+    def pre_encoded(self) -> 'Response':
+        """
+        Serialize everything but the session attributes once, so that to_bytes only has to encode
+        the session attributes of this response and of the copies made with _replace
+        """
+        if '_encoded_body' not in self.__dict__:
+            self._encoded_body = serialize(self._response_json())
+        return self
+
+    def _replace(self, **kwargs) -> 'Response':
+        replaced = super()._replace(**kwargs)
+        if '_encoded_body' in self.__dict__ and kwargs.keys() <= {'session_attributes'}:
+            replaced._encoded_body = self._encoded_body
+        return replaced
 
 
+@lru_cache(maxsize=None)
 def end(skill_name: str) -> Response:
     return Response(
         speech=f"Thank you for using {skill_name}",
         reprompt="",
-        should_end=True)
+        should_end=True).pre_encoded()
 
 
 NOT_UNDERSTOOD = Response(
     speech="I did not understand your response, please say it differently.",
     reprompt="Please respond in a different way."
-)
+).pre_encoded()
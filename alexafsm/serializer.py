@@ -0,0 +1,94 @@
+"""
+Direct serialization of responses (and other objects with a `to_json()` method) to json bytes.
+
+Unlike `alexafsm.make_json_serializable`, this does not patch the json module, so other `json.dumps`
+calls in the process are not affected, and it does not copy the object tree before encoding it:
+objects are converted by the encoder itself as it reaches them, through a per-class table of
+encoders. orjson is used when it is installed, the standard json module otherwise.
+
+Tuples (including namedtuples such as slots) are encoded as lists. With the standard json module,
+a tuple subclass that has a `to_json()` method is encoded as a list too unless it is the object
+being serialized, e.g. a Response.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ORJSON = 'orjson'
+JSON = 'json'
+BACKEND = ORJSON if orjson else JSON
+
+# class -> function returning a json-serializable representation of its instances, as registered
+# with register_encoder, and as resolved for every class encoded so far
+_registered = {}
+_encoders = {}
+
+
+def register_encoder(cls, encoder):
+    """Encode instances of cls (and its subclasses without their own encoder) with encoder"""
+    _registered[cls] = encoder
+    _encoders.clear()
+
+
+def _no_encoder(obj):
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _encoder_for(cls):
+    for base in cls.__mro__:
+        if base in _registered:
+            return _registered[base]
+        if 'to_json' in base.__dict__:
+            return base.to_json
+    if issubclass(cls, tuple):
+        return list
+    return _no_encoder
+
+
+def _default(obj):
+    cls = type(obj)
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        encoder = _encoder_for(cls)
+        _encoders[cls] = encoder
+    return encoder(obj)
+
+
+def _original_iterencode():
+    """
+    JSONEncoder.iterencode as defined by the json module: make_json_serializable replaces it with
+    one that copies the whole object tree before encoding it, and saves the original (bound to an
+    encoder instance) on the replacement.
+    """
+    iterencode = json.JSONEncoder.iterencode
+    patched = getattr(iterencode, 'iterencode', None)
+    return patched.__func__ if patched is not None else iterencode
+
+
+class _JSONEncoder(json.JSONEncoder):
+    iterencode = _original_iterencode()
+
+
+_json_encoder = _JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def serialize(obj, backend: str = None) -> bytes:
+    """
+    UTF-8 encoded json of obj, calling `to_json()` on the objects that have one
+    >>> from collections import namedtuple
+    >>> serialize({'slots': namedtuple('Slots', ['query'])('pizza')}, backend=JSON)
+    b'{"slots":["pizza"]}'
+    """
+    if hasattr(obj, 'to_json'):
+        obj = obj.to_json()
+    backend = backend or BACKEND
+    if backend == ORJSON:
+        return orjson.dumps(obj, default=_default)
+    elif backend == JSON:
+        return _json_encoder.encode(obj).encode('utf-8')
+    else:
+        raise ValueError(f"Unknown json backend {backend}, expected one of: {ORJSON}, {JSON}")
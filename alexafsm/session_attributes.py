@@ -1,8 +1,206 @@
+import logging
+
+from alexafsm.attributes_codec import PACKED_KEY, unpack
+from alexafsm.serializer import serialize
+from alexafsm.slots import slot_extractor
+
+logger = logging.getLogger(__name__)
+
 INITIAL_STATE = 'initial'
+# attribute sent to Alexa in place of the stored fields, with the key of the stored fields
+STORED_KEY = '_stored'
+# attribute holding the session id, never sent to Alexa
+SESSION_ID = '_session_id'
+# attribute holding the snapshot journaling the attributes, never sent to Alexa
+JOURNAL = '_journal'
+_NOT_SENT = {SESSION_ID, JOURNAL}
+# journaled value of fields that were not set
+_MISSING = object()
 
 
-class SessionAttributes:
-    """Base class for all session attributes that keep track of the state of conversation"""
+class _Raw:
+    """Json value of a lazy field, as received from Alexa"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Packed:
+    """
+    Packed string of the fields of a codec, as received from Alexa, only unpacked when one of the
+    fields is first read
+    """
+    __slots__ = ('value', '_fields')
+
+    def __init__(self, value: str):
+        self.value = value
+        self._fields = None
+
+    def fields(self) -> dict:
+        if self._fields is None:
+            self._fields = unpack(self.value)
+        return self._fields
+
+
+class LazyField:
+    """
+    Field of session attributes that is only converted from json by parse (e.g. into objects) when
+    it is first read. Until then, from_request keeps the json value received from Alexa, and
+    to_json sends it back unchanged, so turns that do not read the field do not pay for it.
+
+        class SessionAttributes(SessionAttributesBase):
+            skills = LazyField(lambda skills: [Skill.from_es(skill) for skill in skills])
+
+    Values assigned to the field (e.g. in __init__) are taken as they are.
+
+    When all the fields packed by the codec of the class are lazy, the packed string is not even
+    unpacked until one of them is read, and it is sent back as received if none of them is read or
+    assigned.
+    """
+
+    def __init__(self, parse):
+        self.parse = parse
+        self.name = None
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.name)
+        if type(value) is _Packed:
+            value = value.fields().get(self.name)
+            value = instance.__dict__[self.name] = None if value is None else self.parse(value)
+        elif type(value) is _Raw:
+            value = instance.__dict__[self.name] = self.parse(value.value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+
+def _current_value(attributes, name: str):
+    """Value of the field as stored, i.e. without parsing lazy fields"""
+    if name in type(attributes)._descriptor_fields:
+        return getattr(attributes, name, _MISSING)  # __slots__ and properties
+    return getattr(attributes, '__dict__', {}).get(name, _MISSING)
+
+
+def _journaled_setattr(self, name: str, value):
+    snapshot = object.__getattribute__(self, JOURNAL)
+    snapshot.changes += 1
+    if name not in snapshot.journal:
+        snapshot.journal[name] = _current_value(self, name)
+    object.__setattr__(self, name, value)
+
+
+def _journaled_delattr(self, name: str):
+    snapshot = object.__getattribute__(self, JOURNAL)
+    snapshot.changes += 1
+    if name not in snapshot.journal:
+        snapshot.journal[name] = _current_value(self, name)
+    object.__delattr__(self, name)
+
+
+def _descriptor_fields(cls) -> frozenset:
+    """Names of the fields of cls that are not stored in the instance __dict__ (e.g. __slots__)"""
+    descriptors = {name: getattr(cls, name) for name in dir(cls)}
+    return frozenset(name for name, descriptor in descriptors.items()
+                     if hasattr(descriptor, '__set__') and not isinstance(descriptor, LazyField))
+
+
+def _journaling_cls(cls) -> type:
+    """Subclass of cls (with the same layout) journaling the fields assigned to its instances"""
+    journaling_cls = cls.__dict__.get('_journaling_cls')
+    if journaling_cls is None:
+        journaling_cls = type(cls.__name__, (cls,), {
+            '__slots__': (),
+            '__module__': cls.__module__,
+            '__qualname__': cls.__qualname__,
+            '__setattr__': _journaled_setattr,
+            '__delattr__': _journaled_delattr,
+            '_descriptor_fields': _descriptor_fields(cls),
+            '_journaling': True
+        })
+        cls._journaling_cls = journaling_cls
+    return journaling_cls
+
+
+class Snapshot:
+    """
+    Copy-on-write snapshot of session attributes: from its creation until it is released, the
+    previous value of each field that is assigned (or deleted) is journaled, the first time only,
+    so that rollback can restore it. Neither the fields that do not change nor the values of the
+    fields are copied, which makes the snapshot cheap whatever the size of the attributes; on the
+    other hand, changes made in place (e.g. appending to a list field) are not journaled.
+
+    >>> attributes = SessionAttributes(intent='Search')
+    >>> with attributes.snapshot() as snapshot:
+    ...     attributes.intent = 'Help'
+    ...     attributes.state = 'helping'
+    ...     snapshot.rollback()
+    >>> attributes.intent, attributes.state
+    ('Search', 'initial')
+
+    While journaling, the class of the attributes is a journaling subclass of theirs, so that
+    assigning fields costs nothing more the rest of the time. `changes` counts the assignments,
+    e.g. to tell whether values computed from the attributes are still valid.
+    """
+
+    def __init__(self, attributes: 'BaseSessionAttributes'):
+        if '_journaling' in type(attributes).__dict__:
+            raise RuntimeError("Session attributes already have a snapshot")
+        self.attributes = attributes
+        self.attributes_cls = type(attributes)
+        self.journal = {}
+        self.changes = 0
+        object.__setattr__(attributes, JOURNAL, self)
+        attributes.__class__ = _journaling_cls(self.attributes_cls)
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @property
+    def changed_fields(self) -> list:
+        """Names of the fields assigned since the snapshot"""
+        return list(self.journal)
+
+    def release(self):
+        """Stop journaling, keeping the changes"""
+        attributes = self.attributes
+        if type(attributes) is not self.attributes_cls:
+            object.__setattr__(attributes, '__class__', self.attributes_cls)
+            object.__delattr__(attributes, JOURNAL)
+
+    def rollback(self):
+        """Stop journaling, and restore the fields assigned since the snapshot"""
+        self.release()
+        attributes = self.attributes
+        for name, value in self.journal.items():
+            if value is not _MISSING:
+                object.__setattr__(attributes, name, value)
+            elif name in getattr(attributes, '__dict__', ()):
+                del attributes.__dict__[name]
+            else:
+                try:
+                    object.__delattr__(attributes, name)  # __slots__
+                except AttributeError:
+                    pass
+        self.journal = {}
+
+
+class BaseSessionAttributes:
+    """
+    Behavior of all session attributes, without instance storage (`__slots__ = ()`), so that
+    subclasses declaring `__slots__` (see alexafsm.attributes_schema) have no instance `__dict__`.
+    Subclasses define `from_request` and the fields sent to Alexa (`_fields_json`).
+    """
+    __slots__ = ()
 
     # "Abstract" class properties to be overridden/set in inherited classes
     # Inherited classes should override this like so:
@@ -14,6 +212,87 @@ class SessionAttributes:
     # List of (big) fields we don't want to send back to Alexa
     not_sent_fields = []
 
+    # Optional alexafsm.attributes_codec.AttributesCodec that packs (big) fields sent to Alexa
+    codec = None
+
+    # Snapshot journaling changes to the attributes, while there is one, see snapshot
+    _journal = None
+
+    # Id of the session, only set if there is a session store
+    _session_id = None
+
+    # Optional alexafsm.session_store.SessionStore that keeps the given (big) fields server-side,
+    # instead of sending them to Alexa
+    session_store = None
+    stored_fields = []
+
+    def snapshot(self) -> Snapshot:
+        """Start journaling changes to these attributes, to be able to roll them back"""
+        return Snapshot(self)
+
+    def to_json(self) -> dict:
+        """
+        When sending the payload to Alexa, do not send fields that are too big, send a reference to
+        the stored fields instead of them if there is a session store, and pack the fields of the
+        codec if there is one. This has no side effects, see end_turn.
+        """
+        attributes, _ = self._without_stored_fields(self._fields_json())
+        return self.codec.encode(attributes) if self.codec else attributes
+
+    def end_turn(self) -> (dict, bytes):
+        """
+        Same as to_json, with the json of the attributes. Called by Policy.handle once per turn, for
+        the attributes of its response, to write the stored fields to the session store and record
+        the size of the attributes in the stats of the codec.
+        """
+        attributes, stored = self._without_stored_fields(self._fields_json())
+        if stored:
+            self.session_store.put(self._session_id, stored)
+        if self.codec is None:
+            return attributes, serialize(attributes)
+        encoding = self.codec.encoding(attributes)
+        self.codec.record(encoding)
+        return encoding.attributes, encoding.data
+
+    def _fields_json(self) -> dict:
+        """Fields to send to Alexa (or to store), before the session store and the codec"""
+        raise NotImplementedError
+
+    def _without_stored_fields(self, attributes: dict) -> (dict, dict):
+        """Attributes with the key of their stored fields instead of them, and the stored fields"""
+        session_id = self._session_id
+        stored = {}
+        if self.session_store is not None and session_id:
+            stored = {k: attributes.pop(k) for k in self.stored_fields if k in attributes}
+            if stored:
+                attributes[STORED_KEY] = session_id
+        return attributes, stored
+
+    @classmethod
+    def _request_attributes(cls, request: dict, unpack: bool = True) -> dict:
+        """Session attributes of the request, unpacked (unless not to) and with their stored fields"""
+        attributes = request['session'].get('attributes', {})
+        if cls.codec and unpack:
+            attributes = cls.codec.decode(attributes)
+        if STORED_KEY in attributes:
+            attributes = cls._with_stored_fields(attributes)
+        return attributes
+
+    @classmethod
+    def _with_stored_fields(cls, attributes: dict) -> dict:
+        attributes = dict(attributes)
+        key = attributes.pop(STORED_KEY)
+        stored = cls.session_store.get(key) if cls.session_store is not None else None
+        if stored is None:
+            logger.warning(f"Stored session attributes of session {key} are missing (expired?)")
+        else:
+            attributes.update(stored)
+        return attributes
+
+
+class SessionAttributes(BaseSessionAttributes):
+    """Base class for all session attributes that keep track of the state of conversation"""
+
     def __init__(self, intent: str = None, slots=None, state: str = INITIAL_STATE):
         self.intent = intent
         self.slots = slots
@@ -22,12 +301,26 @@ class SessionAttributes:
     @classmethod
     def from_request(cls, request: dict) -> 'SessionAttributes':
         """Construct session attributes object from request"""
-        slots_cls = cls.slots_cls
-        none_slots = _slots_from_dict(slots_cls, slots=None)
+        extract_slots = slot_extractor(cls.slots_cls)
         if not request:
-            return cls(slots=none_slots)
+            return cls(slots=extract_slots(None))
 
-        res = cls(**(request['session'].get('attributes', {})))
+        packed_lazily = cls._packed_lazily()
+        attributes = cls._request_attributes(request, unpack=not packed_lazily)
+        lazy_fields = [name for name in cls._lazy_fields() if attributes.get(name) is not None]
+        packed = attributes.get(PACKED_KEY) if packed_lazily else None
+        if lazy_fields or packed is not None:
+            attributes = dict(attributes)
+            attributes.pop(PACKED_KEY, None)
+            raw_values = [(name, _Raw(attributes.pop(name))) for name in lazy_fields]
+            if packed is not None:
+                packed = _Packed(packed)
+                raw_values += [(name, packed) for name in cls.codec.fields]
+        res = cls(**attributes)
+        if lazy_fields or packed is not None:
+            res.__dict__.update(raw_values)
+        if cls.session_store is not None:
+            setattr(res, SESSION_ID, request['session']['sessionId'])
 
         if 'intent' not in request['request']:  # e.g., when starting skill at beginning of session
             return res
@@ -36,28 +329,48 @@ class SessionAttributes:
         if res.state is None:
             res.state = INITIAL_STATE
 
-        # namedtuple deserialization from list of values
-        old_slots = slots_cls._make(res.slots) if res.slots else none_slots
-
-        # Construct new slots from the request
-        new_slots = _slots_from_dict(slots_cls, intent.get('slots'))
-
         # Update the slots attribute, using new slot values regardless if they exist or not (skill
         # should be able to tell if Amazon successfully extracted the intent slot or not)
-        def _extract(f):
-            v = getattr(new_slots, f)
-            return v
-
-        res.slots = slots_cls(**{f: _extract(f) for f in old_slots._fields})
+        res.slots = extract_slots(intent.get('slots'))
 
         return res
 
-    def to_json(self) -> dict:
-        """
-        When sending the payload to Alexa, do not send fields that are too big.
-        """
-        return {k: v for k, v in self.__dict__.items()
-                if k not in self.not_sent_fields and v is not None}
+    def _fields_json(self) -> dict:
+        """Fields to send to Alexa (or to store), before the session store and the codec"""
+        attributes = {k: v.value if type(v) is _Raw else v for k, v in self.__dict__.items()
+                      if k not in self.not_sent_fields and k not in _NOT_SENT and v is not None}
+        packed = next((v for v in attributes.values() if type(v) is _Packed), None)
+        if packed is None:
+            return attributes
+        if all(attributes.get(name) is packed for name in self.codec.fields):
+            # none of the packed fields was read or assigned: send them back as received
+            for name in self.codec.fields:
+                del attributes[name]
+            attributes[PACKED_KEY] = packed.value
+            return attributes
+        for name in self.codec.fields:
+            if attributes.get(name) is packed:
+                value = packed.fields().get(name)
+                if value is None:
+                    del attributes[name]
+                else:
+                    attributes[name] = value
+        return attributes
+
+    @classmethod
+    def _packed_lazily(cls) -> bool:
+        """Whether all the fields packed by the codec are lazy, see LazyField"""
+        return cls.codec is not None and cls.codec.fields <= set(cls._lazy_fields())
+
+    @classmethod
+    def _lazy_fields(cls) -> tuple:
+        """Names of the LazyField attributes of this class"""
+        # look in the class' own __dict__ so that subclasses do not pick up their parent's fields
+        names = cls.__dict__.get('_lazy_field_names')
+        if names is None:
+            names = tuple(name for name in dir(cls) if isinstance(getattr(cls, name), LazyField))
+            cls._lazy_field_names = names
+        return names
 
 
 def _slots_from_dict(slots_cls, slots: dict):
@@ -73,12 +386,4 @@ def _slots_from_dict(slots_cls, slots: dict):
     >>> _slots_from_dict(Slots, {})
     Slots(love=None, money=None)
     """
-
-    def _value_of(some_dict: dict) -> str:
-        return some_dict['value'] if some_dict and 'value' in some_dict else None
-
-    # Construct a dict with lower-cased slotnames as keys and values as values
-    kwargs = dict((k.lower(), _value_of(v)) for k, v in slots.items()) if slots else {}
-
-    # Construct a not-None namedtuple Slot object where attributes can be None
-    return slots_cls(**{field: kwargs.get(field, None) for field in slots_cls._fields})
+    return slot_extractor(slots_cls)(slots)
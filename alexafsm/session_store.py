@@ -0,0 +1,151 @@
+"""
+Server-side storage of (big) session attributes, keyed by Alexa's sessionId. Fields listed in
+`SessionAttributes.stored_fields` are written to the class' `session_store` once per turn, when
+Policy.handle produces its response (see SessionAttributes.end_turn), and only a reference to the
+stored fields is sent; they are read back from the store when the next request of the session
+arrives. Policy.handle deletes the stored fields of a session
+when Alexa ends it (SessionEndedRequest). Other sessions expire after a time to live.
+
+Stored fields are kept in their json representation, so they are read back exactly as if they had
+been sent to Alexa.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from alexafsm.serializer import serialize
+
+
+class SessionStore:
+    """Fields of the session attributes of each session"""
+
+    def get(self, session_id: str) -> dict:
+        """Stored fields of the session, None if they were not stored or have expired"""
+        raise NotImplementedError
+
+    def put(self, session_id: str, fields: dict):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store holding at most max_sessions sessions (and, if given, max_bytes bytes of
+    fields), evicting the least recently used ones first. Sessions expire ttl seconds after they
+    were last used.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600, max_bytes: int = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evicted = 0
+        self.expired = 0
+        # session id -> (expiry time, json encoded fields), least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> dict:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < now:
+                self._remove(session_id)
+                self.expired += 1
+                return None
+            self._sessions[session_id] = (now + self.ttl, data)
+            self._sessions.move_to_end(session_id)
+        return json.loads(data.decode('utf-8'))
+
+    def put(self, session_id: str, fields: dict):
+        data = serialize(fields)
+        now = time.time()
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = (now + self.ttl, data)
+            self.size_bytes += len(data)
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1])
+
+    def _evict(self, now: float):
+        # expiry times grow with recency, so expired sessions are the least recently used ones
+        while self._sessions:
+            session_id, (expires, _) = next(iter(self._sessions.items()))
+            if expires < now:
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions or \
+                    (self.max_bytes is not None and self.size_bytes > self.max_bytes):
+                self.evicted += 1
+            else:
+                break
+            self._remove(session_id)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store in a SQLite database, shared by the processes of a host. Sessions expire ttl seconds
+    after they were last written; expired sessions are deleted at most every purge_interval seconds.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, purge_interval: float = 60,
+                 timeout: float = 5.0):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.timeout = timeout
+        self._local = threading.local()
+        self._last_purge = 0
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS sessions '
+                               '(session_id TEXT PRIMARY KEY, expires REAL, fields BLOB)')
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread (sqlite3 connections cannot be shared by threads)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, session_id: str) -> dict:
+        row = self._connection().execute(
+            'SELECT fields FROM sessions WHERE session_id = ? AND expires >= ?',
+            (session_id, time.time())).fetchone()
+        return json.loads(row[0].decode('utf-8')) if row else None
+
+    def put(self, session_id: str, fields: dict):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)',
+                               (session_id, now + self.ttl, serialize(fields)))
+            if now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                connection.execute('DELETE FROM sessions WHERE expires < ?', (now,))
+
+    def delete(self, session_id: str):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
@@ -0,0 +1,128 @@
+"""
+Extraction of the slots of an intent request into a Slots namedtuple. One extractor function is
+generated per Slots class, the first time it is used: Alexa's slot names are mapped to tuple
+positions once (case insensitively), and the namedtuple is built with a single `_make` call.
+
+Slots classes can declare, as class attributes:
+
+* `slot_types`: conversion function by field, e.g. `{'count': int}`. Values that cannot be
+  converted (ValueError/TypeError) are None.
+* `resolved_slots`: fields whose value is the canonical name found by entity resolution, when
+  Alexa matched the spoken value to one, rather than the value as spoken.
+
+    class Slots(namedtuple('Slots', ['color', 'count'])):
+        __slots__ = ()
+        slot_types = {'count': int}
+        resolved_slots = ['color']
+"""
+
+import threading
+
+# Slots class -> extractor function
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+ER_SUCCESS_MATCH = 'ER_SUCCESS_MATCH'
+
+# spellings (e.g. 'Query', 'query') of the name of each field whose position an extractor keeps
+MAX_SPELLINGS = 4
+
+
+def slot_value(slot: dict):
+    """Value of a slot of an intent request"""
+    return slot.get('value') if slot else None
+
+
+def resolved_value(slot: dict):
+    """
+    Canonical name of the first entity resolution match of a slot, its value if there is none
+    >>> slot = {'name': 'Color', 'value': 'crimson', 'resolutions': {'resolutionsPerAuthority': [
+    ...     {'status': {'code': 'ER_SUCCESS_MATCH'}, 'values': [{'value': {'name': 'red'}}]}]}}
+    >>> resolved_value(slot)
+    'red'
+    >>> resolved_value({'name': 'Color', 'value': 'crimson'})
+    'crimson'
+    """
+    if not slot:
+        return None
+    for authority in slot.get('resolutions', {}).get('resolutionsPerAuthority', ()):
+        if authority['status']['code'] == ER_SUCCESS_MATCH and authority.get('values'):
+            return authority['values'][0]['value']['name']
+    return slot.get('value')
+
+
+def _coerce(convert):
+    def coerce(value):
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except (ValueError, TypeError):
+            return None
+
+    return coerce
+
+
+def _make_extractor(slots_cls):
+    fields = slots_cls._fields
+    size = len(fields)
+    field_positions = {field: position for position, field in enumerate(fields)}
+    none_slots = slots_cls._make([None] * size)
+    resolved = set(getattr(slots_cls, 'resolved_slots', ()))
+    types = getattr(slots_cls, 'slot_types', {})
+    unknown = set(resolved).union(types).difference(fields)
+    assert not unknown, f"Unknown slots {unknown} in {slots_cls.__name__}"
+
+    # expression of the value of each field, from the request's slot at its position
+    namespace = {'_make': slots_cls._make, 'slot_value': slot_value,
+                 'resolved_value': resolved_value}
+    values = []
+    for position, field in enumerate(fields):
+        value = f"{'resolved_value' if field in resolved else 'slot_value'}(raw[{position}])"
+        if field in types:
+            namespace[f'_coerce_{position}'] = _coerce(types[field])
+            value = f'_coerce_{position}({value})'
+        values.append(value)
+    exec(f"def make(raw):\n    return _make(({', '.join(values)}{',' if size == 1 else ''}))\n",
+         namespace)
+    make = namespace['make']
+
+    # Alexa slot name -> position in the tuple, filled as names are seen. Names come from requests,
+    # so only the names of fields are kept, in at most MAX_SPELLINGS spellings each
+    positions = {}
+    max_positions = MAX_SPELLINGS * size
+
+    def extract(slots: dict):
+        if not slots:
+            return none_slots
+        raw = [None] * size
+        for name, slot in slots.items():
+            position = positions.get(name)
+            if position is None:
+                position = field_positions.get(name.lower())
+                if position is None:
+                    continue
+                if len(positions) < max_positions:
+                    positions[name] = position
+            raw[position] = slot
+        return make(raw)
+
+    return extract
+
+
+def slot_extractor(slots_cls):
+    """
+    Function building a slots_cls from the slots of an intent request
+    >>> from collections import namedtuple
+    >>> class Slots(namedtuple('Slots', ['love', 'money'])):
+    ...     slot_types = {'money': int}
+    >>> slot_extractor(Slots)({'Love': {'name': 'Love'}, 'Money': {'name': 'Money', 'value': '3'}})
+    Slots(love=None, money=3)
+    """
+    extractor = _extractors.get(slots_cls)
+    if extractor is None:
+        with _extractors_lock:
+            extractor = _extractors.get(slots_cls)
+            if extractor is None:
+                extractor = _extractors[slots_cls] = _make_extractor(slots_cls)
+    return extractor
@@ -0,0 +1,209 @@
+"""
+Timing of the stages of Policy.handle, for subscribers to the `spans` of a Policy class:
+
+* `parse`: reading the request (Policy._start_handling)
+* `hydrate`: parsing the session attributes (Policy.reset)
+* `trigger`: the transition, including its callbacks
+* `prepare.<method>`, `condition.<method>`: each prepare and condition (or unless) callback
+* `response.<state>`: the response function of the state
+* `serialize`: serialization of the response, for servers timing it with `spans.timed`
+
+Subscribers are functions called with the name of the stage and its duration in seconds, from the
+thread handling the request:
+
+    aggregator = Policy.spans.subscribe(HistogramAggregator())
+    ...
+    print(aggregator.report())
+
+Without subscribers, handling a request only checks that there are none: callbacks are wrapped (per
+policy, as instance attributes) the first time a policy handles a request while there are some.
+Spans are inclusive, e.g. a condition that calls another one includes its duration.
+"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+
+PARSE = 'parse'
+HYDRATE = 'hydrate'
+TRIGGER = 'trigger'
+PREPARE = 'prepare'
+CONDITION = 'condition'
+RESPONSE = 'response'
+SERIALIZE = 'serialize'
+
+
+class Spans:
+    """Subscribers to the timing of the stages of Policy.handle"""
+
+    def __init__(self):
+        self.subscribers = ()
+
+    def __bool__(self):
+        return bool(self.subscribers)
+
+    def subscribe(self, subscriber):
+        """Call subscriber(stage, seconds) for every stage from now on, return the subscriber"""
+        self.subscribers += (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers = tuple(s for s in self.subscribers if s is not subscriber)
+
+    def emit(self, stage: str, seconds: float):
+        for subscriber in self.subscribers:
+            subscriber(stage, seconds)
+
+    def lap(self, stage: str, start: float) -> float:
+        """Emit the time since start for the stage, and return the current time"""
+        now = time.perf_counter()
+        self.emit(stage, now - start)
+        return now
+
+    def timed(self, stage: str, function, *args):
+        """
+        function(*args), timed as the given stage if there are subscribers. If it returns an
+        awaitable, the time until the awaitable is done is the time of the stage.
+        """
+        if not self.subscribers:
+            return function(*args)
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        except BaseException:
+            self.lap(stage, start)
+            raise
+        if inspect.isawaitable(result):
+            return self._timed_await(stage, result, start)
+        self.lap(stage, start)
+        return result
+
+    async def _timed_await(self, stage: str, awaitable, start: float):
+        try:
+            return await awaitable
+        finally:
+            self.lap(stage, start)
+
+    def wrap(self, stage: str, function):
+        """function timed as the given stage"""
+        @functools.wraps(function)
+        def timed(*args):
+            return self.timed(stage, function, *args)
+
+        return timed
+
+
+def instrument(policy, spans: Spans):
+    """Time the prepare and condition callbacks of the policy's transitions with the spans"""
+    names = {}
+    for transition in policy._engine.table.transitions:
+        names.update((name, PREPARE) for name in transition.prepare)
+        names.update((name, CONDITION) for name in transition.conditions + transition.unless)
+    for name, kind in names.items():
+        setattr(policy, name, spans.wrap(f'{kind}.{name}', getattr(policy, name)))
+    policy._instrumented = spans
+
+
+class Histogram:
+    """
+    Durations in buckets growing exponentially (by 2 ** (1 / 4), about 19%) from 1 microsecond,
+    from which percentiles are estimated within a bucket
+    >>> histogram = Histogram()
+    >>> for ms in range(1, 101):
+    ...     histogram.add(ms / 1000)
+    >>> histogram.count, round(histogram.total, 3), histogram.max
+    (100, 5.05, 0.1)
+    >>> 0.05 <= histogram.percentile(50) < 0.05 * 1.19
+    True
+    """
+
+    BUCKETS_PER_DOUBLING = 4
+    MIN_SECONDS = 1e-6
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def bucket(cls, seconds: float) -> int:
+        if seconds <= cls.MIN_SECONDS:
+            return 0
+        return int(math.log2(seconds / cls.MIN_SECONDS) * cls.BUCKETS_PER_DOUBLING) + 1
+
+    @classmethod
+    def upper_bound(cls, bucket: int) -> float:
+        """Largest duration in the bucket, in seconds"""
+        return cls.MIN_SECONDS * 2 ** (bucket / cls.BUCKETS_PER_DOUBLING)
+
+    def add(self, seconds: float):
+        bucket = self.bucket(seconds)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'Histogram'):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket of the p-th percentile (0-100), at most the maximum"""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {'count': self.count, 'total_ms': self.total * 1e3,
+                'mean_us': self.total / self.count * 1e6 if self.count else 0.0,
+                'p50_us': self.percentile(50) * 1e6, 'p99_us': self.percentile(99) * 1e6,
+                'max_us': self.max * 1e6}
+
+
+class HistogramAggregator:
+    """Subscriber keeping a Histogram of the durations of each stage, in memory"""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.add(seconds)
+
+    def clear(self):
+        with self._lock:
+            self.histograms = {}
+
+    def summary(self) -> dict:
+        """Statistics of each stage, by stage"""
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def report(self) -> str:
+        """Table of the statistics of the stages, by decreasing total time"""
+        summary = sorted(self.summary().items(), key=lambda item: -item[1]['total_ms'])
+        width = max([len(stage) for stage, _ in summary] + [5])
+        lines = [f"{'stage':<{width}} {'count':>8} {'total ms':>10} {'mean us':>10}"
+                 f" {'p50 us':>10} {'p99 us':>10}"]
+        for stage, stats in summary:
+            lines.append(f"{stage:<{width}} {stats['count']:>8} {stats['total_ms']:>10.2f}"
+                         f" {stats['mean_us']:>10.2f} {stats['p50_us']:>10.2f}"
+                         f" {stats['p99_us']:>10.2f}")
+        return '\n'.join(lines)
@@ -1,6 +1,10 @@
+import functools
 import inspect
+import threading
+from collections import OrderedDict
 
-from alexafsm.session_attributes import SessionAttributes, INITIAL_STATE
+from alexafsm.session_attributes import BaseSessionAttributes, INITIAL_STATE
+from alexafsm.transition_table import TransitionTable
 
 TRANSITIONS = 'transitions'
 
@@ -11,6 +15,7 @@ def with_transitions(*transitions):
     """
 
     def decorate(state):
+        @functools.wraps(state)
         def transition_enabled_state(*args):
             return state(*args)
 
@@ -32,6 +37,85 @@ def with_transitions(*transitions):
     return decorate
 
 
+class ResponseCache:
+    """Least recently used responses of a state, by key, with hit and miss counts"""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            resp = self._responses.get(key)
+            if resp is None:
+                self.misses += 1
+            else:
+                self._responses.move_to_end(key)
+                self.hits += 1
+            return resp
+
+    def put(self, key, resp):
+        with self._lock:
+            self._responses[key] = resp
+            if len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._responses)
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self),
+                'maxsize': self.maxsize}
+
+
+def cacheable(key=None, maxsize: int = 128):
+    """
+    Cache the responses of a state whose response only depends on key(attributes), or on nothing
+    if there is no key, and on the States class (e.g. its skill_name). Cached responses are pre-encoded (see Response.pre_encoded), so sending one
+    again only encodes the session attributes. The state must not modify the attributes.
+    The cache is available as the `cache` attribute of the state, see also States.cache_info.
+    """
+
+    def decorate(state):
+        cache = ResponseCache(maxsize)
+
+        def cache_key(states):
+            # subclasses may override what the response is built from, e.g. skill_name
+            return type(states), key(states.attributes) if key else None
+
+        if inspect.iscoroutinefunction(state):
+            @functools.wraps(state)
+            async def cached_state(states):
+                k = cache_key(states)
+                resp = cache.get(k)
+                if resp is None:
+                    resp = (await state(states)).pre_encoded()
+                    cache.put(k, resp)
+                return resp
+        else:
+            @functools.wraps(state)
+            def cached_state(states):
+                k = cache_key(states)
+                resp = cache.get(k)
+                if resp is None:
+                    resp = state(states).pre_encoded()
+                    cache.put(k, resp)
+                return resp
+
+        cached_state.cache = cache
+        return cached_state
+
+    return decorate
+
+
 class States:
     """
     A collection of static methods that generate responses based on the current session attributes
@@ -43,7 +127,7 @@ class States:
     skill_name = "Allen A.I."
     default_prompt = "How can I help?"
 
-    def __init__(self, attributes: SessionAttributes):
+    def __init__(self, attributes: BaseSessionAttributes):
         self.attributes = attributes
 
     @classmethod
@@ -67,3 +151,23 @@ class States:
                 transitions += getattr(method, TRANSITIONS, [])
         states.append(INITIAL_STATE)
         return states, transitions
+
+    @classmethod
+    def cache_info(cls) -> dict:
+        """Hits, misses and size of the response cache of every cacheable state, by state"""
+        return {state: method.cache.info()
+                for state, method in inspect.getmembers(cls, predicate=inspect.isfunction)
+                if hasattr(method, 'cache')}
+
+    @classmethod
+    def get_transition_table(cls) -> TransitionTable:
+        """
+        Get the compiled transition table of this class. It is built on first use and then shared
+        by every policy using this class.
+        """
+        # look in the class' own __dict__ so that subclasses do not pick up their parent's table
+        table = cls.__dict__.get('_transition_table')
+        if table is None:
+            table = TransitionTable.compile(*cls.get_states_transitions())
+            cls._transition_table = table
+        return table
@@ -1,10 +1,23 @@
+import functools
+import gzip
 import hashlib
+import os
 import pickle
 import json
 import inspect
+import random
+import time
+from typing import List
 
+from alexafsm.analytics import AnalyticsSink, Event
+from alexafsm.call_store import LRUCache, get_store, pickle_filename
+from alexafsm.recorder import GZIP_EXTENSION, shard_files
+from alexafsm.ttl_cache import TTLCache
 
-def recordable(record_dir_function, is_playback, is_record):
+
+def recordable(record_dir_function, is_playback, is_record, cache_size: int = 1024,
+               is_memoized=None, ttl: float = None, max_size: int = 1024,
+               stale_ttl: float = None):
     """
     Record results of functions that depend on external resources
 
@@ -13,49 +26,164 @@ def recordable(record_dir_function, is_playback, is_record):
 
     Pass record=True to the function to save results
     Pass playback=True to the function call to load saved results
+
+    Results are pickled into the record directory's alexafsm.call_store.CallStore, by function
+    name and hash of the arguments. During playback, the pickled results of the last cache_size
+    calls are kept in memory (and unpickled on every call, so that callers get their own copy), and
+    results recorded as separate pickle files by earlier versions are read too.
+
+    When neither playing back nor recording, e.g. in production, results are memoized in process
+    if is_memoized() and the function has a ttl: see alexafsm.ttl_cache.TTLCache for ttl,
+    max_size and stale_ttl. The wrapper's `memo` is the TTLCache, with hit/miss/refresh counters.
     """
 
     def real_decorator(external_resource_function):
-        def cache_filename(args, kwargs):
-            args_as_str = str(args)
-            kwargs_as_str = str(sorted(kwargs.items()))
-            full_args = f"{args_as_str}{kwargs_as_str}"
-            hashed_args = hashlib.md5(full_args.encode('utf-8')).hexdigest()
-            return f'{external_resource_function.__name__}_{hashed_args}.pickle'
+        function_name = external_resource_function.__name__
+        default_kwargs = _default_kwargs(external_resource_function)
+        cache = LRUCache(cache_size)
+        memo = TTLCache(ttl, max_size, stale_ttl) if ttl is not None else None
 
+        @functools.wraps(external_resource_function)
         def wrapper(*args, **kwargs):
-            # handle default kwargs where some kwarg may or may not be set with default values
-            fullargspec = inspect.getfullargspec(external_resource_function)
-            arguments, defaults = fullargspec.args, fullargspec.defaults
-            if defaults:
-                default_kwargs = {k: v for k, v in zip(arguments[-len(defaults):], defaults)}
-                full_kwargs = {**default_kwargs, **kwargs}
-            else:
-                full_kwargs = kwargs
-            filename = f'{record_dir_function()}/{cache_filename(args, full_kwargs)}'
+            full_kwargs = {**default_kwargs, **kwargs} if default_kwargs else kwargs
             if is_playback():
-                # pickle should already exist, read from disk
-                with open(filename, 'rb') as pickle_file:
-                    return pickle.load(pickle_file)
+                # result should already be recorded, read from disk (or memory)
+                return pickle.loads(_load(cache, record_dir_function(), function_name,
+                                          _cache_key(args, full_kwargs)))
             elif is_record():
-                # pickle doesn't yet exist, cache it
-                result = external_resource_function(*args, **kwargs)
-                with open(filename, 'wb') as pickle_file:
-                    pickle.dump(result, pickle_file)
-                return result
+                # result isn't yet recorded, store it
+                return _record(record_dir_function(), function_name, _cache_key(args, full_kwargs),
+                               external_resource_function, args, kwargs)
+            elif memo is not None and is_memoized is not None and is_memoized():
+                return memo.get(_cache_key(args, full_kwargs), external_resource_function,
+                                *args, **kwargs)
             else:
                 return external_resource_function(*args, **kwargs)
 
+        wrapper.cache = cache
+        wrapper.memo = memo
         return wrapper
 
     return real_decorator
 
 
+def _default_kwargs(function) -> dict:
+    """Default values of the keyword arguments of the function, so that keys do not depend on
+    whether they were passed"""
+    fullargspec = inspect.getfullargspec(function)
+    arguments, defaults = fullargspec.args, fullargspec.defaults
+    return {k: v for k, v in zip(arguments[-len(defaults):], defaults)} if defaults else {}
+
+
+def _cache_key(args, kwargs) -> str:
+    args_as_str = str(args)
+    kwargs_as_str = str(sorted(kwargs.items()))
+    full_args = f"{args_as_str}{kwargs_as_str}"
+    return hashlib.md5(full_args.encode('utf-8')).hexdigest()
+
+
+def _load(cache: LRUCache, record_dir: str, function_name: str, key: str) -> bytes:
+    """Pickled result of a recorded call, from the cache or the record directory"""
+    result = cache.get((record_dir, key))
+    if result is None:
+        try:
+            result = get_store(record_dir).get(function_name, key)
+        except KeyError:
+            # recorded before the store, see alexafsm.call_store.migrate
+            with open(pickle_filename(record_dir, function_name, key), 'rb') as f:
+                result = f.read()
+        cache.put((record_dir, key), result)
+    return result
+
+
+def _record(record_dir: str, function_name: str, key: str, function, args, kwargs):
+    """Call the function and store its pickled result in the record directory"""
+    result = function(*args, **kwargs)
+    get_store(record_dir).put(function_name, key, pickle.dumps(result))
+    return result
+
+
 def get_requests_responses(record_file: str):
     """
     Return the (json) requests and expected responses from previous recordings.
     These are returned in the same order they were recorded in.
     """
-    with open(record_file) as f:
-        lines = f.readlines()
-    return [tuple(json.loads(line)) for line in lines]
+    return list(iter_requests_responses(record_file))
+
+
+def iter_requests_responses(record_file: str):
+    """
+    Yield the (json) requests and expected responses recorded in record_file (by
+    Policy.handle(record_filename=...)) and in its shards (by alexafsm.recorder.Recorder), which
+    may be gzipped. Shards are read in the order they were started, after record_file.
+    """
+    files = ([record_file] if os.path.exists(record_file) else []) + shard_files(record_file)
+    if not files:
+        raise FileNotFoundError(f"No recordings found for {record_file}")
+    for filename in files:
+        opener = gzip.open if filename.endswith(GZIP_EXTENSION) else open
+        with opener(filename, 'rt') as f:
+            for line in f:
+                yield tuple(json.loads(line))
+
+
+def make_request(intent: str = None, slots: dict = None, attributes: dict = None,
+                 request_type: str = 'IntentRequest', session_id: str = 'session',
+                 user_id: str = 'user', request_id: str = 'request',
+                 application_id: str = 'application') -> dict:
+    """
+    Build an Alexa request in json format, e.g. to drive a policy in tests.
+    slots map slot names to values, e.g. {'Query': 'pizza'}
+
+    >>> make_request('NewSearch', {'Query': 'pizza'})['request']['intent']
+    {'name': 'NewSearch', 'slots': {'Query': {'name': 'Query', 'value': 'pizza'}}}
+    """
+    request = {
+        'type': request_type,
+        'requestId': request_id
+    }
+    if intent:
+        request['intent'] = {
+            'name': intent,
+            'slots': {name: {'name': name, 'value': value} if value is not None else {'name': name}
+                      for name, value in (slots or {}).items()}
+        }
+    session = {
+        'sessionId': session_id,
+        'application': {'applicationId': application_id},
+        'user': {'userId': user_id}
+    }
+    if attributes is not None:
+        session['attributes'] = attributes
+    return {'session': session, 'request': request}
+
+
+def with_latency(function, latency: float, jitter: float = 0.0):
+    """
+    function, taking latency seconds (plus up to jitter more, uniformly distributed) per call, e.g.
+    to make a local fake behave like a remote client in load tests
+    """
+    @functools.wraps(function)
+    def slow_function(*args, **kwargs):
+        time.sleep(latency + random.uniform(0, jitter) if jitter else latency)
+        return function(*args, **kwargs)
+
+    return slow_function
+
+
+class FakeAnalyticsSink(AnalyticsSink):
+    """
+    Analytics sink that keeps the events it receives, optionally taking `latency` seconds per batch
+    to simulate a remote analytics service
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.events = []
+        self.batches = 0
+
+    def send(self, events: List[Event]):
+        if self.latency:
+            time.sleep(self.latency)
+        self.events.extend(events)
+        self.batches += 1
@@ -0,0 +1,97 @@
+"""
+Compiled, immutable representation of the transitions declared on a States class.
+
+Compiling a States class (collecting its states, expanding wildcard sources and grouping the
+candidate transitions by (state, trigger)) only needs to happen once per class, so policies can
+share the result instead of rebuilding it on every request.
+"""
+
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+
+WILDCARD = '*'
+
+
+def _as_tuple(value) -> tuple:
+    if value is None:
+        return ()
+    return tuple(value) if isinstance(value, (list, tuple)) else (value,)
+
+
+class Transition(namedtuple('Transition', ['trigger', 'source', 'dest', 'conditions', 'unless',
+                                           'prepare', 'before', 'after'])):
+    """A single transition whose source is a concrete state (i.e. never the '*' wildcard)"""
+
+    def to_kwargs(self) -> dict:
+        """Arguments for transitions.Machine.add_transition"""
+        return {
+            'trigger': self.trigger,
+            'source': self.source,
+            'dest': self.dest,
+            'conditions': list(self.conditions) or None,
+            'unless': list(self.unless) or None,
+            'prepare': list(self.prepare) or None,
+            'before': list(self.before) or None,
+            'after': list(self.after) or None
+        }
+
+
+class TransitionTable:
+    """
+    Immutable lookup table from (state, trigger) to the ordered candidate transitions.
+    Candidates keep the order in which the transitions library would evaluate them.
+    """
+
+    def __init__(self, states, transitions):
+        self.states = tuple(states)
+        self.transitions = tuple(transitions)
+        lookup = OrderedDict()
+        for transition in self.transitions:
+            lookup.setdefault((transition.source, transition.trigger), []).append(transition)
+        self._lookup = MappingProxyType(OrderedDict((k, tuple(v)) for k, v in lookup.items()))
+        self.triggers = frozenset(transition.trigger for transition in self.transitions)
+
+    def __contains__(self, state_trigger) -> bool:
+        return state_trigger in self._lookup
+
+    def __len__(self):
+        return len(self._lookup)
+
+    def get(self, state: str, trigger: str) -> tuple:
+        """Candidate transitions for the given state and trigger, in evaluation order"""
+        return self._lookup.get((state, trigger), ())
+
+    def items(self):
+        return self._lookup.items()
+
+    @classmethod
+    def compile(cls, states, transitions) -> 'TransitionTable':
+        """
+        Compile the state names and the transition dictionaries produced by `with_transitions`
+        >>> table = TransitionTable.compile(['a', 'b', 'a'], [{'trigger': 'go', 'source': '*',
+        ...                                                'dest': 'b', 'conditions': 'ok'}])
+        >>> [t.source for t in table.transitions]
+        ['a', 'b']
+        >>> table.get('a', 'go')[0].conditions
+        ('ok',)
+        >>> table.get('a', 'stop')
+        ()
+        """
+        # a state may be listed twice (e.g. 'initial' is both a method and the initial state)
+        states = tuple(OrderedDict.fromkeys(states))
+        compiled = []
+        for transition in transitions:
+            source = transition['source']
+            sources = states if source == WILDCARD else _as_tuple(source)
+            for s in sources:
+                compiled.append(Transition(
+                    trigger=transition['trigger'],
+                    source=s,
+                    dest=transition['dest'],
+                    conditions=_as_tuple(transition.get('conditions')),
+                    unless=_as_tuple(transition.get('unless')),
+                    prepare=_as_tuple(transition.get('prepare')),
+                    before=_as_tuple(transition.get('before')),
+                    after=_as_tuple(transition.get('after'))
+                ))
+        return cls(states, compiled)
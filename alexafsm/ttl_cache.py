@@ -0,0 +1,129 @@
+"""
+In-process caching of the results of calls to external resources (e.g. elasticsearch), for the
+memoized mode of `test_helpers.recordable`:
+
+* results are fresh for `ttl` seconds, then served stale for up to `stale_ttl` more seconds while a
+  background thread refreshes them (stale-while-revalidate), and then expire
+* concurrent calls for the same key that is missing or expired wait for a single call
+  (single-flight), so that many users searching for the same thing at once make one query
+* at most `max_size` results are kept, the least recently used are evicted first
+* errors are not cached: they are raised to every waiting caller, and a failed refresh keeps the
+  stale result
+* cached results are shared by the callers, which must not modify them
+
+`stats()` counts hits (fresh or stale), misses, coalesced calls, refreshes and evictions.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+STATS = ('hits', 'stale_hits', 'misses', 'coalesced', 'refreshes', 'refresh_errors', 'evictions')
+
+
+class _Flight:
+    """Call in progress for a key, that other callers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class TTLCache:
+    """Results of calls by key, see the module documentation"""
+
+    def __init__(self, ttl: float, max_size: int = 1024, stale_ttl: float = None, clock=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.clock = clock or time.monotonic
+        self._entries = OrderedDict()  # key -> (result, time of the call)
+        self._flights = {}  # key -> _Flight of the call for a missing or expired result
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(STATS, 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, result, called_at: float):
+        """Keep the result, called with the lock held"""
+        self._entries[key] = (result, called_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, key, function, *args, **kwargs):
+        """Cached result of function(*args, **kwargs) for the key"""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, called_at = entry
+                age = now - called_at
+                if age < self.ttl:
+                    self._stats['hits'] += 1
+                    self._entries.move_to_end(key)
+                    return result
+                if age < self.ttl + self.stale_ttl:
+                    self._stats['stale_hits'] += 1
+                    self._entries.move_to_end(key)
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, function, args, kwargs),
+                                         daemon=True).start()
+                    return result
+                del self._entries[key]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.exception is not None:
+                raise flight.exception
+            return flight.result
+
+        try:
+            flight.result = function(*args, **kwargs)
+        except BaseException as exception:
+            flight.exception = exception
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.result, now)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _refresh(self, key, function, args, kwargs):
+        called_at = self.clock()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._stats['refresh_errors'] += 1
+        else:
+            with self._lock:
+                self._stats['refreshes'] += 1
+                self._store(key, result, called_at)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
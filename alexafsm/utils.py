@@ -1,10 +1,26 @@
+import importlib
 import inspect
 import json
 
 from typing import Set
 
 from alexafsm.policy import Policy
+from alexafsm.profiling import is_barrier, mutually_exclusive
 from alexafsm.session_attributes import INITIAL_STATE
+from alexafsm.transition_table import Transition
+
+
+def import_object(name: str):
+    """Object named module:attribute, e.g. a policy class given on the command line"""
+    module, attribute = name.split(':')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def _validate_ambiguous_transition(event, source, trans):
+    unconditional_trans = [tran for tran in trans if not tran.conditions]
+    assert len(unconditional_trans) < 2,\
+        f"Event {event} for source {source} has multiple unconditional out-bound transitions:" \
+        f" {', '.join([tran.dest for tran in trans])}"
 
 
 def validate(policy: Policy, schema_file: str, ignore_intents: Set[str] = ()):
@@ -34,12 +50,6 @@ def validate(policy: Policy, schema_file: str, ignore_intents: Set[str] = ()):
         states_have_in_transitions.add(tran.dest)
         states_have_out_transitions.add(tran.source)
 
-    def _validate_ambiguous_transition(event, source, trans):
-        unconditional_trans = [tran for tran in trans if not tran.conditions]
-        assert len(unconditional_trans) < 2,\
-            f"Event {event} for source {source} has multiple unconditional out-bound transitions:" \
-            f" {', '.join([tran.dest for tran in trans])}"
-
     for _, event in policy.machine.events.items():
         assert event.name in intents, f"Invalid event/trigger: {event.name}!"
         events.append(event.name)
@@ -61,6 +71,47 @@ def validate(policy: Policy, schema_file: str, ignore_intents: Set[str] = ()):
     assert not out_diff, f"Some states have no outbound transitions: {out_diff}"
 
 
+def _as_compiled(tran) -> Transition:
+    """The transitions.Transition as a (compiled) alexafsm Transition, to compare them"""
+    return Transition(
+        trigger=None, source=tran.source, dest=tran.dest,
+        conditions=tuple(cond.func for cond in tran.conditions if cond.target),
+        unless=tuple(cond.func for cond in tran.conditions if not cond.target),
+        prepare=tuple(tran.prepare), before=tuple(tran.before), after=tuple(tran.after))
+
+
+def validate_transition_order(policy: Policy):
+    """
+    Check that the order in which the policy tries candidate transitions (e.g. ordered by
+    alexafsm.profiling) cannot change which transition fires, compared to their declaration: every
+    pair of candidates in a different order must be mutually exclusive and without prepare
+    callbacks, and unconditional candidates must not have moved
+    """
+    table = policy._engine.table
+    for _, event in policy.machine.events.items():
+        for source, trans in event.transitions.items():
+            _validate_ambiguous_transition(event.name, source, trans)
+            declared = [_as_compiled(tran) for tran in trans]
+            actual = [candidate._replace(trigger=None) for candidate in table.get(source, event.name)]
+            assert sorted(declared) == sorted(actual), \
+                f"Event {event.name} for source {source} has different transitions than declared"
+            # position of each declared transition in the actual order
+            unused = list(range(len(actual)))
+            positions = []
+            for tran in declared:
+                positions.append(next(i for i in unused if actual[i] == tran))
+                unused.remove(positions[-1])
+            for i, tran in enumerate(declared):
+                for j in range(i + 1, len(declared)):
+                    other = declared[j]
+                    if positions[i] < positions[j]:
+                        continue
+                    assert not (is_barrier(tran) or is_barrier(other)) and \
+                        mutually_exclusive(tran, other), \
+                        f"Event {event.name} for source {source}: transitions to {tran.dest} and " \
+                        f"{other.dest} were reordered but can both be taken"
+
+
 def print_machine(policy: Policy):
     def _print_transition(tran):
         print(f"\t\t{tran.source} -> {tran.dest}", end='')
@@ -124,8 +175,8 @@ def used_events_states_transitions(recorded_requests_responses):
     used_events = set()
     used_states = set()
     used_transitions = set()
-    dialog_data = [get_dialogs(request, response)
-                   for request, response in recorded_requests_responses]
+    dialog_data = (get_dialogs(request, response)
+                   for request, response in recorded_requests_responses)
     for request_id, from_state, intent, slots, to_state, speech in dialog_data:
         used_events.add(intent)
         used_states.add(from_state)
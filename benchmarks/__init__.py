@@ -0,0 +1 @@
+"""Benchmarks for alexafsm. Run each module from the repository root, e.g. python -m benchmarks.dispatch"""
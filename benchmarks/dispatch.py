@@ -0,0 +1,67 @@
+"""
+Per-turn dispatch cost (Policy.trigger) of the transitions and native engines, measured on the
+skill search conversations with local fake clients.
+
+    python -m benchmarks.dispatch [repeat]
+"""
+
+import logging
+import sys
+import time
+
+from alexafsm.engine import NATIVE, TRANSITIONS
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.intent import NEW_SEARCH
+from tests.skillsearch.policy import Policy
+
+
+def recorded_turns():
+    """Requests of all turns in the scripted conversations, with the session attributes of the
+    previous turn"""
+    turns = []
+    with fake_clients():
+        for conversation in CONVERSATIONS:
+            for request, _ in converse(Policy.initialize(), conversation):
+                turns.append(request)
+    return turns
+
+
+def time_dispatch(engine: str, requests, repeat: int) -> float:
+    """Average seconds per Policy.trigger call"""
+    policy = Policy.initialize(engine=engine)
+    attributes_cls = Policy.states_cls.session_attributes_cls
+    elapsed = 0.0
+    calls = 0
+    with fake_clients():
+        for _ in range(repeat):
+            for request in requests:
+                policy.states.attributes = attributes_cls.from_request(request)
+                policy.state = policy.attributes.state
+                start = time.perf_counter()
+                try:
+                    policy.trigger(policy.attributes.intent)
+                except Exception:
+                    pass
+                elapsed += time.perf_counter() - start
+                calls += 1
+    return elapsed / calls
+
+
+def main(repeat: int = 200):
+    logging.disable(logging.ERROR)  # invalid transitions are part of the conversations
+    all_requests = recorded_turns()
+    # searches are dominated by the (fake) search itself rather than by the dispatch
+    no_search_requests = [request for request in all_requests
+                          if request['request']['intent']['name'] != NEW_SEARCH]
+    for name, requests in (('all turns', all_requests), ('no search', no_search_requests)):
+        print(f"{name}: {len(requests)} turns x {repeat} repeats")
+        results = {engine: time_dispatch(engine, requests, repeat)
+                   for engine in (TRANSITIONS, NATIVE)}
+        for engine, seconds in results.items():
+            print(f"{engine:>12}: {seconds * 1e6:8.2f} us/turn")
+        print(f"{'speedup':>12}: {results[TRANSITIONS] / results[NATIVE]:8.2f}x")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+"""
+Scaling curves of alexafsm on synthetic policies (see benchmarks.synthetic) of growing size: startup
+costs (compiling the transition table, building a transitions.Machine, utils.validate) and per-turn
+Policy.handle latency with each engine, by number of states and intents and by wildcard ratio.
+
+    python -m benchmarks.scaling [--sizes 10x5,100x20,1000x100,3000x300] [--wildcards 0,0.1]
+                                 [--output curves.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from alexafsm.engine import NATIVE, TRANSITIONS, build_machine
+from alexafsm.session_attributes import INITIAL_STATE
+from alexafsm.utils import validate
+
+from benchmarks.suite import measure
+from benchmarks.synthetic import intent_schema, make_policy_cls, random_walk
+
+
+def elapsed(function, *args) -> float:
+    """Seconds taken by a single call"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def validate_synthetic(policy_cls):
+    fd, schema_file = tempfile.mkstemp(suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(intent_schema(policy_cls), f)
+        validate(policy_cls.initialize(), schema_file)
+    finally:
+        os.remove(schema_file)
+
+
+def scaling_point(num_states: int, num_intents: int, wildcard_ratio: float,
+                  conditions_per_edge: int, num_slots: int, turns: int, repeat: int) -> dict:
+    policy_cls = make_policy_cls(num_states, num_intents, wildcard_ratio, conditions_per_edge,
+                                 num_slots)
+    states_cls = policy_cls.states_cls
+    point = {'states': num_states, 'intents': num_intents, 'wildcard_ratio': wildcard_ratio,
+             'conditions_per_edge': conditions_per_edge, 'slots': num_slots}
+    point['compile_ms'] = elapsed(states_cls.get_transition_table) * 1e3
+    table = states_cls.get_transition_table()
+    point['transitions'] = len(table.transitions)
+    point['machine_ms'] = elapsed(build_machine, table, INITIAL_STATE) * 1e3
+    point['validate_ms'] = elapsed(validate_synthetic, policy_cls) * 1e3
+
+    requests = random_walk(policy_cls, turns)
+    for engine in (TRANSITIONS, NATIVE):
+        policy = policy_cls.initialize(engine=engine)
+        stats = measure(policy.handle, requests, repeat)
+        point[f'{engine}_p50_us'] = stats['p50_us']
+        point[f'{engine}_p99_us'] = stats['p99_us']
+    return point
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='10x5,100x20,1000x100,3000x300',
+                        help="sizes of the policies, as states x intents")
+    parser.add_argument('--wildcards', default='0,0.1', help="wildcard ratios")
+    parser.add_argument('--conditions', type=int, default=1, help="conditions per transition")
+    parser.add_argument('--slots', type=int, default=2, help="slots per intent")
+    parser.add_argument('--turns', type=int, default=200, help="turns of the random walks")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="json file to write the curves to")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.ERROR)
+    columns = ['states', 'intents', 'wildcard_ratio', 'transitions', 'compile_ms', 'machine_ms',
+               'validate_ms', f'{TRANSITIONS}_p50_us', f'{NATIVE}_p50_us']
+    print(' '.join(f'{column:>14}' for column in columns))
+    curves = []
+    for wildcard_ratio in (float(ratio) for ratio in args.wildcards.split(',')):
+        for num_states, num_intents in (map(int, size.split('x')) for size in args.sizes.split(',')):
+            point = scaling_point(num_states, num_intents, wildcard_ratio, args.conditions,
+                                  args.slots, args.turns, args.repeat)
+            curves.append(point)
+            print(' '.join(f'{point[column]:14.2f}' if isinstance(point[column], float) else
+                           f'{point[column]:>14}' for column in columns), flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(curves, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Cost of serializing skill search responses: json.dumps patched by alexafsm.make_json_serializable
+against alexafsm.serializer with each available backend. Responses are produced by the scripted
+conversations, or by the requests of a recording, with local fake clients.
+
+    python -m benchmarks.serialization [repeat [record_file]]
+"""
+
+import json
+import logging
+import sys
+import time
+
+from alexafsm import serializer
+from alexafsm.test_helpers import get_requests_responses
+import alexafsm.make_json_serializable  # NOQA
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def recorded_responses(record_file: str = None):
+    """Responses to the requests of the record file, or of all turns in the scripted conversations"""
+    if record_file:
+        requests = [request for request, _ in get_requests_responses(record_file)]
+    else:
+        with fake_clients():
+            requests = [request for conversation in CONVERSATIONS
+                        for request, _ in converse(Policy.initialize(), conversation)]
+    policy = Policy.initialize()
+    with fake_clients():
+        return [policy.handle(request) for request in requests]
+
+
+def time_serialization(serialize, responses, repeat: int) -> float:
+    """Average seconds per response"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for resp in responses:
+            serialize(resp)
+    return (time.perf_counter() - start) / (repeat * len(responses))
+
+
+def main(repeat: int = 200, record_file: str = None):
+    logging.disable(logging.ERROR)  # invalid transitions are part of the conversations
+    responses = recorded_responses(record_file)
+    size = sum(len(serializer.serialize(resp)) for resp in responses) / len(responses)
+    print(f"{len(responses)} responses ({size:.0f} bytes on average) x {repeat} repeats")
+
+    candidates = {'patched json': lambda resp: json.dumps(resp).encode('utf-8'),
+                  serializer.JSON: lambda resp: serializer.serialize(resp, serializer.JSON)}
+    if serializer.orjson:
+        candidates[serializer.ORJSON] = lambda resp: serializer.serialize(resp, serializer.ORJSON)
+    results = {name: time_serialization(serialize, responses, repeat)
+               for name, serialize in candidates.items()}
+    baseline = results['patched json']
+    for name, seconds in results.items():
+        print(f"{name:>14}: {seconds * 1e6:8.2f} us/response {baseline / seconds:6.2f}x")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) if i == 0 else arg for i, arg in enumerate(sys.argv[1:])])
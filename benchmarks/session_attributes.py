@@ -0,0 +1,76 @@
+"""
+Parse (from_request) and serialize (to_json) time, and memory per instance, of the skill search
+SessionAttributes against the same attributes generated by alexafsm.attributes_schema, on the
+requests of the scripted conversations. Search results are not packed by the codec, which would
+take most of the time of both classes.
+
+    python -m benchmarks.session_attributes [repeat]
+"""
+
+import logging
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+from tests.skillsearch.session_attributes import SessionAttributes, SlottedSessionAttributes
+
+from benchmarks.dispatch import recorded_turns
+
+
+def time_per_call(function, arguments, repeat: int) -> float:
+    """Average seconds per call of function on each of the arguments"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for argument in arguments:
+            function(argument)
+    return (time.perf_counter() - start) / (repeat * len(arguments))
+
+
+def bytes_per_instance(attributes_cls, count: int = 10000) -> float:
+    """Memory allocated per instance, not counting the (shared) values of its fields"""
+    slots = attributes_cls.slots_cls(*[None] * len(attributes_cls.slots_cls._fields))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [attributes_cls(intent='Search', slots=slots, state='has_result', query='pizza',
+                                number_of_hits=8, skill_cursor=0) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del instances
+    return size / count
+
+
+def main(repeat: int = 200):
+    logging.disable(logging.ERROR)
+    requests = recorded_turns()
+    for request in requests:
+        session = request['session']
+        session['attributes'] = SessionAttributes.codec.decode(session.get('attributes', {}))
+    # search results dominate parse and serialize time, when there are some
+    without_skills = [request for request in requests if 'skills' not in
+                      request['session']['attributes']]
+    print(f"{len(requests)} requests ({len(without_skills)} without search results) x {repeat}")
+
+    results = {}
+    for attributes_cls in (SessionAttributes, SlottedSessionAttributes):
+        with mock.patch.object(attributes_cls, 'codec', None):
+            instances = [attributes_cls.from_request(request) for request in requests]
+            results[attributes_cls.__name__] = {
+                'from_request': time_per_call(attributes_cls.from_request, requests, repeat),
+                'from_request (no results)': time_per_call(attributes_cls.from_request,
+                                                           without_skills, repeat),
+                'to_json': time_per_call(attributes_cls.to_json, instances, repeat),
+            }
+
+    for name in results[SessionAttributes.__name__]:
+        print(f"{name}:")
+        for cls_name, timings in results.items():
+            print(f"{cls_name:>26}: {timings[name] * 1e6:8.2f} us")
+
+    print("memory per instance:")
+    for attributes_cls in (SessionAttributes, SlottedSessionAttributes):
+        print(f"{attributes_cls.__name__:>26}: {bytes_per_instance(attributes_cls):8.0f} bytes")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
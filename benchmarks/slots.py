@@ -0,0 +1,59 @@
+"""
+Cost of extracting the slots of slot-heavy intents (10 to 30 slots, about half of them filled),
+with the generated extractors of alexafsm.slots against the extraction SessionAttributes did
+before them.
+
+    python -m benchmarks.slots [repeat]
+"""
+
+import sys
+import time
+from collections import namedtuple
+
+from alexafsm.slots import slot_extractor
+
+
+def legacy_slots(slots_cls, slots: dict):
+    """Extraction before alexafsm.slots: _slots_from_dict, twice, then a rebuild from fields"""
+
+    def _slots_from_dict(slots: dict):
+        def _value_of(some_dict: dict) -> str:
+            return some_dict['value'] if some_dict and 'value' in some_dict else None
+
+        kwargs = dict((k.lower(), _value_of(v)) for k, v in slots.items()) if slots else {}
+        return slots_cls(**{field: kwargs.get(field, None) for field in slots_cls._fields})
+
+    none_slots = _slots_from_dict(None)
+    new_slots = _slots_from_dict(slots)
+    return slots_cls(**{f: getattr(new_slots, f) for f in none_slots._fields})
+
+
+def intent_slots(size: int) -> (type, dict):
+    """Slots class with the given number of fields, and the slots of an intent filling every
+    other one"""
+    slots_cls = namedtuple(f'Slots{size}', [f'slot{i}' for i in range(size)])
+    slots = {f'Slot{i}': {'name': f'Slot{i}', 'value': f'value {i}'} if i % 2 else
+             {'name': f'Slot{i}'} for i in range(size)}
+    return slots_cls, slots
+
+
+def time_extraction(extract, slots: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract(slots)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat: int = 20000):
+    for size in (10, 20, 30):
+        slots_cls, slots = intent_slots(size)
+        extract = slot_extractor(slots_cls)
+        assert extract(slots) == legacy_slots(slots_cls, slots)
+        legacy = time_extraction(lambda s: legacy_slots(slots_cls, s), slots, repeat)
+        generated = time_extraction(extract, slots, repeat)
+        print(f"{size} slots: legacy {legacy * 1e6:6.2f} us, generated {generated * 1e6:6.2f} us,"
+              f" {legacy / generated:5.2f}x")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,62 @@
+"""
+Cost of protecting session attributes against invalid transitions (Policy.execute): a Snapshot
+that journals the fields assigned during the turn, against a deepcopy of the attributes, as the
+number of search results in the attributes and the number of fields assigned grow.
+
+    python -m benchmarks.snapshot [repeat]
+"""
+
+import copy
+import sys
+import time
+
+from tests.skillsearch.fakes import make_skill
+from tests.skillsearch.session_attributes import SessionAttributes
+
+FIELDS = ['query', 'number_of_hits', 'skill_cursor', 'searched', 'first_time_presenting_results']
+
+
+def attributes_with(number_of_skills: int) -> SessionAttributes:
+    attributes = SessionAttributes(intent='NextSkill', state='has_result', query='pizza',
+                                   number_of_hits=number_of_skills, skill_cursor=0)
+    attributes.skills = [make_skill('pizza', rank) for rank in range(number_of_skills)]
+    return attributes
+
+
+def assign(attributes: SessionAttributes, fields: list):
+    for field in fields:
+        setattr(attributes, field, None)
+
+
+def with_snapshot(attributes: SessionAttributes, fields: list):
+    with attributes.snapshot() as snapshot:
+        assign(attributes, fields)
+        snapshot.rollback()
+
+
+def with_deepcopy(attributes: SessionAttributes, fields: list):
+    backup = copy.deepcopy(attributes)
+    assign(attributes, fields)
+    attributes.__dict__.update(backup.__dict__)
+
+
+def time_per_turn(protect, attributes: SessionAttributes, fields: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        protect(attributes, fields)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat: int = 2000):
+    for number_of_skills in (0, 10, 100):
+        attributes = attributes_with(number_of_skills)
+        for number_of_fields in (1, len(FIELDS)):
+            fields = FIELDS[:number_of_fields]
+            snapshot = time_per_turn(with_snapshot, attributes, fields, repeat)
+            deepcopy = time_per_turn(with_deepcopy, attributes, fields, max(repeat // 100, 1))
+            print(f"{number_of_skills:3} skills, {number_of_fields} fields assigned: snapshot"
+                  f" {snapshot * 1e6:7.2f} us, deepcopy {deepcopy * 1e6:9.2f} us")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,182 @@
+"""
+Latency of each stage of the request path, on the skill search policy (with local fake clients) and
+on synthetic policies:
+
+* `from_request`: SessionAttributes.from_request
+* `build_machine`: construction of a transitions.Machine for the policy's States (not shared)
+* `policy_init`: Policy.__init__, with the shared transition table and machine
+* `execute`: Policy.execute, on a policy reset to the request
+* `to_json`: Response.to_json
+* `encode_patched`: json.dumps patched by alexafsm.make_json_serializable (the former encoding)
+* `serialize`: Response.to_bytes (alexafsm.serializer)
+* `handle`: Policy.handle
+
+For each, p50/p99 latency, throughput and the peak memory allocated by a call are reported, and
+written as json with --output. Results are compared to a baseline written earlier (--baseline): a
+stage whose p50 grew by more than the tolerance is a regression, and the exit status is 1.
+
+    python -m benchmarks.suite [--repeat 20] [--output results.json] [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+
+from alexafsm import serializer
+from alexafsm.engine import build_machine
+from alexafsm.loadtest import percentile
+from alexafsm.session_attributes import INITIAL_STATE
+import alexafsm.make_json_serializable  # NOQA
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+from benchmarks.synthetic import make_policy_cls, random_walk
+
+STAGES = ['from_request', 'build_machine', 'policy_init', 'execute', 'to_json', 'encode_patched',
+          'serialize', 'handle']
+
+
+def peak_allocation(call, arguments: list) -> int:
+    """Median over the arguments of the peak memory allocated while calling call(argument)"""
+    peaks = []
+    for argument in arguments:
+        tracemalloc.start()
+        call(argument)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sorted(peaks)[len(peaks) // 2]
+
+
+def measure(call, inputs: list, repeat: int, setup=None) -> dict:
+    """Latency statistics of call(setup(input)) for each input, repeated, setup not being timed"""
+    samples = []
+    arguments = []
+    for _ in range(repeat):
+        for input_ in inputs:
+            argument = setup(input_) if setup else input_
+            start = time.perf_counter()
+            call(argument)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    arguments = [setup(input_) if setup else input_ for input_ in inputs]
+    return {
+        'calls': len(samples),
+        'p50_us': percentile(samples, 50) * 1e6,
+        'p99_us': percentile(samples, 99) * 1e6,
+        'mean_us': sum(samples) / len(samples) * 1e6,
+        'throughput_per_s': len(samples) / sum(samples),
+        'peak_alloc_bytes': peak_allocation(call, arguments)
+    }
+
+
+def run_stages(policy_cls, requests: list, repeat: int) -> dict:
+    """Statistics of each stage of the given policy on the given requests"""
+    states_cls = policy_cls.states_cls
+    attributes_cls = states_cls.session_attributes_cls
+    policy = policy_cls.initialize()
+    responses = [policy.handle(request) for request in requests]
+    table = states_cls.get_transition_table()
+
+    def reset(request):
+        policy.reset(request)
+        return policy
+
+    results = {
+        'from_request': measure(attributes_cls.from_request, requests, repeat),
+        'build_machine': measure(lambda _: build_machine(table, INITIAL_STATE), [None],
+                                 max(1, repeat // 10)),
+        'policy_init': measure(lambda request: policy_cls(states_cls.from_request(request), request),
+                               requests, repeat),
+        'execute': measure(lambda reset_policy: reset_policy.execute(), requests, repeat,
+                           setup=reset),
+        'to_json': measure(lambda resp: resp.to_json(), responses, repeat),
+        'encode_patched': measure(lambda resp: json.dumps(resp).encode('utf-8'), responses, repeat),
+        'serialize': measure(lambda resp: resp.to_bytes(), responses, repeat),
+        'handle': measure(policy.handle, requests, repeat),
+    }
+    return results
+
+
+def skillsearch_requests() -> list:
+    requests = []
+    with fake_clients():
+        for conversation in CONVERSATIONS:
+            requests += [request for request, _ in converse(Policy.initialize(), conversation)]
+    return requests
+
+
+def run(repeat: int, synthetic_sizes: list) -> dict:
+    """Statistics of every stage, by workload"""
+    results = {}
+    with fake_clients():
+        results['skillsearch'] = run_stages(Policy, skillsearch_requests(), repeat)
+    for num_states, num_intents in synthetic_sizes:
+        policy_cls = make_policy_cls(num_states, num_intents)
+        results[f'synthetic_{num_states}x{num_intents}'] = \
+            run_stages(policy_cls, random_walk(policy_cls, 50), repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """(workload, stage, baseline p50, p50) of the stages whose p50 regressed beyond tolerance"""
+    regressions = []
+    for workload, stages in results.items():
+        for stage, stats in stages.items():
+            expected = baseline.get(workload, {}).get(stage)
+            if expected and stats['p50_us'] > expected['p50_us'] * (1 + tolerance):
+                regressions.append((workload, stage, expected['p50_us'], stats['p50_us']))
+    return regressions
+
+
+def print_results(results: dict, baseline: dict):
+    for workload, stages in results.items():
+        print(f"{workload}:")
+        print(f"{'stage':>16} {'p50 us':>10} {'p99 us':>10} {'calls/s':>10} {'peak KiB':>9}"
+              f" {'vs baseline':>11}")
+        for stage, stats in stages.items():
+            expected = baseline.get(workload, {}).get(stage)
+            change = f"{stats['p50_us'] / expected['p50_us']:10.2f}x" if expected else ''
+            print(f"{stage:>16} {stats['p50_us']:10.2f} {stats['p99_us']:10.2f}"
+                  f" {stats['throughput_per_s']:10.0f} {stats['peak_alloc_bytes'] / 1024:9.1f}"
+                  f" {change:>11}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=20, help="repetitions of each input")
+    parser.add_argument('--synthetic', default='20x10,200x50',
+                        help="sizes of the synthetic policies, as states x intents")
+    parser.add_argument('--output', help="json file to write the results to")
+    parser.add_argument('--baseline', help="json file of earlier results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="relative p50 increase over the baseline flagged as a regression")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.ERROR)  # invalid transitions are part of the conversations
+    sizes = [tuple(int(n) for n in size.split('x')) for size in args.synthetic.split(',') if size]
+    results = run(args.repeat, sizes)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(), 'serializer': serializer.BACKEND,
+                       'repeat': args.repeat, 'results': results}, f, indent=2, sort_keys=True)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for workload, stage, expected, actual in regressions:
+        print(f"REGRESSION {workload} {stage}: p50 {expected:.2f} us -> {actual:.2f} us")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Synthetic policies, to benchmark alexafsm on FSMs other than (and much larger than) skill search:
+a States class generated with `with_transitions` decorators from a few parameters, its Alexa intent
+schema, and the requests of random walks through it.
+
+* `num_states`, `num_intents`: size of the FSM. Every state can be reached and left, and every
+  intent is handled, so that `alexafsm.utils.validate` accepts the generated policies.
+* `wildcard_ratio`: fraction of the intents handled by a wildcard (`'source': '*'`) transition,
+  i.e. from every state, like AMAZON.HelpIntent in skill search.
+* `conditions_per_edge`: number of conditions of each transition. Condition `m_condition{k}`
+  requires slot `k` (modulo the number of slots) to be filled, if there are slots.
+* `num_slots`: number of slots of every intent; random walks fill each one with probability
+  `slot_fill`.
+"""
+
+import random
+from collections import namedtuple
+
+from alexafsm import loadtest, response
+from alexafsm.policy import Policy
+from alexafsm.session_attributes import SessionAttributes, INITIAL_STATE
+from alexafsm.states import States, with_transitions
+
+# intents handled from each state, besides the wildcard ones
+INTENTS_PER_STATE = 3
+
+
+def _state_response(name: str):
+    def state_response(self) -> response.Response:
+        return response.Response(speech=f"You are in {name}.", reprompt="What next?")
+
+    state_response.__name__ = name
+    return state_response
+
+
+def _condition(name: str, slot: str):
+    def condition(self) -> bool:
+        return slot is None or getattr(self.attributes.slots, slot) is not None
+
+    condition.__name__ = name
+    return condition
+
+
+def _wildcard_edges(rng: random.Random, names: list, intents: list, wildcard_ratio: float):
+    """Wildcard transitions of a share of the intents, and the intents left for the others"""
+    num_wildcards = int(round(len(intents) * wildcard_ratio))
+    if num_wildcards == len(intents) and len(intents) > 1:
+        num_wildcards -= 1  # keep an intent for the other transitions
+    wildcard_intents, intents = intents[:num_wildcards], intents[num_wildcards:] or intents
+    return [(intent, '*', rng.choice(names)) for intent in wildcard_intents], intents
+
+
+class _Edges:
+    """(intent, source, dest) of transitions, at most one per (source, intent) unless they are
+    conditional (so that they are not ambiguous)"""
+
+    def __init__(self, rng: random.Random, edges: list, conditional: bool):
+        self.rng = rng
+        self.edges = edges
+        self.conditional = conditional
+        self._used = set()
+
+    def add(self, intent: str, source: str, dest: str) -> bool:
+        if (source, intent) in self._used and not self.conditional:
+            return False
+        self._used.add((source, intent))
+        self.edges.append((intent, source, dest))
+        return True
+
+    def add_from_any(self, intent_choices: list, source_choices: list, dest: str):
+        """Add a transition to dest with the first (intent, source) pair that is free"""
+        for source in self.rng.sample(source_choices, len(source_choices)):
+            for intent in self.rng.sample(intent_choices, len(intent_choices)):
+                if self.add(intent, source, dest):
+                    return
+
+
+def _conditions(names: list, slot_fields: list) -> dict:
+    """Condition methods by name, each requiring a slot (if there are slots) in turn"""
+    return {name: _condition(name, slot_fields[k % len(slot_fields)] if slot_fields else None)
+            for k, name in enumerate(names)}
+
+
+def _edges(rng: random.Random, names: list, intents: list, wildcard_ratio: float,
+           conditional: bool) -> list:
+    """(intent, source, dest) of the transitions of the FSM"""
+    wildcard_edges, intents = _wildcard_edges(rng, names, intents, wildcard_ratio)
+    edges = _Edges(rng, wildcard_edges, conditional)
+    sources = [INITIAL_STATE] + names
+
+    # every state can be reached, and left, and every intent is handled
+    for dest in names:
+        edges.add_from_any(intents, sources, dest)
+    for source in sources:
+        for intent in rng.sample(intents, min(INTENTS_PER_STATE, len(intents))):
+            edges.add(intent, source, rng.choice(names))
+    handled = {intent for intent, _, _ in edges.edges}
+    for intent in intents:
+        if intent not in handled:
+            edges.add_from_any([intent], sources, rng.choice(names))
+    return edges.edges
+
+
+def make_policy_cls(num_states: int = 20, num_intents: int = 10, wildcard_ratio: float = 0.0,
+                    conditions_per_edge: int = 0, num_slots: int = 0, seed: int = 0) -> type:
+    """Policy class of a synthetic FSM with the given parameters"""
+    rng = random.Random(seed)
+    intents = [f'Intent{i}' for i in range(num_intents)]
+    names = [f'state{i}' for i in range(num_states)]
+    slot_fields = [f'slot{i}' for i in range(num_slots)]
+    conditions = [f'm_condition{k}' for k in range(conditions_per_edge)]
+
+    attributes_cls = type('Attributes', (SessionAttributes,),
+                          {'slots_cls': namedtuple('Slots', slot_fields)})
+    namespace = {'session_attributes_cls': attributes_cls,
+                 'initial': _state_response(INITIAL_STATE)}
+    transitions = {name: [] for name in names}
+    for intent, source, dest in _edges(rng, names, intents, wildcard_ratio, bool(conditions)):
+        transition = {'trigger': intent, 'source': source}
+        if conditions:
+            transition['conditions'] = conditions
+        transitions[dest].append(transition)
+    for name in names:
+        namespace[name] = with_transitions(*transitions[name])(_state_response(name))
+    suffix = f'{num_states}x{num_intents}'
+    states_cls = type(f'SyntheticStates{suffix}', (States,), namespace)
+
+    policy_namespace = {'states_cls': states_cls, 'intents': intents, 'num_slots': num_slots}
+    policy_namespace.update(_conditions(conditions, slot_fields))
+    return type(f'SyntheticPolicy{suffix}', (Policy,), policy_namespace)
+
+
+def intent_schema(policy_cls) -> dict:
+    """Alexa intent schema of a synthetic policy, e.g. for alexafsm.utils.validate"""
+    slots = [{'name': f'Slot{i}', 'type': 'AMAZON.LITERAL'} for i in range(policy_cls.num_slots)]
+    return {'intents': [{'intent': intent, 'slots': slots} for intent in policy_cls.intents]}
+
+
+def random_walk(policy_cls, num_turns: int, slot_fill: float = 0.5, seed: int = 0) -> list:
+    """Requests of a walk through a synthetic policy (see alexafsm.loadtest.random_walk)"""
+    slot_values = {f'Slot{k}': ['value'] for k in range(policy_cls.num_slots)}
+    return loadtest.random_walk(policy_cls, num_turns, slot_values, slot_fill, seed)
@@ -18,6 +18,10 @@ requirements = [
     'voicelabs==0.0.10'
 ]
 
+extra_requirements = {
+    'orjson': ['orjson']
+}
+
 test_requirements = [
     'elasticsearch==5.1.0',
     'elasticsearch-dsl==5.1.0'
@@ -38,6 +42,7 @@ setup(
                  'alexafsm'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="Apache Software License 2.0",
     zip_safe=False,
     keywords='alexafsm, alexa skill, finite-state machine, fsm, dialog, dialog state management',
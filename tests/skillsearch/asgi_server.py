@@ -0,0 +1,80 @@
+"""
+This demonstrates an ASGI server that uses alexafsm-based skill search with Policy.handle_async, so
+that a single process can keep many turns in flight while waiting for elasticsearch.
+
+Run it with any ASGI server, e.g.:
+    ES_SERVER=<your.es_server> uvicorn tests.skillsearch.asgi_server:app --port 8888
+"""
+
+import json
+import logging
+import os
+
+from elasticsearch_dsl.connections import connections
+
+from alexafsm.metrics import Metrics, asgi_app
+from alexafsm.policy_pool import PolicyPool
+from alexafsm.spans import SERIALIZE
+
+from tests.skillsearch.policy import AsyncPolicy
+from tests.skillsearch.skill_settings import SkillSettings
+
+logger = logging.getLogger(__name__)
+settings = SkillSettings()
+
+
+class ServerPolicy(AsyncPolicy):
+    # METRICS_DIR aggregates the metrics of several worker processes
+    metrics = Metrics(os.environ.get('METRICS_DIR'))
+
+
+# one policy per turn in flight; more are built on demand beyond this
+policies = PolicyPool(ServerPolicy, size=64)
+metrics_app = asgi_app(ServerPolicy.metrics)
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def _send(send, status: int, body: bytes):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            settings.es_server = os.environ.get('ES_SERVER', settings.es_server)
+            logger.info(f"Connecting to elasticsearch server on {settings.es_server}")
+            connections.create_connection(hosts=[settings.es_server])
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope.get('path') == '/metrics':
+        return await metrics_app(scope, receive, send)
+
+    if scope['method'] != 'POST':
+        return await _send(send, 405, b'{}')
+
+    req = json.loads(await _read_body(receive))
+    resp = await policies.handle_async(req, settings.analytics)
+    await _send(send, 200, ServerPolicy.spans.timed(SERIALIZE, resp.to_bytes))
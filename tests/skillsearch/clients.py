@@ -21,7 +21,11 @@ def get_es_skills(query: str, top_n: int, category: str = None, keyphrase: str =
     return result['hits']['total'], [Skill.from_es(h) for h in result['hits']['hits'][:top_n]]
 
 
-def recordable(func):
+def recordable(func=None, **memoize_kwargs):
+    """recordable with the skill settings; given a ttl, results are memoized when settings.memoize"""
+    if func is None:
+        return lambda f: recordable(f, **memoize_kwargs)
+
     def _get_record_dir():
         return SkillSettings().get_record_dir()
 
@@ -31,10 +35,14 @@ def recordable(func):
     def _is_record():
         return SkillSettings().record
 
-    return rec(_get_record_dir, _is_playback, _is_record)(func)
+    def _is_memoized():
+        return SkillSettings().memoize
 
+    return rec(_get_record_dir, _is_playback, _is_record, is_memoized=_is_memoized,
+               **memoize_kwargs)(func)
 
-@recordable
+
+@recordable(ttl=300, max_size=10000)
 def get_es_results(query: str, category: str, keyphrase: str) -> Response:
     results = _get_es_results(query, category, keyphrase, strict=True)
     if len(results.hits) == 0:
@@ -67,6 +75,7 @@ def _get_es_results(query: str, category: str, keyphrase: str, strict: bool) ->
     return skill_search.execute()
 
 
+# not memoized: a first time user must be seen as registered right after register_new_user
 @recordable
 def get_user_info(user_id: str, request_id: str) -> dict:  # NOQA
     """Get information of user with user_id from dynamodb. request_id is simply there so that we can
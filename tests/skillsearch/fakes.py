@@ -0,0 +1,121 @@
+"""Local fakes of the clients (Elasticsearch, DynamoDB) and scripted conversations for skill search"""
+
+import json
+from contextlib import ExitStack, contextmanager
+from typing import List
+from unittest import mock
+
+from alexafsm import amazon_intent
+from alexafsm.test_helpers import make_request, with_latency
+
+from tests.skillsearch import policy as policy_module
+from tests.skillsearch.intent import NEW_SEARCH, NTH_SKILL, NEXT_SKILL, PREVIOUS_SKILL, \
+    DESCRIBE_RATINGS
+from tests.skillsearch.skill import Skill, INDEX
+
+# queries for which the fake search finds nothing
+NO_RESULT_QUERIES = {'nothing', 'find nothing'}
+NUMBER_OF_HITS = 8
+
+
+def make_skill(query: str, rank: int) -> Skill:
+    return Skill.from_es({
+        '_index': INDEX,
+        '_type': 'skill',
+        '_id': f'{query}-{rank}',
+        '_score': 10.0 - rank,
+        '_source': {
+            'name': f'{query} skill {rank}',
+            'creator': 'Allen AI',
+            'category': 'Lifestyle',
+            'url': f'https://example.com/{query}/{rank}',
+            'description': f'The number {rank} skill for {query}. ' * 5,
+            'short_description': f'The number {rank} skill for {query}.',
+            'avg_rating': 4.5,
+            'num_ratings': rank,
+            'usages': [f'Alexa, ask {query} skill {rank} to help'],
+            'image_url': f'https://example.com/{query}/{rank}.png',
+            'keyphrases': [query]
+        },
+        'highlight': {
+            'description': [f'The number {rank} skill for *{query}*.']
+        }
+    })
+
+
+def get_es_skills(query: str, top_n: int, category: str = None,
+                  keyphrase: str = None) -> (int, List[Skill]):
+    if query in NO_RESULT_QUERIES:
+        return 0, []
+    return NUMBER_OF_HITS, [make_skill(query, rank) for rank in range(min(top_n, NUMBER_OF_HITS))]
+
+
+def get_user_info(user_id: str, request_id: str) -> dict:
+    """Users whose id starts with 'new' are not known yet"""
+    return None if user_id.startswith('new') else {'userId': user_id}
+
+
+def register_new_user(user_id: str):
+    pass
+
+
+@contextmanager
+def fake_clients(latency: float = 0.0, jitter: float = 0.0):
+    """
+    Replace the clients used by the skill search policy with the local fakes, taking latency
+    seconds (plus up to jitter) per call if given, like the remote services
+    """
+    with ExitStack() as stack:
+        for patch in _patches(latency, jitter):
+            stack.enter_context(patch)
+        yield
+
+
+def install_fake_clients():
+    """
+    Replace the clients with the local fakes for the rest of the process, e.g. as the setup of
+    playback worker processes, which do not inherit the patches of fake_clients when spawned
+    """
+    for patch in _patches():
+        patch.start()
+
+
+def _patches(latency: float = 0.0, jitter: float = 0.0) -> list:
+    def remote(function):
+        return with_latency(function, latency, jitter) if latency or jitter else function
+
+    return [mock.patch.object(policy_module, 'get_es_skills', remote(get_es_skills)),
+            mock.patch.object(policy_module, 'get_user_info', remote(get_user_info)),
+            mock.patch.object(policy_module, 'register_new_user', remote(register_new_user))]
+
+
+# Conversations as lists of (intent, slots) turns
+CONVERSATIONS = [
+    [(NEW_SEARCH, {'Query': 'pizza'}), (NEXT_SKILL, {}), (NEXT_SKILL, {}), (PREVIOUS_SKILL, {}),
+     (amazon_intent.YES, {}), (amazon_intent.NO, {}), (amazon_intent.YES, {})],
+    [(NEW_SEARCH, {'Query': 'find meditation'}), (NTH_SKILL, {'Nth': 'third'}),
+     (DESCRIBE_RATINGS, {}), (amazon_intent.NO, {}), (amazon_intent.STOP, {})],
+    [(NEW_SEARCH, {'Query': 'nothing'}), (NEXT_SKILL, {}), (NEW_SEARCH, {}),
+     (NEW_SEARCH, {'Query': 'find'}), (NEW_SEARCH, {'Query': 'exit'})],
+    [(amazon_intent.HELP, {}), (amazon_intent.YES, {}), (NTH_SKILL, {'Nth': '12th'}),
+     (NEW_SEARCH, {'Query': 'skills'}), (NTH_SKILL, {'Nth': 'tenth'}), (NTH_SKILL, {'Nth': '2nd'}),
+     (amazon_intent.NO, {}), (amazon_intent.NO, {}), (amazon_intent.CANCEL, {})],
+    [(NEW_SEARCH, {'Query': 'news'}), (PREVIOUS_SKILL, {}), (NTH_SKILL, {'Nth': '6'}),
+     (amazon_intent.NO, {}), (NEXT_SKILL, {}), (amazon_intent.STOP, {}), (amazon_intent.NO, {}),
+     (amazon_intent.CANCEL, {})]
+]
+
+
+def converse(policy, turns, session_id: str = 'session', user_id: str = 'user', **kwargs):
+    """
+    Play the given turns through policy.handle (with the given keyword arguments), sending back the
+    session attributes of each response like Alexa would. Yield (request, response) pairs, both in
+    json format.
+    """
+    attributes = {}
+    for i, (intent, slots) in enumerate(turns):
+        request = make_request(intent, slots, attributes, session_id=session_id, user_id=user_id,
+                               request_id=f'{session_id}-{i}')
+        response = json.loads(policy.handle(request, **kwargs).to_bytes())
+        attributes = response['sessionAttributes']
+        yield request, response
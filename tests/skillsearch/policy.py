@@ -1,16 +1,21 @@
+import asyncio
 import logging
+from typing import List
 
+from alexafsm.conditions import condition
 from alexafsm.policy import Policy as PolicyBase
 
 from tests.skillsearch.clients import get_es_skills, get_user_info, register_new_user
+from tests.skillsearch.skill import Skill
 from tests.skillsearch.states import States, MAX_SKILLS
 
 logger = logging.getLogger(__name__)
 
 
 class Policy(PolicyBase):
-    def __init__(self, states: States, request: dict, with_graph: bool = False):
-        super().__init__(states, request, with_graph)
+    def __init__(self, states: States, request: dict, with_graph: bool = False,
+                 engine: str = None):
+        super().__init__(states, request, with_graph, engine)
 
         if request:
             user_id = request['session']['user']['userId']
@@ -34,6 +39,7 @@ class Policy(PolicyBase):
 
         return self.attributes.slots.query and not self.m_searching_for_exit()
 
+    @condition
     def m_searching_for_exit(self) -> bool:
         # sometimes Amazon misinterprets "exit" as a search intent for the term "exit" instead of
         # the exit intent. Let's take care of that on behalf of the user
@@ -41,18 +47,26 @@ class Policy(PolicyBase):
 
     def m_search(self) -> None:
         """Search for skills matching user's query"""
+        es_query = self._search_query()
+        if es_query is not None:
+            self._set_search_results(*get_es_skills(es_query, MAX_SKILLS))
+
+    def _search_query(self) -> str:
+        """Return the query to send to elasticsearch, or None if we should not search"""
         attributes = self.states.attributes
         if attributes.searched:
-            return  # don't search more than once
+            return None  # don't search more than once
 
         if not self._valid_search():
-            return
+            return None
         self.states.attributes.query = attributes.slots.query
         es_query = self.states.attributes.query
         if self.states.attributes.query == 'skills':
             es_query = 'search for skills'  # get our own skill
+        return es_query
 
-        number_of_hits, skills = get_es_skills(es_query, MAX_SKILLS)
+    def _set_search_results(self, number_of_hits: int, skills: List[Skill]) -> None:
+        attributes = self.states.attributes
         logger.info(f"Searching for {self.attributes.query}, got {number_of_hits} hits.")
         attributes.skills = skills
         attributes.number_of_hits = number_of_hits
@@ -60,21 +74,26 @@ class Policy(PolicyBase):
         attributes.searched = True
         attributes.first_time_presenting_results = True
 
+    @condition
     def m_no_query_search(self) -> bool:
         """Amazon sent us a search intent without a query
         or maybe the user said "I want to find ..." and took too long to finish"""
         return not self.attributes.slots.query or self.attributes.slots.query == 'find'
 
+    @condition
     def m_no_result(self) -> bool:
         return self.attributes.query and not self.m_has_result()
 
+    @condition
     def m_has_result(self) -> bool:
         return self.attributes.query is not None and self.attributes.skills is not None and len(
             self.attributes.skills) > 0
 
+    @condition
     def m_has_result_and_query(self) -> bool:
         return self.m_has_result() and not self.m_no_query_search()
 
+    @condition
     def m_has_nth(self) -> bool:
         return self.m_has_result() and \
             len(self.attributes.skills) > self.attributes.nth_as_index >= 0
@@ -88,6 +107,7 @@ class Policy(PolicyBase):
         self.attributes.skill_cursor += 1
         self.attributes.first_time_presenting_results = False
 
+    @condition
     def m_has_next(self) -> bool:
         return self.m_has_result() and \
             self.attributes.skill_cursor + 1 < len(self.attributes.skills)
@@ -97,5 +117,21 @@ class Policy(PolicyBase):
         self.attributes.skill_cursor -= 1
         self.attributes.first_time_presenting_results = False
 
+    @condition
     def m_has_previous(self) -> bool:
         return self.m_has_result() and self.attributes.skill_cursor > 0
+
+
+class AsyncPolicy(Policy):
+    """
+    Policy for asyncio servers (see Policy.handle_async): the blocking elasticsearch client runs in
+    the event loop's executor, so that the loop can handle other turns in the meantime
+    """
+
+    async def m_search(self) -> None:
+        """Search for skills matching user's query"""
+        es_query = self._search_query()
+        if es_query is not None:
+            loop = asyncio.get_event_loop()
+            self._set_search_results(
+                *await loop.run_in_executor(None, get_es_skills, es_query, MAX_SKILLS))
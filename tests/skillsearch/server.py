@@ -1,7 +1,6 @@
 """This demonstrates a Flask server that uses alexafsm-based skill search"""
 
 import getopt
-import json
 import logging
 import sys
 from elasticsearch_dsl.connections import connections
@@ -10,6 +9,11 @@ from livereload import Server
 
 from voicelabs.voicelabs import VoiceInsights
 
+from alexafsm.analytics import AnalyticsDispatcher, VoiceInsightsSink
+from alexafsm.metrics import Metrics, mount
+from alexafsm.policy_pool import PolicyPool
+from alexafsm.spans import SERIALIZE
+
 from tests.skillsearch.policy import Policy
 from tests.skillsearch.skill_settings import SkillSettings
 
@@ -20,11 +24,18 @@ settings = SkillSettings()
 port = 8888
 
 
+class ServerPolicy(Policy):
+    metrics = Metrics()
+
+
+policies = PolicyPool(ServerPolicy)
+
+
 @app.route('/', methods=['POST'])
 def main():
     req = flask_request.json
-    policy = Policy.initialize()
-    return json.dumps(policy.handle(req, settings.vi)).encode('utf-8')
+    resp = policies.handle(req, settings.analytics)
+    return ServerPolicy.spans.timed(SERIALIZE, resp.to_bytes)
 
 
 def _usage():
@@ -48,7 +59,7 @@ if __name__ == '__main__':
             settings.es_server = arg
         if opt in ('-i', '--voice-insight'):
             print("Activating VoiceInsight")
-            settings.vi = VoiceInsights()
+            settings.analytics = AnalyticsDispatcher(VoiceInsightsSink(VoiceInsights()))
 
     log_file = f"alexa.log"
     print(f"Logging to {log_file} (append)")
@@ -59,5 +70,6 @@ if __name__ == '__main__':
     print(f"Connecting to elasticsearch server on {settings.es_server}")
     connections.create_connection(hosts=[settings.es_server])
     print(f"Now listening for Alexa requests on port #: {port}")
-    server = Server(app.wsgi_app)
+    # metrics of the policies at /metrics, next to the skill
+    server = Server(mount(app.wsgi_app, ServerPolicy.metrics))
     server.serve(host='0.0.0.0', port=port)
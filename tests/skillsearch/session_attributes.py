@@ -1,7 +1,10 @@
 from collections import namedtuple
 from typing import List
 
-from alexafsm.session_attributes import SessionAttributes as SessionAttributesBase, INITIAL_STATE
+from alexafsm.attributes_codec import AttributesCodec
+from alexafsm.attributes_schema import Field, attributes_class
+from alexafsm.session_attributes import SessionAttributes as SessionAttributesBase, INITIAL_STATE, \
+    LazyField
 
 from tests.skillsearch.skill import Skill
 
@@ -11,11 +14,21 @@ ENGLISH_NUMBERS = ['first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seve
                    'ninth', 'tenth']
 
 
+def _skills_from_es(skills: list) -> List[Skill]:
+    return [Skill.from_es(skill) for skill in skills] or None
+
+
 class SessionAttributes(SessionAttributesBase):
     slots_cls = Slots
 
     not_sent_fields = ['searched', 'first_time']
 
+    # search results are sent back and forth on every turn, pack them
+    codec = AttributesCodec(fields=['skills'], max_bytes=16 * 1024)
+
+    # and only convert them to skills on turns that use them
+    skills = LazyField(_skills_from_es)
+
     def __init__(self,
                  intent: str = None,
                  slots=None,
@@ -30,10 +43,7 @@ class SessionAttributes(SessionAttributesBase):
                  said_interrupt: bool = False):
         super().__init__(intent, slots, state)
         self.query = query
-        if skills:
-            self.skills = [Skill.from_es(skill) for skill in skills]
-        else:
-            self.skills = None
+        self.skills = _skills_from_es(skills) if skills else None
         self.number_of_hits = number_of_hits
         self.skill_cursor = skill_cursor
         self.searched = searched
@@ -63,3 +73,21 @@ class SessionAttributes(SessionAttributesBase):
     @property
     def skill(self):
         return self.skills[self.skill_cursor]
+
+
+class SlottedSessionAttributes(attributes_class('SlottedSessionAttributes', Slots, [
+    Field('query', str),
+    Field('skills', list, parse=_skills_from_es),
+    Field('number_of_hits', int),
+    Field('skill_cursor', int),
+    Field('searched', bool, default=False, sent=False),
+    Field('first_time', bool, default=True, sent=False),
+    Field('first_time_presenting_results', bool, default=False),
+    Field('said_interrupt', bool, default=False)
+])):
+    """Same as SessionAttributes, generated from the declaration of its fields"""
+    __slots__ = ()
+
+    codec = SessionAttributes.codec
+    nth_as_index = SessionAttributes.nth_as_index
+    skill = SessionAttributes.skill
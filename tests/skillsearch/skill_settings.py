@@ -11,9 +11,11 @@ class SkillSettings:
         REQUEST_TIMEOUT = 100
         es_server = 'ES_SERVER'
         dynamodb = 'chat-dev'
-        vi = None
+        analytics = None  # alexafsm.analytics.AnalyticsDispatcher
         record = False
         playback = False
+        # in-process memoization of elasticsearch calls (not of user info), see clients.recordable
+        memoize = False
 
         def get_record_dir(self):
             """Get the directory where replays should be saved"""
@@ -32,3 +34,8 @@ class SkillSettings:
 
     def __setattr__(self, key, value):
         return setattr(self.settings, key, value)
+
+
+def playback_mode():
+    """Play back recorded elasticsearch and dynamodb calls, e.g. in alexafsm.playback processes"""
+    SkillSettings().playback = True
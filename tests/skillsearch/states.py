@@ -1,4 +1,4 @@
-from alexafsm.states import with_transitions, States as StatesBase
+from alexafsm.states import cacheable, with_transitions, States as StatesBase
 from alexafsm import response
 from alexafsm import amazon_intent
 
@@ -66,6 +66,7 @@ class States(StatesBase):
     PROMPT_ON_STOP_STATES = ['initial', 'helping']
     # initial is its own special thing -- don't exit when interrupting the initial help message
 
+    @cacheable(key=lambda attributes: attributes.first_time)
     def initial(self) -> response.Response:
         if self.attributes.first_time:
             welcome_speech = f"Welcome to {self.skill_name}. {HELP}"
@@ -78,6 +79,7 @@ class States(StatesBase):
         )
 
     @with_transitions({'trigger': amazon_intent.HELP, 'source': '*'})
+    @cacheable()
     def helping(self) -> response.Response:
         return response.Response(
             speech=HELP,
@@ -91,6 +93,7 @@ class States(StatesBase):
             'conditions': 'm_no_query_search'
         }
     )
+    @cacheable()
     def no_query_search(self) -> response.Response:
         """No query specified, ask for query"""
         return response.Response(
@@ -261,6 +264,7 @@ class States(StatesBase):
             'source': PROMPT_ON_STOP_STATES
         }
     )
+    @cacheable()
     def search_prompt(self) -> response.Response:
         """when we're asking the user to conduct a new search"""
         return response.Response(
@@ -315,6 +319,7 @@ class States(StatesBase):
             'source': CONTINUE_ON_STOP_STATES
         }
     )
+    @cacheable()
     def is_that_all(self) -> response.Response:
         """when we want to see if the user is done with the skill"""
         return response.Response(
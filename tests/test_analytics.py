@@ -0,0 +1,143 @@
+import gc
+import threading
+import time
+import weakref
+
+import pytest
+from voicelabs import VoiceInsights
+
+from alexafsm.analytics import AnalyticsDispatcher, AnalyticsSink, DROP_NEWEST, DROP_OLDEST, Event, \
+    dispatcher_for
+from alexafsm.test_helpers import FakeAnalyticsSink, make_request
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def test_events_of_conversation():
+    sink = FakeAnalyticsSink()
+    dispatcher = AnalyticsDispatcher(sink, max_batch_delay=0.01)
+    policy = Policy.initialize()
+    with fake_clients():
+        list(converse(policy, CONVERSATIONS[1], analytics=dispatcher))
+        policy.handle(make_request(request_type='SessionEndedRequest'), dispatcher)
+    assert dispatcher.flush(timeout=5)
+
+    assert [event.request['request'].get('intent', {}).get('name') for event in sink.events] == \
+        [intent for intent, _ in CONVERSATIONS[1]] + [None]
+    assert sink.events[0].response['response']['outputSpeech']['text'].startswith(
+        'You asked for meditation')
+    dispatcher.close()
+
+
+class BlockedSink(AnalyticsSink):
+    def __init__(self):
+        self.unblocked = threading.Event()
+        self.events = []
+
+    def send(self, events):
+        self.unblocked.wait()
+        self.events.extend(events)
+
+
+def _fill(drop_policy):
+    sink = BlockedSink()
+    dispatcher = AnalyticsDispatcher(sink, max_queue_size=3, batch_size=1, drop_policy=drop_policy)
+    for i in range(10):
+        dispatcher.submit({'id': i})
+        time.sleep(0.01)  # the worker takes the first event and blocks on it
+    sink.unblocked.set()
+    dispatcher.close()
+    return dispatcher, [event.request['id'] for event in sink.events]
+
+
+def test_drop_newest():
+    dispatcher, ids = _fill(DROP_NEWEST)
+    assert ids == [0, 1, 2, 3]
+    assert dispatcher.dropped == 6
+
+
+def test_drop_oldest():
+    dispatcher, ids = _fill(DROP_OLDEST)
+    assert ids == [0, 7, 8, 9]
+    assert dispatcher.dropped == 6
+
+
+def test_close_flushes_and_sink_errors_are_contained():
+    class FailingSink(AnalyticsSink):
+        def send(self, events):
+            raise ValueError('analytics service is down')
+
+    failing = AnalyticsDispatcher(FailingSink(), max_batch_delay=0.01)
+    failing.submit({})
+    failing.close()
+    assert failing.failed == 1
+
+    sink = FakeAnalyticsSink()
+    dispatcher = AnalyticsDispatcher(sink, max_batch_delay=10)
+    for i in range(5):
+        dispatcher.submit({'id': i})
+    dispatcher.close()
+    assert len(sink.events) == 5
+    dispatcher.submit({'id': 5})  # dropped after close
+    assert dispatcher.dropped == 1
+
+
+def test_latency_off_request_path():
+    latency = 0.05
+    with fake_clients():
+        requests = [request for request, _ in converse(Policy.initialize(), CONVERSATIONS[0])]
+    inline_sink = FakeAnalyticsSink(latency=latency)
+    sink = FakeAnalyticsSink(latency=latency)
+    dispatcher = AnalyticsDispatcher(sink, max_batch_delay=0.01)
+    policy = Policy.initialize()
+    with fake_clients():
+        start = time.time()
+        for request in requests:
+            resp = policy.handle(request)
+            # what tracking on the request path costs
+            inline_sink.send([Event(request, resp.to_json(), time.time())])
+        inline = time.time() - start
+
+        start = time.time()
+        for request in requests:
+            policy.handle(request, dispatcher)
+        dispatched = time.time() - start
+    dispatcher.close()
+
+    assert len(sink.events) == len(requests)
+    assert sink.batches < len(requests)
+    assert inline >= latency * len(requests)
+    assert dispatched < inline / 2
+
+
+def test_voice_insights_alias():
+    sink = FakeAnalyticsSink()
+    dispatcher = AnalyticsDispatcher(sink, max_batch_delay=0.01)
+    with pytest.warns(DeprecationWarning):
+        Policy.initialize().handle(make_request(request_type='LaunchRequest'),
+                                   voice_insights=dispatcher)
+    dispatcher.close()
+    assert len(sink.events) == 1
+
+
+def test_dispatchers_are_freed(monkeypatch):
+    monkeypatch.setenv('VOICELABS_API_KEY', 'test')
+    sink = FakeAnalyticsSink()
+    dispatcher = AnalyticsDispatcher(sink, max_batch_delay=10)
+    dispatcher.submit({'id': 0})
+    thread = dispatcher._thread
+    freed = weakref.ref(dispatcher)
+    del dispatcher
+    gc.collect()
+    assert freed() is None
+    thread.join(5)  # queued events are sent, and the worker stops
+    assert not thread.is_alive() and len(sink.events) == 1
+
+    voice_insights = VoiceInsights()
+    dispatcher = dispatcher_for(voice_insights)
+    assert dispatcher_for(voice_insights) is dispatcher
+    freed = weakref.ref(dispatcher)
+    del dispatcher, voice_insights
+    gc.collect()
+    assert freed() is None
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import time
+from collections import namedtuple
+
+from alexafsm import response
+from alexafsm.policy import Policy as PolicyBase
+from alexafsm.policy_pool import PolicyPool
+from alexafsm.session_attributes import SessionAttributes
+from alexafsm.states import States as StatesBase, with_transitions
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch import asgi_server
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import AsyncPolicy, Policy
+
+
+def _run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+async def _converse_async(policy, turns):
+    responses = []
+    attributes = {}
+    for i, (intent, slots) in enumerate(turns):
+        request = make_request(intent, slots, attributes, request_id=f'request-{i}')
+        resp = json.loads((await policy.handle_async(request)).to_bytes())
+        attributes = resp['sessionAttributes']
+        responses.append(resp)
+    return responses
+
+
+def test_skillsearch_async_parity():
+    with fake_clients():
+        for turns in CONVERSATIONS:
+            expected = [resp for _, resp in converse(Policy.initialize(), turns)]
+            assert _run(_converse_async(AsyncPolicy.initialize(), turns)) == expected
+
+
+class Attributes(SessionAttributes):
+    slots_cls = namedtuple('Slots', ['delay'])
+
+
+class States(StatesBase):
+    session_attributes_cls = Attributes
+
+    def initial(self):
+        return response.Response(speech='hello', reprompt='hello')
+
+    @with_transitions({'trigger': 'Wait', 'source': '*', 'prepare': 'm_wait',
+                       'conditions': ['m_sync_true', 'm_async_true']})
+    def waited(self):
+        return response.Response(speech='waited', reprompt='waited')
+
+    @with_transitions({'trigger': 'Wait', 'source': '*', 'conditions': 'm_sync_true'})
+    def without_waiting(self):  # candidate after 'waited' (candidates are in alphabetical order)
+        return response.Response(speech='without waiting', reprompt='without waiting')
+
+    async def async_state(self):
+        await asyncio.sleep(0)
+        return response.Response(speech='async state', reprompt='async state')
+
+
+class WaitingPolicy(PolicyBase):
+    states_cls = States
+
+    async def m_wait(self):
+        await asyncio.sleep(float(self.attributes.slots.delay))
+
+    def m_sync_true(self):
+        return True
+
+    async def m_async_true(self):
+        await asyncio.sleep(0)
+        return True
+
+
+def test_many_turns_in_flight():
+    delay = 0.2
+    pool = PolicyPool(WaitingPolicy, size=10)
+    requests = [make_request('Wait', {'Delay': str(delay)}, {}, request_id=str(i))
+                for i in range(300)]
+    start = time.time()
+    responses = _run(asyncio.gather(*[pool.handle_async(request) for request in requests]))
+    elapsed = time.time() - start
+
+    assert [resp.speech for resp in responses] == ['waited'] * len(requests)
+    assert [resp.session_attributes.state for resp in responses] == ['waited'] * len(requests)
+    assert elapsed < 10 * delay  # the turns waited concurrently
+
+
+def test_async_state_response():
+    policy = WaitingPolicy.initialize()
+    policy.state = 'async_state'
+    assert _run(policy.handle_async(make_request(request_type='LaunchRequest'))).speech == \
+        'async state'
+
+
+def test_asgi_app():
+    async def _post(request: dict):
+        messages = [{'type': 'http.request', 'body': json.dumps(request).encode('utf-8')}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_server.app({'type': 'http', 'method': 'POST'}, receive, send)
+        return sent[0]['status'], json.loads(sent[1]['body'])
+
+    with fake_clients():
+        expected = [resp for _, resp in converse(Policy.initialize(), CONVERSATIONS[0])]
+        actual = _run(asyncio.gather(*[_post(request)
+                                       for request, _ in converse(Policy.initialize(),
+                                                                  CONVERSATIONS[0])]))
+    assert [status for status, _ in actual] == [200] * len(expected)
+    assert [resp for _, resp in actual] == expected
@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+import pytest
+
+from alexafsm.attributes_codec import PACKED_KEY, AttributesCodec, unpack
+from alexafsm.serializer import serialize
+from alexafsm.session_attributes import SessionAttributes as SessionAttributesBase
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+from tests.skillsearch.session_attributes import SessionAttributes as SkillSearchAttributes
+
+Slots = namedtuple('Slots', ['query'])
+
+
+class SessionAttributes(SessionAttributesBase):
+    slots_cls = Slots
+    codec = None
+
+    def __init__(self, intent: str = None, slots=None, state: str = 'initial', notes: list = None,
+                 history: list = None):
+        super().__init__(intent, slots, state)
+        self.notes = notes
+        self.history = history
+
+
+def _round_trip(attributes: SessionAttributes) -> (dict, SessionAttributes):
+    sent, data = attributes.end_turn()
+    assert sent == attributes.to_json() and data == serialize(sent)
+    request = make_request('Search', {'Query': 'pizza'}, attributes=sent)
+    return sent, type(attributes).from_request(request)
+
+
+def test_round_trip():
+    class PackedAttributes(SessionAttributes):
+        codec = AttributesCodec(fields=['notes', 'history'])
+
+    sent, received = _round_trip(PackedAttributes(state='searching', notes=['a'] * 100,
+                                                  history=[{'turn': i} for i in range(3)]))
+    assert set(sent) == {'state', PACKED_KEY}
+    assert len(serialize(sent)) < len(serialize(SessionAttributes(notes=['a'] * 100).to_json()))
+    assert received.state == 'searching'
+    assert received.notes == ['a'] * 100
+    assert received.history == [{'turn': 0}, {'turn': 1}, {'turn': 2}]
+    assert received.slots == Slots(query='pizza')
+
+    # sizes are recorded once per turn, not by to_json
+    received.to_json()
+    info = PackedAttributes.codec.stats.info()
+    assert info['count'] == 1
+    assert info['last_bytes'] == len(serialize(sent))
+    assert info['over_budget'] == 0
+
+
+def test_budget():
+    class BudgetAttributes(SessionAttributes):
+        codec = AttributesCodec(fields=['notes'], max_bytes=200, trim_fields=['history', 'notes'])
+
+    # incompressible notes, so that they do not fit once the history is trimmed
+    notes = [str(i * 7919 % 10007) for i in range(100)]
+    sent, received = _round_trip(BudgetAttributes(notes=notes, history=['x'] * 100))
+    assert received.history is None
+    assert received.notes is None
+    assert len(serialize(sent)) <= 200
+
+    stats = BudgetAttributes.codec.stats
+    assert (stats.over_budget, stats.trimmed) == (1, 2)
+
+
+def test_unknown_version():
+    with pytest.raises(ValueError):
+        unpack('z9:abc')
+
+
+def test_skillsearch_packed_skills():
+    codec = SkillSearchAttributes.codec
+    count = codec.stats.count
+    with fake_clients():
+        for request, resp in converse(Policy.initialize(), CONVERSATIONS[0]):
+            attributes = resp['sessionAttributes']
+            assert 'skills' not in attributes
+            assert len(unpack(attributes[PACKED_KEY])['skills']) == 6
+    assert codec.stats.count == count + len(CONVERSATIONS[0])
+    assert codec.stats.max_bytes < codec.max_bytes
@@ -0,0 +1,79 @@
+import gc
+from collections import namedtuple
+from typing import List
+
+import pytest
+
+from alexafsm.attributes_schema import Field, attributes_class
+from alexafsm.session_attributes import INITIAL_STATE
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+from tests.skillsearch.session_attributes import SlottedSessionAttributes
+from tests.skillsearch.states import States
+
+Slots = namedtuple('Slots', ['love', 'money'])
+
+Attributes = attributes_class('Attributes', Slots, [
+    Field('count', int, default=0),
+    Field('ratings', List[float]),
+    Field('name', parse=str.title),
+    Field('seen', bool, default=False, sent=False)
+])
+
+
+def test_from_request():
+    request = make_request('Search', {'Money': 'lots'},
+                           {'state': 'blissful', 'count': '3', 'ratings': [4, '4.5'],
+                            'name': 'ann lee', 'seen': True, 'unknown': 1})
+    attributes = Attributes.from_request(request)
+    assert (attributes.intent, attributes.state) == ('Search', 'blissful')
+    assert attributes.slots == Slots(love=None, money='lots')
+    assert (attributes.count, attributes.ratings) == (3, [4.0, 4.5])
+    assert (attributes.name, attributes.seen) == ('Ann Lee', True)
+    assert attributes.to_json() == {'intent': 'Search', 'slots': Slots(love=None, money='lots'),
+                                    'state': 'blissful', 'count': 3, 'ratings': [4.0, 4.5],
+                                    'name': 'Ann Lee'}
+
+    launch = Attributes.from_request(make_request(request_type='LaunchRequest'))
+    assert (launch.intent, launch.state, launch.count, launch.ratings) == \
+        (None, INITIAL_STATE, 0, None)
+
+    initial = Attributes.from_request(None)
+    assert initial.slots == Slots(love=None, money=None)
+    assert Attributes(count='7').count == 7
+
+
+def test_no_instance_dict():
+    for attributes in (Attributes.from_request(make_request('Search')), Attributes(),
+                       SlottedSessionAttributes.from_request(make_request('Search'))):
+        assert not hasattr(attributes, '__dict__')
+        assert not any(isinstance(referent, dict) for referent in gc.get_referents(attributes))
+        with pytest.raises(AttributeError):
+            attributes.undeclared = 1
+    assert Attributes.__slots__[:4] == ('intent', 'slots', 'state', 'count')
+    assert Attributes.not_sent_fields == ['seen']
+
+
+def test_invalid_fields():
+    with pytest.raises(ValueError):
+        attributes_class('Invalid', Slots, [Field('state')])
+    with pytest.raises(ValueError):
+        attributes_class('Invalid', Slots, [Field('_private')])
+
+
+class SlottedStates(States):
+    session_attributes_cls = SlottedSessionAttributes
+
+
+class SlottedPolicy(Policy):
+    states_cls = SlottedStates
+
+
+@pytest.mark.parametrize('turns', CONVERSATIONS)
+def test_skillsearch_parity(turns):
+    with fake_clients():
+        expected = list(converse(Policy.initialize(), turns))
+        actual = list(converse(SlottedPolicy.initialize(), turns))
+    assert [resp for _, resp in actual] == [resp for _, resp in expected]
@@ -0,0 +1,87 @@
+import asyncio
+from collections import namedtuple
+
+from alexafsm import response
+from alexafsm.serializer import serialize
+from alexafsm.session_attributes import SessionAttributes
+from alexafsm.states import States as StatesBase, cacheable
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+from tests.skillsearch.session_attributes import SessionAttributes as SkillSearchAttributes
+from tests.skillsearch.states import States as SkillSearchStates
+
+
+def test_pre_encoded_response():
+    attributes = SkillSearchAttributes(state='helping', query='pizza')
+    resp = response.NOT_UNDERSTOOD._replace(session_attributes=attributes)
+    assert '_encoded_body' in resp.__dict__
+    assert resp.to_bytes() == serialize(resp)
+    assert resp == response.NOT_UNDERSTOOD._replace(session_attributes=attributes)
+
+    changed = resp._replace(speech='Something else')
+    assert '_encoded_body' not in changed.__dict__
+    assert b'Something else' in changed.to_bytes()
+
+    assert response.end('Skill Search') is response.end('Skill Search')
+
+
+def test_skillsearch_cached_responses():
+    for method in vars(SkillSearchStates).values():
+        if hasattr(method, 'cache'):
+            method.cache.clear()
+    with fake_clients():
+        for conversation in CONVERSATIONS:
+            policy = Policy.initialize()
+            for request, _ in converse(Policy.initialize(), conversation):
+                # replay each request with a second policy, so every cached response is hit
+                resp = policy.handle(request)
+                assert resp.to_bytes() == serialize(resp)
+
+    info = SkillSearchStates.cache_info()
+    assert set(info) == {'initial', 'helping', 'no_query_search', 'search_prompt', 'is_that_all'}
+    assert info['helping'] == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 128}
+
+
+def test_cached_per_class():
+    class OtherStates(SkillSearchStates):
+        skill_name = 'Other Skill'
+
+    attributes = SkillSearchAttributes(first_time=True)
+    assert SkillSearchStates(attributes).initial().speech.startswith('Welcome to Skill Search')
+    assert OtherStates(attributes).initial().speech.startswith('Welcome to Other Skill')
+    assert SkillSearchStates(attributes).initial().speech.startswith('Welcome to Skill Search')
+
+
+class Attributes(SessionAttributes):
+    slots_cls = namedtuple('Slots', [])
+
+    def __init__(self, intent: str = None, slots=None, state: str = 'initial', name: str = None):
+        super().__init__(intent, slots, state)
+        self.name = name
+
+
+class States(StatesBase):
+    session_attributes_cls = Attributes
+
+    @cacheable(key=lambda attributes: attributes.name, maxsize=2)
+    def greeting(self):
+        return response.Response(speech=f'Hello {self.attributes.name}', reprompt='')
+
+    @cacheable()
+    async def waiting(self):
+        await asyncio.sleep(0)
+        return response.Response(speech='Still there?', reprompt='')
+
+
+def test_cache_by_key():
+    for name in ['ann', 'bob', 'ann', 'cid', 'bob']:
+        resp = States(Attributes(name=name)).greeting()
+        assert resp.speech == f'Hello {name}'
+    # bob was evicted when cid was added
+    assert States.greeting.cache.info() == {'hits': 1, 'misses': 4, 'size': 2, 'maxsize': 2}
+
+    loop = asyncio.get_event_loop()
+    first = loop.run_until_complete(States(Attributes()).waiting())
+    assert loop.run_until_complete(States(Attributes()).waiting()) is first
+    assert States.cache_info()['waiting']['hits'] == 1
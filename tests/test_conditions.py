@@ -0,0 +1,140 @@
+import asyncio
+from collections import Counter, namedtuple
+
+import pytest
+
+from alexafsm import response
+from alexafsm.conditions import condition
+from alexafsm.engine import NATIVE, TRANSITIONS
+from alexafsm.policy import Policy as PolicyBase
+from alexafsm.session_attributes import SessionAttributes, INITIAL_STATE
+from alexafsm.states import States as StatesBase, with_transitions
+from alexafsm.test_helpers import make_request
+
+
+class Attributes(SessionAttributes):
+    slots_cls = namedtuple('Slots', [])
+
+    def __init__(self, intent: str = None, slots=None, state: str = INITIAL_STATE,
+                 count: int = 0):
+        super().__init__(intent, slots, state)
+        self.count = count
+
+
+class States(StatesBase):
+    session_attributes_cls = Attributes
+
+    def initial(self):
+        return response.end('initial')
+
+    @with_transitions(
+        {'trigger': 'Go', 'source': 'initial', 'conditions': ['m_many', 'm_positive']},
+        {'trigger': 'Ask', 'source': 'initial', 'conditions': 'm_async'},
+        {'trigger': 'Count', 'source': 'initial', 'prepare': 'm_increment',
+         'conditions': 'm_many'},
+        {'trigger': 'Check', 'source': 'initial', 'conditions': ['m_many', 'm_even']}
+    )
+    def many(self):
+        return response.end('many')
+
+    @with_transitions(
+        {'trigger': 'Go', 'source': 'initial', 'conditions': 'm_positive'},
+        {'trigger': 'Count', 'source': 'initial'},
+        {'trigger': 'Ask', 'source': 'initial', 'conditions': 'm_async', 'unless': 'm_positive'},
+        {'trigger': 'Check', 'source': 'initial', 'unless': 'm_even'}
+    )
+    def positive(self):
+        return response.end('positive')
+
+
+class Policy(PolicyBase):
+    states_cls = States
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = Counter()
+
+    @condition
+    def m_positive(self) -> bool:
+        self.calls['m_positive'] += 1
+        return self.attributes.count > 0
+
+    @condition(cost=10)
+    def m_many(self) -> bool:
+        self.calls['m_many'] += 1
+        return self.m_positive() and self.attributes.count > 2
+
+    @condition
+    def m_even(self) -> bool:
+        self.calls['m_even'] += 1
+        return self.attributes.count % 2 == 0
+
+    @condition
+    async def m_async(self) -> bool:
+        self.calls['m_async'] += 1
+        return self.m_positive()
+
+    def m_increment(self):
+        self.attributes.count += 1
+
+
+def _policy(policy_cls, count: int, intent: str = 'Go', engine: str = TRANSITIONS):
+    return policy_cls.initialize(make_request(intent, {}, {'count': count}), engine=engine)
+
+
+@pytest.mark.parametrize('engine', [TRANSITIONS, NATIVE])
+def test_memoized_per_trigger(engine):
+    policy = _policy(Policy, 1, engine=engine)
+    assert policy.execute() == response.end('positive')
+    # m_positive is called by m_many, and by the condition of the second candidate
+    assert policy.calls == {'m_many': 1, 'm_positive': 1}
+
+    policy.reset(make_request('Go', {}, {'count': 3}))
+    assert policy.execute() == response.end('many')
+    assert policy.calls == {'m_many': 2, 'm_positive': 2}
+
+    # not memoized outside of Policy.execute
+    policy.m_positive()
+    policy.m_positive()
+    assert policy.calls['m_positive'] == 4
+
+
+@pytest.mark.parametrize('engine', [TRANSITIONS, NATIVE])
+def test_invalidated_by_changes(engine):
+    policy = _policy(Policy, 0, 'Count', engine=engine)
+    policy.m_many()
+    assert policy.calls == {'m_many': 1, 'm_positive': 1}
+    assert policy.execute() == response.end('positive')
+    policy.reset(make_request('Count', {}, {'count': 2}))
+    assert policy.execute() == response.end('many')
+    assert policy.attributes.count == 3
+
+
+def test_async_conditions():
+    policy = _policy(Policy, 0, 'Ask')
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(policy.execute_async()) == response.end('initial')
+    assert policy.calls == {'m_async': 1, 'm_positive': 1}
+
+
+class OrderedPolicy(Policy):
+    order_conditions_by_cost = True
+
+
+@pytest.mark.parametrize('engine', [TRANSITIONS, NATIVE])
+def test_ordered_by_cost(engine):
+    policy = _policy(OrderedPolicy, 3, engine=engine)
+    # m_positive is cheaper than m_many, but both transitions can be taken, so they keep their order
+    assert [t.dest for t in policy._engine.table.get('initial', 'Go')] == ['many', 'positive']
+    assert policy.execute() == response.end('many')
+
+    # the cheap transition ruled out by m_even is tried (and taken) before the expensive one
+    policy = _policy(OrderedPolicy, 3, 'Check', engine=engine)
+    assert [t.dest for t in policy._engine.table.get('initial', 'Check')] == ['positive', 'many']
+    assert policy.execute() == response.end('positive')
+    assert policy.calls == {'m_even': 1}
+    policy.reset(make_request('Check', {}, {'count': 4}))
+    assert policy.execute() == response.end('many')
+
+    assert policy._engine is not _policy(Policy, 3, engine=engine)._engine
+    assert policy._engine is _policy(OrderedPolicy, 3, engine=engine)._engine
@@ -0,0 +1,67 @@
+import gzip
+import logging
+import shutil
+
+from alexafsm import coverage
+from alexafsm.test_helpers import get_requests_responses
+from alexafsm.utils import unused_events_states_transitions, used_events_states_transitions
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def _record(record_file: str, log_file: str = None):
+    handler = logging.FileHandler(log_file) if log_file else None
+    policy_logger = logging.getLogger('alexafsm.policy')
+    if handler:
+        policy_logger.addHandler(handler)
+        policy_logger.setLevel(logging.INFO)
+    try:
+        with fake_clients():
+            for i, turns in enumerate(CONVERSATIONS):
+                list(converse(Policy.initialize(), turns, session_id=f'session-{i}',
+                              record_filename=record_file))
+    finally:
+        if handler:
+            policy_logger.removeHandler(handler)
+            policy_logger.setLevel(logging.NOTSET)
+            handler.close()
+
+
+def test_recordings(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    _record(record_file)
+    # the same recordings, as a gzipped shard: everything is counted twice
+    shard_file = str(tmpdir.join('recordings.1.1.1.json.gz'))
+    with open(record_file, 'rb') as f, gzip.open(shard_file, 'wb') as shard:
+        shutil.copyfileobj(f, shard)
+
+    corpus = coverage.analyze([record_file], processes=2)
+    turns = sum(len(turns) for turns in CONVERSATIONS)
+    assert corpus.turns == 2 * turns
+    assert corpus.session_stats()['sessions'] == 2 * len(CONVERSATIONS)
+    assert corpus.session_stats()['max_turns'] == max(len(turns) for turns in CONVERSATIONS)
+
+    recorded = get_requests_responses(record_file)
+    assert corpus.used_events_states_transitions() == used_events_states_transitions(recorded)
+    policy = Policy.initialize()
+    assert corpus.unused_events_states_transitions(policy) == \
+        unused_events_states_transitions(policy, recorded)
+
+    rates = corpus.not_understood_rates()
+    assert 0 < rates['search_prompt'] <= 1
+    assert rates['initial'] == 0
+    states, matrix = corpus.transition_matrix()
+    for row in matrix:
+        assert abs(sum(row) - 1) < 1e-9 or sum(row) == 0
+
+
+def test_logs(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    log_file = str(tmpdir.join('alexa.log'))
+    _record(record_file, log_file)
+
+    from_logs = coverage.analyze([log_file]).to_json()
+    from_recordings = coverage.analyze([record_file]).to_json()
+    for key in ('turns', 'events', 'states', 'transitions', 'not_understood_rates', 'sessions'):
+        assert from_logs[key] == from_recordings[key]
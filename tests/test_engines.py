@@ -0,0 +1,100 @@
+from collections import namedtuple
+
+import pytest
+from transitions import MachineError
+
+from alexafsm import response
+from alexafsm.engine import NATIVE, TRANSITIONS, NativeEngine
+from alexafsm.policy import Policy as PolicyBase
+from alexafsm.session_attributes import SessionAttributes
+from alexafsm.states import States as StatesBase, with_transitions
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+@pytest.mark.parametrize('turns', CONVERSATIONS)
+def test_skillsearch_parity(turns):
+    with fake_clients():
+        expected = list(converse(Policy.initialize(engine=TRANSITIONS), turns))
+        actual = list(converse(Policy.initialize(engine=NATIVE), turns))
+    assert [resp for _, resp in actual] == [resp for _, resp in expected]
+
+
+def test_native_engine_is_shared():
+    policy = Policy.initialize(engine=NATIVE)
+    assert isinstance(policy._engine, NativeEngine)
+    assert policy._engine is Policy.initialize(engine=NATIVE)._engine
+    # transitions.Machine is still available for the tools in alexafsm.utils
+    assert 'helping' in policy.machine.states
+
+
+class Attributes(SessionAttributes):
+    slots_cls = namedtuple('Slots', [])
+
+
+class States(StatesBase):
+    session_attributes_cls = Attributes
+
+    def initial(self):
+        return response.NOT_UNDERSTOOD
+
+    @with_transitions(
+        {'trigger': 'Go', 'source': 'initial', 'prepare': 'm_prepare', 'conditions': 'm_truthy'},
+        {'trigger': 'Go', 'source': 'initial', 'prepare': 'm_prepare', 'unless': 'm_none',
+         'after': 'm_after'},
+        {'trigger': 'Go', 'source': 'initial', 'conditions': 'm_true', 'before': 'm_before'},
+    )
+    def first(self):
+        return response.NOT_UNDERSTOOD
+
+    @with_transitions({'trigger': 'Go', 'source': '*', 'conditions': 'm_true'})
+    def second(self):
+        return response.NOT_UNDERSTOOD
+
+
+class RecordingPolicy(PolicyBase):
+    states_cls = States
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def _call(self, name, result=None):
+        self.calls.append((name, self.state))
+        return result
+
+    def m_prepare(self):
+        return self._call('m_prepare')
+
+    def m_truthy(self):
+        return self._call('m_truthy', 'yes')  # truthy but not True: the transition is skipped
+
+    def m_none(self):
+        return self._call('m_none', None)  # falsy but not False: the transition is skipped
+
+    def m_true(self):
+        return self._call('m_true', True)
+
+    def m_before(self):
+        return self._call('m_before')
+
+    def m_after(self):
+        return self._call('m_after')
+
+
+@pytest.mark.parametrize('engine', [TRANSITIONS, NATIVE])
+def test_callback_order(engine):
+    policy = RecordingPolicy.initialize(engine=engine)
+    assert policy.trigger('Go')
+    assert policy.state == 'first'
+    assert policy.calls == [('m_prepare', 'initial'), ('m_truthy', 'initial'),
+                            ('m_prepare', 'initial'), ('m_none', 'initial'),
+                            ('m_true', 'initial'), ('m_before', 'initial')]
+
+    # wildcard source
+    assert policy.trigger('Go')
+    assert policy.state == 'second'
+
+    with pytest.raises(MachineError):
+        policy.trigger('Stop')
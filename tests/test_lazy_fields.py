@@ -0,0 +1,78 @@
+from unittest import mock
+
+from alexafsm import amazon_intent
+from alexafsm.attributes_codec import PACKED_KEY, pack, unpack
+from alexafsm.session_attributes import LazyField
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.fakes import converse, fake_clients
+from tests.skillsearch.intent import NEW_SEARCH, NEXT_SKILL
+from tests.skillsearch.policy import Policy
+from tests.skillsearch.session_attributes import SessionAttributes, _skills_from_es
+
+LAZY_SKILLS = SessionAttributes.__dict__['skills']
+
+
+def test_hydrate_once():
+    request = make_request(NEXT_SKILL, {}, {'state': 'has_result', 'query': 'pizza',
+                                            'skills': [{'_source': {}}], 'skill_cursor': 0})
+    parse = mock.Mock(return_value=['parsed'])
+    with mock.patch.object(LAZY_SKILLS, 'parse', parse), \
+            mock.patch.object(SessionAttributes, 'codec', None):
+        attributes = SessionAttributes.from_request(request)
+        assert not parse.called
+        assert attributes.skills == ['parsed']
+        assert attributes.skills == ['parsed']
+        # once read, the parsed value is what is sent back
+        assert attributes.to_json()['skills'] == ['parsed']
+    assert parse.call_count == 1
+
+
+def test_sent_back_unchanged():
+    skills = [{'_source': {}}]
+    request = make_request(amazon_intent.STOP, {}, {'state': 'has_result', 'skills': skills})
+    with mock.patch.object(LAZY_SKILLS, 'parse') as parse, \
+            mock.patch.object(SessionAttributes, 'codec', None):
+        assert SessionAttributes.from_request(request).to_json()['skills'] is skills
+    assert not parse.called
+
+
+def test_assigned_values():
+    assert isinstance(LAZY_SKILLS, LazyField)
+    assert SessionAttributes(skills=None).skills is None
+    attributes = SessionAttributes()
+    attributes.skills = ['as is']
+    assert attributes.skills == ['as is']
+    assert SessionAttributes.from_request(make_request(NEXT_SKILL)).skills is None
+    assert SessionAttributes._lazy_fields() == ('skills',)
+
+
+def test_turns_without_skills_do_not_parse():
+    policy = Policy.initialize()
+    parse = mock.Mock(side_effect=_skills_from_es)
+    with fake_clients(), mock.patch.object(LAZY_SKILLS, 'parse', parse):
+        list(converse(policy, [(NEW_SEARCH, {'Query': 'pizza'})]))
+        # the search sets skills, there was nothing to parse
+        assert not parse.called
+        turns = [(NEW_SEARCH, {'Query': 'pizza'}), (NEXT_SKILL, {}), (amazon_intent.STOP, {})]
+        responses = list(converse(policy, turns))
+    # only the NextSkill turn reads the skills
+    assert parse.call_count == 1
+    # and the results of the search are still sent back on the last turn
+    assert PACKED_KEY in responses[-1][1]['sessionAttributes']
+
+
+def test_packed_skills_sent_back_as_received():
+    packed = pack({'skills': [{'_source': {}}]})
+    request = make_request(amazon_intent.STOP, {}, {'state': 'has_result', PACKED_KEY: packed})
+    with mock.patch('alexafsm.session_attributes.unpack', side_effect=unpack) as unpacked:
+        attributes = SessionAttributes.from_request(request)
+        sent, _ = attributes.end_turn()
+        assert sent[PACKED_KEY] is packed
+        assert not unpacked.called
+
+        # once read, the skills are packed again
+        attributes = SessionAttributes.from_request(request)
+        assert len(attributes.skills) == 1
+        assert len(unpack(attributes.to_json()[PACKED_KEY])['skills']) == 1
+        assert unpacked.call_count == 1
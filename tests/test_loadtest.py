@@ -0,0 +1,68 @@
+import json
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from alexafsm import loadtest
+from alexafsm.policy_pool import PolicyPool
+from alexafsm.test_helpers import with_latency
+
+from tests.skillsearch.fakes import fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def test_in_process():
+    with fake_clients(latency=0.01):
+        requests = loadtest.random_walk(Policy, 50, {'query': ['pizza', 'news']})
+        assert len({request['session']['sessionId'] for request in requests}) > 1
+        results = loadtest.run(loadtest.InProcessTarget(Policy, 4), requests, [20], 0.5, 4,
+                               report=lambda line: None)
+    [result] = results
+    stats = result.to_json()
+    assert stats['sent'] == 10
+    assert stats['answered'] == 10
+    assert stats['errors'] == 0
+    assert result.percentile(100) >= 0.01  # searched with the slow fake
+    assert not stats['saturated']
+    assert loadtest.saturation_point(results) is None
+
+
+def test_saturation():
+    # a single worker answers at most 20 requests per second
+    target = with_latency(lambda request: None, 0.05)
+    results = loadtest.run(target, [{}], [100, 5], 0.3, 1, report=lambda line: None)
+    assert [result.qps for result in results] == [5, 100]
+    assert loadtest.saturation_point(results) == 100
+    assert results[1].max_queued > 1
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def test_http_and_errors():
+    policies = PolicyPool(Policy, 2)
+
+    def app(environ, start_response):
+        request = json.loads(environ['wsgi.input'].read(int(environ['CONTENT_LENGTH'])))
+        if request['request']['requestId'] == 'loadtest-0':
+            start_response('500 Internal Server Error', [])
+            return [b'']
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [policies.handle(request).to_bytes()]
+
+    server = make_server('localhost', 0, app, handler_class=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with fake_clients():
+            requests = loadtest.random_walk(Policy, 4)
+            target = loadtest.HttpTarget(f'http://localhost:{server.server_port}/')
+            [result] = loadtest.run(target, requests, [40], 0.2, 2, report=lambda line: None)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result.sent == 8
+    assert result.errors == 2
+    assert result.answered == 6
+    assert result.saturated()
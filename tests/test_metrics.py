@@ -0,0 +1,146 @@
+import asyncio
+import json
+import multiprocessing
+import subprocess
+import sys
+import threading
+import time
+
+from alexafsm.metrics import Counts, Metrics, asgi_app, mount, prometheus_text
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def _metered(metrics: Metrics):
+    return type('MeteredPolicy', (Policy,), {'metrics': metrics})
+
+
+def _converse_all(policy_cls):
+    with fake_clients():
+        for turns in CONVERSATIONS:
+            list(converse(policy_cls.initialize(), turns))
+
+
+def test_counts_of_conversations():
+    metrics = Metrics()
+    _converse_all(_metered(metrics))
+    counts = metrics.counts()
+
+    num_turns = sum(len(turns) for turns in CONVERSATIONS)
+    assert counts.requests == {'IntentRequest': num_turns}
+    assert sum(counts.turns.values()) + sum(counts.not_understood.values()) == num_turns
+    assert counts.not_understood  # the conversations include invalid transitions
+    assert counts.turns[('initial', 'NewSearch', 'has_result')] > 0
+    assert sum(sum(histogram[:-1]) for histogram in counts.latency.values()) == num_turns
+
+    text = prometheus_text(counts)
+    assert 'alexafsm_turns_total{from_state="initial",intent="NewSearch",to_state="has_result"}' \
+        in text
+    assert f'alexafsm_requests_total{{type="IntentRequest"}} {num_turns}' in text
+    assert 'alexafsm_request_seconds_bucket{state="has_result",le="+Inf"}' in text
+    assert Counts.from_json(json.loads(json.dumps(counts.to_json()))).to_json() == counts.to_json()
+
+
+def test_threads():
+    metrics = Metrics()
+    policy_cls = _metered(metrics)
+    request = make_request('AMAZON.HelpIntent', request_id='help')
+
+    def handle():
+        policy = policy_cls.initialize()
+        for _ in range(200):
+            policy.handle(request)
+
+    threads = [threading.Thread(target=handle) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.counts().turns == {('initial', 'AMAZON.HelpIntent', 'helping'): 800}
+
+
+def test_ended_threads_are_merged():
+    metrics = Metrics()
+    policy_cls = _metered(metrics)
+    request = make_request('AMAZON.HelpIntent', request_id='help')
+
+    # like a server starting a thread per request
+    for _ in range(50):
+        thread = threading.Thread(target=lambda: policy_cls.initialize().handle(request))
+        thread.start()
+        thread.join()
+    assert metrics.counts().turns == {('initial', 'AMAZON.HelpIntent', 'helping'): 50}
+    assert metrics._shards == []
+
+
+def _handle_in_worker(directory: str):
+    metrics = Metrics(directory)
+    _converse_all(_metered(metrics))
+    metrics.flush()
+
+
+def test_processes(tmpdir):
+    directory = str(tmpdir)
+    processes = [multiprocessing.Process(target=_handle_in_worker, args=(directory,))
+                 for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    metrics = Metrics(directory)
+    _converse_all(_metered(metrics))
+    single = metrics.counts()
+    collected = metrics.collect()
+    assert collected.turns == {key: 3 * count for key, count in single.turns.items()}
+    assert collected.requests == {key: 3 * count for key, count in single.requests.items()}
+
+
+def test_flushed_when_idle_and_at_exit(tmpdir):
+    directory = str(tmpdir)
+    script = ('import sys; from alexafsm.metrics import Metrics; '
+              'from tests.test_metrics import _converse_all, _metered; '
+              '_converse_all(_metered(Metrics(sys.argv[1])))')
+    subprocess.run([sys.executable, '-c', script, directory], check=True)
+
+    metrics = Metrics(directory, flush_interval=0.05)
+    policy_cls = _metered(metrics)
+    _converse_all(policy_cls)
+    single = metrics.counts()
+    # no request comes after these ones, the counts are flushed by the timer
+    time.sleep(0.5)
+    with open(metrics._filename(metrics._pid)) as f:
+        assert Counts.from_json(json.load(f)).requests == single.requests
+    # the other process flushed its counts when it exited
+    assert metrics.collect().requests == {key: 2 * count for key, count in single.requests.items()}
+
+
+def test_endpoints():
+    metrics = Metrics()
+    _converse_all(_metered(metrics))
+    skill_calls = []
+
+    def skill(environ, start_response):
+        skill_calls.append(environ['PATH_INFO'])
+        return [b'{}']
+
+    app = mount(skill, metrics)
+    responses = []
+    body = b''.join(app({'PATH_INFO': '/metrics', 'QUERY_STRING': 'format=json'},
+                        lambda status, headers: responses.append((status, dict(headers)))))
+    assert json.loads(body.decode('utf-8')) == metrics.to_json()
+    assert responses[0][1]['Content-Type'] == 'application/json'
+    app({'PATH_INFO': '/', 'QUERY_STRING': ''}, None)
+    assert skill_calls == ['/']
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.get_event_loop().run_until_complete(
+        asgi_app(metrics)({'type': 'http', 'path': '/metrics', 'query_string': b''}, None, send))
+    assert sent[0]['status'] == 200
+    assert sent[1]['body'].decode('utf-8') == metrics.prometheus()
@@ -0,0 +1,48 @@
+import json
+
+from alexafsm import playback
+from alexafsm.test_helpers import iter_requests_responses
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients, install_fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def _record(record_file: str):
+    with fake_clients():
+        for i, turns in enumerate(CONVERSATIONS):
+            list(converse(Policy.initialize(), turns, session_id=f'session-{i}',
+                          record_filename=record_file))
+
+
+def test_playback(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    _record(record_file)
+
+    with fake_clients():
+        reports = [playback.run(Policy, iter_requests_responses(record_file), processes=1)]
+    # spawned workers inherit nothing from this process, setup gives them the fakes
+    reports.append(playback.run(Policy, iter_requests_responses(record_file), processes=2,
+                                setup=install_fake_clients, chunksize=1, start_method='spawn'))
+    for report in reports:
+        # sessions are replayed in parts when turns follow a response ending the session
+        assert report.sessions >= len(CONVERSATIONS)
+        assert report.turns == sum(len(turns) for turns in CONVERSATIONS)
+        assert report.mismatches == []
+        assert sum(histogram.count for histogram in report.latency.values()) == report.turns
+        assert report.throughput > 0
+
+
+def test_playback_mismatches(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    _record(record_file)
+    turns = list(iter_requests_responses(record_file))
+    turns[1][1]['response']['outputSpeech']['text'] = 'changed'
+
+    with fake_clients():
+        report = playback.run(Policy, iter(turns), processes=1)
+    [mismatch] = report.mismatches
+    assert mismatch['session_id'] == 'session-0'
+    assert mismatch['turn'] == 1
+    assert [difference['path'] for difference in mismatch['differences']] == \
+        ['/response/outputSpeech/text']
+    assert json.loads(json.dumps(report.to_json()))['mismatches'] == [mismatch]
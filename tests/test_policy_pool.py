@@ -0,0 +1,53 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from alexafsm.engine import NATIVE, TRANSITIONS
+from alexafsm.policy_pool import PolicyPool
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def test_reused_policy_is_reset():
+    pool = PolicyPool(Policy, size=1)
+    with fake_clients():
+        list(converse(pool, CONVERSATIONS[0]))
+        with pool.acquire() as policy:
+            assert policy.state == 'search_prompt'
+
+        launch = json.loads(pool.handle(make_request(request_type='LaunchRequest')).to_bytes())
+        fresh = json.loads(Policy.initialize().handle(
+            make_request(request_type='LaunchRequest')).to_bytes())
+    assert launch == fresh
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize('engine', [TRANSITIONS, NATIVE])
+def test_concurrent_handling(engine, frequent_thread_switches):
+    sessions = [(f'session-{i}', CONVERSATIONS[i % len(CONVERSATIONS)]) for i in range(40)]
+
+    def _converse(policy_or_pool, session_id, turns):
+        return [response for _, response in converse(policy_or_pool, turns, session_id=session_id)]
+
+    pool = PolicyPool(Policy, size=3, engine=engine)
+    with fake_clients():
+        expected = [_converse(Policy.initialize(engine=engine), session_id, turns)
+                    for session_id, turns in sessions]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(_converse, pool, session_id, turns)
+                       for session_id, turns in sessions]
+            actual = [future.result() for future in futures]
+
+    assert actual == expected
+    assert pool._policies.qsize() == 3
@@ -0,0 +1,115 @@
+from collections import Counter
+
+import pytest
+
+from alexafsm.profiling import TransitionProfile, candidate_key
+from alexafsm.transition_table import Transition, TransitionTable
+from alexafsm.utils import validate_transition_order
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.intent import NEW_SEARCH, NEXT_SKILL, NTH_SKILL
+from tests.skillsearch.policy import Policy
+
+
+def _profile_conversations() -> TransitionProfile:
+    profile = TransitionProfile()
+    profiled_policy_cls = type('ProfiledPolicy', (Policy,), {'profile': profile})
+    with fake_clients():
+        for turns in CONVERSATIONS:
+            list(converse(profiled_policy_cls.initialize(), turns))
+    return profile
+
+
+def _candidate(state: str, trigger: str, dest: str):
+    candidates = Policy.initialize().transition_table.get(state, trigger)
+    [transition] = [transition for transition in candidates if transition.dest == dest]
+    return transition
+
+
+def test_profile(tmpdir):
+    profile = _profile_conversations()
+    has_result = _candidate('initial', NEW_SEARCH, 'has_result')
+    assert profile.frequency('initial', NEW_SEARCH, has_result) == 3
+    assert profile.frequency('has_result', NTH_SKILL,
+                             _candidate('has_result', NTH_SKILL, 'bad_navigate')) == 1
+    # counted by candidate, not by destination
+    assert profile.frequency('initial', NEW_SEARCH, has_result._replace(conditions=())) == 0
+
+    filename = str(tmpdir.join('profile.json'))
+    profile.save(filename)
+    loaded = TransitionProfile.load(filename)
+    assert loaded.counts == profile.counts
+    loaded.merge(profile)
+    assert loaded.frequency('initial', NEW_SEARCH, has_result) == 6
+
+
+class ProfiledPolicy(Policy):
+    # going to the next result is more frequent than going past the last one
+    transition_profile = TransitionProfile({
+        ('has_result', NEXT_SKILL): {'has_result if m_has_next': 10,
+                                     'bad_navigate unless m_has_next': 1},
+        ('initial', NEW_SEARCH): {'exiting if m_searching_for_exit': 10,
+                                  'no_result prepare m_search if m_no_result': 5}
+    })
+
+
+def test_ordered_by_profile():
+    policy = ProfiledPolicy.initialize()
+    validate_transition_order(policy)
+    table = policy._engine.table
+    # candidates are declared in alphabetical order of their states
+    assert [t.dest for t in table.get('has_result', NEXT_SKILL)] == ['has_result', 'bad_navigate']
+    assert [t.dest for t in Policy.initialize()._engine.table.get('has_result', NEXT_SKILL)] == \
+        ['bad_navigate', 'has_result']
+    # searches have prepare callbacks, they cannot be reordered
+    assert [t.dest for t in table.get('initial', NEW_SEARCH)] == \
+        [t.dest for t in Policy.initialize()._engine.table.get('initial', NEW_SEARCH)]
+
+    with fake_clients():
+        for turns in CONVERSATIONS:
+            expected = list(converse(Policy.initialize(), turns))
+            actual = list(converse(ProfiledPolicy.initialize(), turns))
+            assert [resp for _, resp in actual] == [resp for _, resp in expected]
+
+
+def test_fewer_condition_evaluations(monkeypatch):
+    calls = Counter()
+    m_has_next = Policy.m_has_next
+
+    def counting_m_has_next(policy):
+        calls[type(policy)] += 1
+        return m_has_next(policy)
+
+    monkeypatch.setattr(Policy, 'm_has_next', counting_m_has_next)
+    with fake_clients():
+        for policy_cls in (Policy, ProfiledPolicy):
+            list(converse(policy_cls.initialize(), [(NEW_SEARCH, {'Query': 'pizza'}),
+                                                    (NEXT_SKILL, {})]))
+    assert calls == {Policy: 2, ProfiledPolicy: 1}
+
+
+def test_same_destination():
+    def transition(conditions=(), unless=()):
+        return Transition('go', 'a', 'b', conditions, unless, (), (), ())
+
+    first, second = transition(('m_ok',)), transition(unless=('m_ok',))
+    profile = TransitionProfile()
+    for _ in range(3):
+        profile.record('a', 'go', second)
+    profile.record('a', 'go', first)
+    assert [candidate_key(t) for t in [first, second]] == ['b if m_ok', 'b unless m_ok']
+    table = TransitionTable(['a', 'b'], [first, second])
+    assert profile.ordered(table).get('a', 'go') == (second, first)
+
+
+class UnsafePolicy(Policy):
+    transition_profile = TransitionProfile()
+
+    @classmethod
+    def order_transitions(cls, table):
+        return type(table)(table.states, reversed(table.transitions))
+
+
+def test_unsafe_order():
+    with pytest.raises(AssertionError):
+        validate_transition_order(UnsafePolicy.initialize())
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import pickle
+
+import pytest
+
+from alexafsm.call_store import STORE_FILENAME, get_store, main as migrate_main
+from alexafsm.test_helpers import recordable
+
+
+class Mode:
+    record = False
+    playback = False
+
+
+def _recordable_search(record_dir: str, calls: list):
+    @recordable(lambda: record_dir, lambda: Mode.playback, lambda: Mode.record, cache_size=2)
+    def search(query: str, top_n: int = 3) -> dict:
+        calls.append(query)
+        return {'query': query, 'hits': list(range(top_n))}
+
+    return search
+
+
+@pytest.fixture(autouse=True)
+def mode():
+    yield Mode
+    Mode.record = Mode.playback = False
+
+
+def test_record_and_playback(tmpdir):
+    record_dir = str(tmpdir)
+    calls = []
+    search = _recordable_search(record_dir, calls)
+
+    Mode.record = True
+    recorded = [search(query) for query in ('pizza', 'news', 'weather')]
+    assert calls == ['pizza', 'news', 'weather']
+    assert os.listdir(record_dir) == [STORE_FILENAME]
+    assert len(get_store(record_dir)) == 3
+
+    Mode.record, Mode.playback = False, True
+    assert [search(query) for query in ('pizza', 'news', 'weather')] == recorded
+    assert search('pizza', top_n=3) == recorded[0]  # same call, with the default given
+    assert len(calls) == 3
+    assert len(search.cache) == 2
+
+    # callers get their own copy of cached results
+    search('news')['hits'].append('mutated')
+    assert search('news') == recorded[1]
+
+    with pytest.raises(FileNotFoundError):
+        search('not recorded')
+
+
+def _legacy_record(record_dir: str, function: str, args: tuple, kwargs: dict, result):
+    """Record a call like recordable did before the store, in its own pickle file"""
+    full_args = f"{str(args)}{str(sorted(kwargs.items()))}"
+    hashed_args = hashlib.md5(full_args.encode('utf-8')).hexdigest()
+    with open(os.path.join(record_dir, f'{function}_{hashed_args}.pickle'), 'wb') as f:
+        pickle.dump(result, f)
+
+
+def test_migration(tmpdir):
+    record_dir = str(tmpdir.mkdir('legacy'))
+    for query in ('pizza', 'news'):
+        _legacy_record(record_dir, 'search', (query,), {'top_n': 3}, {'query': query})
+    calls = []
+    search = _recordable_search(record_dir, calls)
+
+    Mode.playback = True
+    assert search('pizza') == {'query': 'pizza'}  # read from the pickle file
+
+    migrate_main([record_dir, '--delete'])
+    assert os.listdir(record_dir) == [STORE_FILENAME]
+    assert _recordable_search(record_dir, calls)('news') == {'query': 'news'}
+    assert calls == []
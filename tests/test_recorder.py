@@ -0,0 +1,74 @@
+import gzip
+import os
+
+import pytest
+
+from alexafsm.recorder import Recorder, shard_files
+from alexafsm.test_helpers import get_requests_responses
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+
+def _record(recorder, sessions=1):
+    expected = []
+    with fake_clients():
+        for i in range(sessions):
+            turns = CONVERSATIONS[i % len(CONVERSATIONS)]
+            expected += converse(Policy.initialize(), turns, session_id=f'session-{i}',
+                                 recorder=recorder)
+    recorder.close()
+    return expected
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_rotated_shards(tmpdir, compress):
+    record_file = str(tmpdir.join('playback', 'recordings.json'))
+    # tiny shards and a flush per turn, so that every turn starts a new shard
+    recorder = Recorder(record_file, max_bytes=1, compress=compress, flush_interval=0)
+    expected = _record(recorder, sessions=2)
+
+    shards = shard_files(record_file)
+    assert len(shards) > 1
+    assert all(shard.endswith('.json.gz' if compress else '.json') for shard in shards)
+    assert [os.path.basename(shard).split('.')[2] for shard in shards] == \
+        [str(os.getpid())] * len(shards)
+    assert get_requests_responses(record_file) == expected
+
+
+def test_legacy_file_and_shards(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    with fake_clients():
+        legacy = list(converse(Policy.initialize(), CONVERSATIONS[0], record_filename=record_file))
+    recorded = _record(Recorder(record_file, compress=True))
+    assert get_requests_responses(record_file) == legacy + recorded
+
+
+def test_gzip_members_are_readable_separately(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    _record(Recorder(record_file, compress=True, flush_interval=0))
+    shard, = shard_files(record_file)
+    with gzip.open(shard, 'rt') as f:
+        assert len(f.readlines()) == len(CONVERSATIONS[0])
+
+
+def test_sampling_by_session(tmpdir):
+    record_file = str(tmpdir.join('recordings.json'))
+    _record(Recorder(record_file, sample_rate=0))
+    assert not shard_files(record_file)
+
+    recorder = Recorder(record_file, sample_rate=0.5)
+    _record(recorder, sessions=40)
+    sessions = {}
+    for request, _ in get_requests_responses(record_file):
+        sessions.setdefault(request['session']['sessionId'], []).append(request)
+    assert 5 < len(sessions) < 35
+    # sampled sessions are complete
+    assert all(len(requests) == len(CONVERSATIONS[int(session_id.split('-')[1]) %
+                                                  len(CONVERSATIONS)])
+               for session_id, requests in sessions.items())
+
+
+def test_no_recordings(tmpdir):
+    with pytest.raises(FileNotFoundError):
+        get_requests_responses(str(tmpdir.join('recordings.json')))
@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+from collections import namedtuple
+
+import pytest
+
+from alexafsm import serializer
+from alexafsm.serializer import JSON, ORJSON, register_encoder, serialize
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import Policy
+
+BACKENDS = [JSON, pytest.param(ORJSON, marks=pytest.mark.skipif(
+    serializer.orjson is None, reason='orjson is not installed'))]
+
+
+def _responses():
+    with fake_clients():
+        for conversation in CONVERSATIONS:
+            policy = Policy.initialize()
+            for request, _ in converse(Policy.initialize(), conversation):
+                yield policy.handle(request)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_same_json_as_patched_encoder(backend):
+    # make_json_serializable patches json for the whole process, so it is only imported in another
+    script = ('import json, sys; import alexafsm.make_json_serializable; '
+              'from alexafsm.serializer import serialize; '
+              'from tests.test_serializer import _responses; '
+              'assert all(json.loads(serialize(resp, sys.argv[1])) == json.loads(json.dumps(resp)) '
+              'for resp in _responses())')
+    subprocess.run([sys.executable, '-c', script, backend], check=True)
+
+
+def test_json_module_is_not_patched():
+    script = ('import json; iterencode = json.JSONEncoder.iterencode; '
+              'import alexafsm.policy, alexafsm.policy_pool, alexafsm.recorder; '
+              'assert json.JSONEncoder.iterencode is iterencode')
+    subprocess.run([sys.executable, '-c', script], check=True)
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class NamedPoint(Point):
+    def to_json(self):
+        return {'name': f'{self.x},{self.y}'}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_encoders(backend):
+    with pytest.raises(TypeError):
+        serialize(Point(1, 2), backend)
+
+    register_encoder(Point, lambda point: [point.x, point.y])
+    try:
+        # to_json of the subclass takes precedence over the encoder of the base class
+        Pair = namedtuple('Pair', ['first', 'second'])
+        data = {'pair': Pair(Point(1, 2), NamedPoint(3, 4)), 'text': 'café'}
+        assert json.loads(serialize(data, backend).decode('utf-8')) == \
+            {'pair': [[1, 2], {'name': '3,4'}], 'text': 'café'}
+    finally:
+        del serializer._registered[Point]
+        serializer._encoders.clear()
@@ -0,0 +1,101 @@
+import time
+from unittest import mock
+
+import pytest
+
+from alexafsm.serializer import serialize
+from alexafsm.session_attributes import STORED_KEY
+from alexafsm.session_store import MemorySessionStore, SQLiteSessionStore
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.intent import NEW_SEARCH
+from tests.skillsearch.policy import Policy
+from tests.skillsearch.session_attributes import SessionAttributes
+
+
+def test_memory_store_eviction():
+    store = MemorySessionStore(max_sessions=2)
+    for session_id in ['a', 'b', 'c']:
+        store.put(session_id, {'id': session_id})
+    assert store.get('a') is None
+    assert store.get('b') == {'id': 'b'}
+    store.put('d', {'id': 'd'})  # b was used more recently than c
+    assert (store.get('c'), store.get('b')) == (None, {'id': 'b'})
+    assert (len(store), store.evicted) == (2, 2)
+
+    store = MemorySessionStore(max_bytes=30)
+    store.put('a', {'text': 'x' * 10})
+    store.put('b', {'text': 'y' * 10})
+    assert store.get('a') is None
+    assert store.size_bytes == len('{"text":"yyyyyyyyyy"}')
+
+    store.delete('b')
+    assert (len(store), store.size_bytes) == (0, 0)
+
+
+def test_memory_store_expiry():
+    store = MemorySessionStore(ttl=0.05)
+    store.put('a', {})
+    time.sleep(0.1)
+    store.put('b', {})
+    assert (len(store), store.expired) == (1, 1)
+    time.sleep(0.1)
+    assert store.get('b') is None
+
+
+def test_sqlite_store(tmpdir):
+    path = str(tmpdir.join('sessions.db'))
+    store = SQLiteSessionStore(path, ttl=0.05)
+    store.put('a', {'skills': [1, 2]})
+    # another process on the same host
+    assert SQLiteSessionStore(path).get('a') == {'skills': [1, 2]}
+    time.sleep(0.1)
+    assert store.get('a') is None
+
+    store.ttl = 3600
+    store.put('b', {})
+    store.delete('b')
+    assert store.get('b') is None
+
+
+def _responses(turns):
+    with fake_clients():
+        return list(converse(Policy.initialize(), turns, session_id='stored'))
+
+
+@pytest.mark.parametrize('store_cls', [MemorySessionStore, SQLiteSessionStore])
+def test_skillsearch_stored_skills(store_cls, tmpdir):
+    expected = _responses(CONVERSATIONS[0])
+    store = store_cls(str(tmpdir.join('sessions.db'))) if store_cls is SQLiteSessionStore \
+        else store_cls()
+    with mock.patch.object(SessionAttributes, 'session_store', store), \
+            mock.patch.object(SessionAttributes, 'stored_fields', ['skills']):
+        actual = _responses(CONVERSATIONS[0])
+        assert len(store.get('stored')['skills']) == 6
+
+        ended = make_request(request_type='SessionEndedRequest', session_id='stored')
+        Policy.initialize().handle(ended)
+        assert store.get('stored') is None
+
+    for (_, expected_resp), (_, actual_resp) in zip(expected, actual):
+        assert actual_resp['response'] == expected_resp['response']
+        attributes = actual_resp['sessionAttributes']
+        assert STORED_KEY in attributes and '_packed' not in attributes
+
+
+def test_late_serialization_does_not_restore_ended_session():
+    store = MemorySessionStore()
+    with mock.patch.object(SessionAttributes, 'session_store', store), \
+            mock.patch.object(SessionAttributes, 'stored_fields', ['skills']):
+        with fake_clients():
+            resp = Policy.initialize().handle(
+                make_request(NEW_SEARCH, {'Query': 'pizza'}, session_id='ended'))
+        assert len(store.get('ended')['skills']) == 6
+
+        Policy.initialize().handle(
+            make_request(request_type='SessionEndedRequest', session_id='ended'))
+        # analytics and the recorder serialize the response later, from their own threads
+        assert STORED_KEY in serialize(resp.session_attributes.to_json()).decode('utf-8')
+        serialize(resp)
+        assert store.get('ended') is None
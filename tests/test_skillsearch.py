@@ -1,10 +1,11 @@
 import pytest
-import json
+from transitions import MachineError
 
 from tests.skillsearch.policy import Policy
 from alexafsm.utils import validate, events_states_transitions, unused_events_states_transitions
-from alexafsm.test_helpers import get_requests_responses
-from tests.skillsearch.skill_settings import SkillSettings
+from alexafsm import playback
+from alexafsm.test_helpers import get_requests_responses, iter_requests_responses
+from tests.skillsearch.skill_settings import SkillSettings, playback_mode
 
 
 def test_validate_policy():
@@ -23,15 +24,26 @@ def test_validate_policy():
     assert not missing, f'Some states do not handle STOP/CANCEL intents: {missing}'
 
 
+def test_policies_share_transition_table():
+    policy, other_policy = Policy.initialize(), Policy.initialize()
+    assert policy.transition_table is other_policy.transition_table
+    assert policy.machine is other_policy.machine
+
+    # the shared machine changes the state of the triggering policy only
+    policy.trigger('AMAZON.HelpIntent')
+    assert policy.state == 'helping'
+    assert other_policy.state == 'initial'
+
+    with pytest.raises(MachineError):
+        other_policy.trigger('AMAZON.YesIntent')
+
+
 def the_test_playback(measure_coverage: bool = False):
     """Play back recorded responses to check that the system is still behaving the same
     Change to test_playback to actually run this test once a recording is made."""
-    policy = Policy.initialize()
-    SkillSettings().playback = True
     record_file = SkillSettings().get_record_file()
-    for request, expected_response in get_requests_responses(record_file):
-        actual_response = json.loads(json.dumps(policy.handle(request)))
-        assert expected_response == actual_response
+    report = playback.run(Policy, iter_requests_responses(record_file), setup=playback_mode)
+    assert not report.mismatches, report.mismatches[0]
 
     if measure_coverage:
         policy = SkillSettings().get_policy()
@@ -0,0 +1,60 @@
+import inspect
+from collections import namedtuple
+
+import pytest
+
+from alexafsm.slots import MAX_SPELLINGS, slot_extractor
+
+
+class Slots(namedtuple('Slots', ['color', 'count', 'city'])):
+    __slots__ = ()
+    slot_types = {'count': int}
+    resolved_slots = ['color', 'city']
+
+
+def _resolved(value: str, *names: str, code: str = 'ER_SUCCESS_MATCH') -> dict:
+    return {'name': 'Slot', 'value': value, 'resolutions': {'resolutionsPerAuthority': [
+        {'authority': 'amzn1.er-authority.echo-sdk.test', 'status': {'code': code},
+         'values': [{'value': {'name': name, 'id': name.upper()}} for name in names]}]}}
+
+
+def test_extract():
+    extract = slot_extractor(Slots)
+    assert extract is slot_extractor(Slots)
+    assert extract(None) == Slots(None, None, None)
+    assert extract({
+        'COLOR': _resolved('crimson', 'red', 'purple'),
+        'Count': {'name': 'Count', 'value': '12'},
+        'City': _resolved('springfield', code='ER_SUCCESS_NO_MATCH'),
+        'Unknown': {'name': 'Unknown', 'value': 'ignored'}
+    }) == Slots(color='red', count=12, city='springfield')
+    # values that cannot be converted, and slots without values
+    assert extract({'count': {'name': 'count', 'value': 'a dozen'}, 'city': {'name': 'city'}}) == \
+        Slots(None, None, None)
+
+
+def test_small_slots():
+    assert slot_extractor(namedtuple('NoSlots', []))({'Query': {'value': 'pizza'}}) == ()
+    OneSlot = namedtuple('OneSlot', ['query'])
+    assert slot_extractor(OneSlot)({'Query': {'value': 'pizza'}}) == OneSlot('pizza')
+
+
+def test_unknown_configured_slot():
+    class BadSlots(namedtuple('BadSlots', ['query'])):
+        slot_types = {'nth': int}
+
+    with pytest.raises(AssertionError):
+        slot_extractor(BadSlots)
+
+
+def test_positions_are_bounded():
+    class Bounded(namedtuple('Bounded', ['color'])):
+        __slots__ = ()
+
+    extract = slot_extractor(Bounded)
+    for i in range(100):
+        assert extract({f'Unknown{i}': {'value': 'x'}}).color is None
+    for spelling in ('color', 'Color', 'COLOR', 'cOlor', 'coLor', 'colOr'):
+        assert extract({spelling: {'value': 'red'}}).color == 'red'
+    positions = inspect.getclosurevars(extract).nonlocals['positions']
+    assert set(positions.values()) == {0} and len(positions) == MAX_SPELLINGS
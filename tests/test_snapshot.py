@@ -0,0 +1,118 @@
+import asyncio
+from collections import namedtuple
+from unittest import mock
+
+import pytest
+
+from alexafsm import response
+from alexafsm.attributes_schema import Field, attributes_class
+from alexafsm.engine import NATIVE, TRANSITIONS
+from alexafsm.policy import Policy as PolicyBase
+from alexafsm.session_attributes import SessionAttributes, INITIAL_STATE
+from alexafsm.states import States as StatesBase, with_transitions
+from alexafsm.test_helpers import make_request
+
+from tests.skillsearch.session_attributes import SessionAttributes as SkillSearchAttributes
+
+Slots = namedtuple('Slots', ['query'])
+
+
+class Attributes(SessionAttributes):
+    slots_cls = Slots
+
+    def __init__(self, intent: str = None, slots=None, state: str = INITIAL_STATE,
+                 query: str = None, results: list = None):
+        super().__init__(intent, slots, state)
+        self.query = query
+        self.results = results
+
+
+SlottedAttributes = attributes_class('SlottedAttributes', Slots, [Field('query'),
+                                                                  Field('results')])
+
+
+@pytest.mark.parametrize('attributes_cls', [Attributes, SlottedAttributes])
+def test_rollback(attributes_cls):
+    results = [1, 2, 3]
+    attributes = attributes_cls(intent='Search', query='pizza', results=results)
+    with attributes.snapshot() as snapshot:
+        attributes.query = 'pasta'
+        attributes.query = 'soup'
+        attributes.results = None
+        if attributes_cls is SlottedAttributes:
+            with pytest.raises(AttributeError):  # not declared
+                attributes.extra = 'extra'
+        else:
+            attributes.extra = 'extra'
+        assert isinstance(attributes, attributes_cls)
+        assert snapshot.changed_fields == ['query', 'results', 'extra']
+        snapshot.rollback()
+    assert type(attributes) is attributes_cls
+    assert (attributes.query, attributes.results) == ('pizza', results)
+    assert attributes.results is results
+    assert not hasattr(attributes, 'extra')
+    assert attributes.to_json() == {'intent': 'Search', 'state': INITIAL_STATE, 'query': 'pizza',
+                                    'results': results}
+
+
+@pytest.mark.parametrize('attributes_cls', [Attributes, SlottedAttributes])
+def test_release(attributes_cls):
+    attributes = attributes_cls(query='pizza')
+    with attributes.snapshot():
+        attributes.query = 'pasta'
+        with pytest.raises(RuntimeError):
+            attributes.snapshot()
+    assert type(attributes) is attributes_cls
+    attributes.query = 'soup'
+    assert attributes.query == 'soup'
+    assert '_journal' not in attributes.to_json()
+
+
+def test_lazy_fields_are_not_parsed():
+    skills = [{'_source': {}}]
+    request = make_request('NextSkill', {}, {'state': 'has_result', 'skills': skills})
+    attributes = SkillSearchAttributes.from_request(request)
+    with attributes.snapshot() as snapshot:
+        attributes.skills = None
+        snapshot.rollback()
+    with mock.patch.object(SkillSearchAttributes, 'codec', None):
+        assert attributes.to_json()['skills'] is skills
+
+
+class States(StatesBase):
+    session_attributes_cls = Attributes
+
+    def initial(self):
+        return response.end('initial')
+
+    @with_transitions({'trigger': 'Search', 'source': 'initial', 'prepare': 'm_search',
+                       'after': 'm_refine'})
+    def searching(self):
+        return response.end('searching')
+
+
+class Policy(PolicyBase):
+    states_cls = States
+
+    def m_search(self):
+        self.attributes.query = self.attributes.slots.query
+        self.attributes.results = [self.attributes.query]
+
+    def m_refine(self):
+        if self.attributes.query == 'invalid':
+            self.trigger('Refine')  # no such transition
+
+
+@pytest.mark.parametrize('engine', [TRANSITIONS, NATIVE])
+def test_policy_rolls_back_invalid_transitions(engine):
+    policy = Policy.initialize(make_request('Search', {'Query': 'invalid'}, {'query': 'pizza'}),
+                               engine=engine)
+    attributes = policy.attributes
+    assert policy.execute() is response.NOT_UNDERSTOOD
+    assert policy.attributes is attributes and type(attributes) is Attributes
+    assert (attributes.query, attributes.results) == ('pizza', None)
+
+    policy.reset(make_request('Search', {'Query': 'valid'}, {'query': 'pizza'}))
+    assert asyncio.get_event_loop().run_until_complete(policy.execute_async()) == \
+        response.end('searching')
+    assert (policy.attributes.query, policy.attributes.results) == ('valid', ['valid'])
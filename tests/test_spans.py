@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from alexafsm.spans import Histogram, HistogramAggregator, Spans
+
+from tests.skillsearch.fakes import CONVERSATIONS, converse, fake_clients
+from tests.skillsearch.policy import AsyncPolicy, Policy
+from tests.skillsearch.intent import NEW_SEARCH
+
+
+def _spanned(policy_cls):
+    """Subclass with its own spans, so that subscribers do not leak into other tests"""
+    return type(f'Spanned{policy_cls.__name__}', (policy_cls,), {'spans': Spans()})
+
+
+def test_spans_of_handle():
+    policy_cls = _spanned(Policy)
+    aggregator = policy_cls.spans.subscribe(HistogramAggregator())
+    with fake_clients():
+        for turns in CONVERSATIONS:
+            expected = [resp for _, resp in converse(Policy.initialize(), turns)]
+            assert [resp for _, resp in converse(policy_cls.initialize(), turns)] == expected
+
+    summary = aggregator.summary()
+    turns = sum(len(turns) for turns in CONVERSATIONS)
+    for stage in ('parse', 'hydrate', 'trigger'):
+        assert summary[stage]['count'] == turns
+    assert summary['prepare.m_search']['count'] == \
+        sum(intent == NEW_SEARCH for turns in CONVERSATIONS for intent, _ in turns)
+    assert summary['condition.m_has_result']['count'] > 0
+    assert summary['response.has_result']['count'] > 0
+    assert summary['trigger']['total_ms'] >= summary['prepare.m_search']['total_ms']
+    assert 'prepare.m_search' in aggregator.report()
+
+
+def test_spans_of_handle_async():
+    policy_cls = _spanned(AsyncPolicy)
+    aggregator = policy_cls.spans.subscribe(HistogramAggregator())
+    with fake_clients():
+        policy = policy_cls.initialize()
+        request, _ = next(converse(Policy.initialize(), CONVERSATIONS[0]))
+        resp = asyncio.get_event_loop().run_until_complete(policy.handle_async(request))
+        json.loads(resp.to_bytes())
+
+    summary = aggregator.summary()
+    assert summary['prepare.m_search']['count'] == 1
+    assert summary['trigger']['total_ms'] >= summary['prepare.m_search']['total_ms']
+
+
+def test_no_subscribers():
+    policy_cls = _spanned(Policy)
+    stages = []
+    policy_cls.spans.subscribe(lambda stage, seconds: stages.append(stage))
+    with fake_clients():
+        policy = policy_cls.initialize()
+        list(converse(policy, CONVERSATIONS[0][:1]))
+        assert 'prepare.m_search' in stages
+
+        policy_cls.spans.unsubscribe(policy_cls.spans.subscribers[0])
+        del stages[:]
+        list(converse(policy, CONVERSATIONS[0][:1]))
+        list(converse(policy_cls.initialize(), CONVERSATIONS[0][:1]))
+    assert stages == []
+    assert 'm_search' not in vars(policy_cls.initialize())
+
+
+def test_histogram_merge():
+    histogram, other = Histogram(), Histogram()
+    for i in range(1, 51):
+        histogram.add(i / 1e4)
+        other.add(i / 1e3)
+    histogram.merge(other)
+    assert histogram.count == 100
+    assert histogram.max == 0.05
+    assert histogram.percentile(100) == 0.05
+    assert histogram.percentile(25) < 0.005 < histogram.percentile(75)
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from alexafsm.test_helpers import recordable
+from alexafsm.ttl_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_for(predicate, timeout: float = 5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def test_fresh_stale_and_expired():
+    clock = Clock()
+    cache = TTLCache(ttl=10, stale_ttl=5, clock=clock)
+    calls = []
+
+    def search(query: str) -> str:
+        calls.append(query)
+        return f'{query} {len(calls)}'
+
+    assert cache.get('pizza', search, 'pizza') == 'pizza 1'
+    clock.now = 9
+    assert cache.get('pizza', search, 'pizza') == 'pizza 1'
+    assert len(calls) == 1
+
+    clock.now = 12  # stale: served while refreshing in the background
+    assert cache.get('pizza', search, 'pizza') == 'pizza 1'
+    _wait_for(lambda: cache.stats()['refreshes'] == 1)
+    assert cache.get('pizza', search, 'pizza') == 'pizza 2'
+
+    clock.now = 30  # expired
+    assert cache.get('pizza', search, 'pizza') == 'pizza 3'
+    assert cache.stats() == {'hits': 2, 'stale_hits': 1, 'misses': 2, 'coalesced': 0,
+                             'refreshes': 1, 'refresh_errors': 0, 'evictions': 0}
+
+
+def test_single_flight():
+    cache = TTLCache(ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_search(query: str) -> list:
+        calls.append(query)
+        started.set()
+        release.wait()
+        return [query]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('pizza', slow_search,
+                                                                        'pizza')))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    _wait_for(lambda: cache.stats()['coalesced'] == 9)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ['pizza']
+    assert results == [['pizza']] * 10
+
+
+def test_errors_and_evictions():
+    cache = TTLCache(ttl=60, max_size=2)
+
+    def failing():
+        raise ConnectionError('elasticsearch is down')
+
+    with pytest.raises(ConnectionError):
+        cache.get('pizza', failing)
+    assert cache.get('pizza', lambda: 'pizza') == 'pizza'
+
+    cache.get('news', lambda: 'news')
+    cache.get('pizza', lambda: 'pizza')
+    cache.get('weather', lambda: 'weather')
+    assert len(cache) == 2
+    assert cache.get('news', lambda: 'news again') == 'news again'  # least recently used
+    assert cache.stats()['evictions'] == 2
+
+
+def test_recordable_memoized(tmpdir):
+    memoize = [True]
+    calls = []
+
+    @recordable(lambda: str(tmpdir), lambda: False, lambda: False, is_memoized=lambda: memoize[0],
+                ttl=60)
+    def search(query: str, top_n: int = 3) -> list:
+        calls.append(query)
+        return [query] * top_n
+
+    assert search('pizza') == search('pizza', top_n=3) == ['pizza'] * 3
+    assert calls == ['pizza']
+    assert search.memo.stats()['hits'] == 1
+
+    memoize[0] = False
+    search('pizza')
+    assert calls == ['pizza', 'pizza']